@@ -0,0 +1,43 @@
+"""Query embedding cache — shared Postgres tier
+
+Revision ID: 003_query_embedding_cache
+Revises: 002_rag
+Create Date: 2025-01-03 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "003_query_embedding_cache"
+down_revision: str = "002_rag"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "query_embeddings",
+        sa.Column("cache_key", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("query", sa.Text(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("cache_key"),
+    )
+    op.execute("ALTER TABLE query_embeddings ADD COLUMN embedding vector(1536) NOT NULL;")
+
+    # TTL expiry and size pruning both scan by age
+    op.create_index("idx_query_embeddings_created_at", "query_embeddings", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("query_embeddings")
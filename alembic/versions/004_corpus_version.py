@@ -0,0 +1,30 @@
+"""Conversation corpus version for search result caching
+
+Revision ID: 004_corpus_version
+Revises: 003_query_embedding_cache
+Create Date: 2025-01-04 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "004_corpus_version"
+down_revision: str = "003_query_embedding_cache"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "conversations",
+        sa.Column("corpus_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("conversations", "corpus_version")
@@ -0,0 +1,30 @@
+"""Shortened chunk embeddings for two-stage vector search
+
+Revision ID: 005_coarse_embeddings
+Revises: 004_corpus_version
+Create Date: 2025-01-05 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "005_coarse_embeddings"
+down_revision: str = "004_corpus_version"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Only the configured vector_storage_tier is populated and indexed, by
+    # `python -m takehome.db.vector_storage`, which backfills from the float32
+    # vectors by truncating and re-normalizing — no re-embedding.
+    op.execute("ALTER TABLE document_chunks ADD COLUMN embedding_coarse vector(256);")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_chunks_embedding_coarse;")
+    op.execute("ALTER TABLE document_chunks DROP COLUMN embedding_coarse;")
@@ -0,0 +1,32 @@
+"""Quantized chunk embeddings — halfvec and binary storage tiers
+
+Revision ID: 006_quantized_embeddings
+Revises: 005_coarse_embeddings
+Create Date: 2025-01-06 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "006_quantized_embeddings"
+down_revision: str = "005_coarse_embeddings"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Populated and indexed only when configured as the storage tier, by
+    # `python -m takehome.db.vector_storage`
+    op.execute("ALTER TABLE document_chunks ADD COLUMN embedding_half halfvec(1536);")
+    op.execute("ALTER TABLE document_chunks ADD COLUMN embedding_bits bit(1536);")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_chunks_embedding_bits;")
+    op.execute("DROP INDEX IF EXISTS idx_chunks_embedding_half;")
+    op.execute("ALTER TABLE document_chunks DROP COLUMN embedding_bits;")
+    op.execute("ALTER TABLE document_chunks DROP COLUMN embedding_half;")
@@ -0,0 +1,35 @@
+"""Indexes for direct page / section reads of document chunks
+
+Revision ID: 007_chunk_lookup_indexes
+Revises: 006_quantized_embeddings
+Create Date: 2025-01-07 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "007_chunk_lookup_indexes"
+down_revision: str = "006_quantized_embeddings"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX idx_chunks_document_page "
+        "ON document_chunks (document_id, page_number, chunk_index);"
+    )
+    # Case-insensitive prefix matches: lower(section_header) LIKE 'rent review%'
+    op.execute(
+        "CREATE INDEX idx_chunks_document_section "
+        "ON document_chunks (document_id, lower(section_header) text_pattern_ops);"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_chunks_document_section;")
+    op.execute("DROP INDEX IF EXISTS idx_chunks_document_page;")
@@ -0,0 +1,31 @@
+"""Per-message model token usage, including prompt cache reads and writes
+
+Revision ID: 008_message_usage
+Revises: 007_chunk_lookup_indexes
+Create Date: 2025-01-08 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "008_message_usage"
+down_revision: str = "007_chunk_lookup_indexes"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+_COLUMNS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+
+def upgrade() -> None:
+    for column in _COLUMNS:
+        op.add_column("messages", sa.Column(column, sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    for column in reversed(_COLUMNS):
+        op.drop_column("messages", column)
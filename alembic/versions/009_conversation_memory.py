@@ -0,0 +1,35 @@
+"""Rolling conversation summaries and cite-stripped message content
+
+Revision ID: 009_conversation_memory
+Revises: 008_message_usage
+Create Date: 2025-01-09 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "009_conversation_memory"
+down_revision: str = "008_message_usage"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("conversations", sa.Column("summary", sa.Text(), nullable=True))
+    op.add_column(
+        "conversations",
+        sa.Column("summary_message_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    # Left NULL for existing messages; the memory loader strips those on read
+    op.add_column("messages", sa.Column("content_plain", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("messages", "content_plain")
+    op.drop_column("conversations", "summary_message_count")
+    op.drop_column("conversations", "summary")
@@ -0,0 +1,28 @@
+"""Stored tool calls and results of each assistant message
+
+Revision ID: 010_message_tool_trace
+Revises: 009_conversation_memory
+Create Date: 2025-01-10 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "010_message_tool_trace"
+down_revision: str = "009_conversation_memory"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("messages", sa.Column("tool_trace", postgresql.JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("messages", "tool_trace")
@@ -0,0 +1,30 @@
+"""Flag assistant messages cut short by a client disconnect
+
+Revision ID: 011_message_interrupted
+Revises: 010_message_tool_trace
+Create Date: 2025-01-11 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "011_message_interrupted"
+down_revision: str = "010_message_tool_trace"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "messages",
+        sa.Column("interrupted", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("messages", "interrupted")
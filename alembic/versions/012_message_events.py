@@ -0,0 +1,38 @@
+"""Short-lived log of response stream events for Last-Event-ID resume
+
+Revision ID: 012_message_events
+Revises: 011_message_interrupted
+Create Date: 2025-01-12 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "012_message_events"
+down_revision: str = "011_message_interrupted"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "message_events",
+        sa.Column("stream_id", sa.String(), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("event", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("stream_id", "seq"),
+    )
+    # Expiry scans by age
+    op.create_index("idx_message_events_created_at", "message_events", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_message_events_created_at", table_name="message_events")
+    op.drop_table("message_events")
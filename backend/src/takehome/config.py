@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -11,6 +12,92 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     upload_dir: str = "uploads"
     max_upload_size: int = 25 * 1024 * 1024  # 25MB
+    db_prepared_statement_cache_size: int = 256
+
+    # Query embedding cache — in-process LRU, optionally backed by a shared Postgres table
+    query_embedding_cache_size: int = 2048
+    query_embedding_cache_ttl_seconds: int = 24 * 60 * 60
+    query_embedding_cache_shared: bool = False
+    query_embedding_cache_shared_max_rows: int = 100_000
+    # Query embedding misses across concurrent requests are coalesced into one API call
+    query_embedding_batch_max_size: int = 64
+    query_embedding_batch_max_wait_ms: float = 5.0
+
+    # Conversation memory: the last turns go into the prompt verbatim (up to
+    # memory_recent_turns / memory_token_budget); older turns are folded into a
+    # rolling summary once memory_summary_batch_turns of them have accumulated
+    memory_recent_turns: int = 8
+    memory_token_budget: int = 6000
+    memory_summary_batch_turns: int = 4
+    # Earlier turns are replayed as native message history including their tool
+    # calls and results. Results over this many tokens are truncated when stored;
+    # it is at least the search/read result budgets below, so anything a tool
+    # returned within its budget replays whole
+    history_replay_tool_results: bool = True
+    history_tool_result_max_tokens: int = 12000
+
+    # Anthropic prompt caching: cache breakpoints on the system prompt + tool
+    # definitions, the replayed conversation history, and the in-turn tool loop
+    prompt_cache_enabled: bool = True
+    prompt_cache_ttl: Literal["5m", "1h"] = "5m"
+
+    # Tool calls from one model response run concurrently, each on its own
+    # pooled session; at most this many per turn hold a connection at once
+    tool_call_concurrency: int = 4
+
+    # How often a streaming response checks whether its client is still connected
+    disconnect_poll_interval_seconds: float = 0.5
+    # Resumable responses: a generation runs detached from its HTTP request and
+    # writes its SSE events to a short-lived log (message_events), flushed every
+    # stream_flush_interval_ms, so a client reconnecting with Last-Event-ID can
+    # replay and follow it from any worker. A generation nobody follows for
+    # stream_resume_grace_seconds is cancelled.
+    stream_resume_grace_seconds: float = 15.0
+    stream_flush_interval_ms: float = 25.0
+    stream_event_retention_seconds: int = 15 * 60
+    # Followers on other workers give up on a log that stops growing for this long
+    stream_idle_timeout_seconds: float = 120.0
+
+    # Max tokens of search results returned to the model per tool call
+    search_result_token_budget: int = 3500
+    # read_page / read_section return whole pages and sections, so get more
+    read_result_token_budget: int = 12000
+
+    # Search result cache — keyed by (conversation, corpus_version, query, top_k)
+    search_result_cache_size: int = 1024
+
+    # Speculative retrieval: search the user's message while the model's first
+    # request is in flight, and reuse the results if the agent's first
+    # search_documents query embeds at least this close to it (cosine)
+    speculative_search_enabled: bool = True
+    speculative_search_min_similarity: float = 0.85
+    # Messages shorter than this many words are searched together with the
+    # previous user message, since follow-ups rarely stand alone
+    speculative_search_context_words: int = 8
+
+    # In-memory per-conversation retrieval index (embedding matrix + BM25 postings)
+    index_cache_enabled: bool = True
+    index_cache_budget_mb: int = 256
+    index_cache_max_conversations: int = 64
+    # Two-level vector retrieval for conversations with at least this many documents:
+    # route to the closest documents, then sections, then rank only their chunks
+    two_level_min_documents: int = 20
+    two_level_top_documents: int = 8
+    two_level_top_sections: int = 32
+    # Immutable per-conversation index files, mmapped and shared by all workers
+    index_snapshots_enabled: bool = True
+    index_snapshot_dir: str = "index_snapshots"
+
+    # Representation the database ANN pass runs on:
+    #   full     float32 1536-d HNSW, no re-rank
+    #   coarse   256-d shortened vectors         (6x smaller)
+    #   halfvec  float16 1536-d                  (2x smaller)
+    #   binary   1 bit per dimension, Hamming    (32x smaller)
+    # All but "full" oversample that many candidates and re-rank them exactly
+    # on the float32 vectors. Only the configured tier is stored and indexed;
+    # after changing it, run `just db-vector-storage` to backfill and index it.
+    vector_storage_tier: Literal["full", "coarse", "halfvec", "binary"] = "full"
+    vector_search_rerank_candidates: int = 100
 
     model_config = {"env_file": ".env", "extra": "ignore"}
 
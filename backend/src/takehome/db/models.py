@@ -2,11 +2,15 @@ from __future__ import annotations
 
 import uuid
 from datetime import datetime
+from typing import Any
 
-from pgvector.sqlalchemy import Vector
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from pgvector.sqlalchemy import BIT
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+from takehome.db.types import BinaryHalfVector, BinaryVector
+
 
 class Base(DeclarativeBase):
     pass
@@ -19,6 +23,11 @@ class Conversation(Base):
         String, primary_key=True, default=lambda: uuid.uuid4().hex[:16]
     )
     title: Mapped[str] = mapped_column(String, default="New Conversation")
+    # Bumped on every document ingest/delete; keys the search result cache
+    corpus_version: Mapped[int] = mapped_column(Integer, default=0)
+    # Rolling summary of the oldest summary_message_count messages
+    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
+    summary_message_count: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.now(), onupdate=func.now()
@@ -43,12 +52,35 @@ class Message(Base):
     )
     role: Mapped[str] = mapped_column(String)  # "user", "assistant", "system"
     content: Mapped[str] = mapped_column(Text)
+    # Content with <cite> tags rendered as plain references, as replayed to the model
+    content_plain: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Assistant messages: the run's tool calls and results (pydantic-ai messages, compacted)
+    tool_trace: Mapped[list[dict[str, Any]] | None] = mapped_column(JSONB, nullable=True)
     sources_cited: Mapped[int] = mapped_column(Integer, default=0)
+    # Model token usage for assistant messages, summed over the agent run
+    input_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    output_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    cache_read_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    cache_write_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Assistant messages cut short because the client disconnected mid-answer
+    interrupted: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     conversation: Mapped[Conversation] = relationship(back_populates="messages")
 
 
+class MessageEvent(Base):
+    """One SSE event of a response stream, kept briefly so clients can resume."""
+
+    __tablename__ = "message_events"
+
+    # The generation's stream id (the id of the user message it answers)
+    stream_id: Mapped[str] = mapped_column(String, primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    event: Mapped[dict[str, Any]] = mapped_column(JSONB)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -85,7 +117,25 @@ class DocumentChunk(Base):
     context_text: Mapped[str | None] = mapped_column(Text, nullable=True)
     page_number: Mapped[int] = mapped_column(Integer)
     section_header: Mapped[str | None] = mapped_column(String, nullable=True)
-    embedding = mapped_column(Vector(1536), nullable=True)
+    embedding = mapped_column(BinaryVector(1536), nullable=True)
+    # First 256 dims of ``embedding``, re-normalized — coarse pass of two-stage search
+    embedding_coarse = mapped_column(BinaryVector(256), nullable=True)
+    # Quantized copies of ``embedding`` for the halfvec / binary storage tiers.
+    # Only the configured vector_storage_tier's column is populated.
+    embedding_half = mapped_column(BinaryHalfVector(1536), nullable=True)
+    embedding_bits = mapped_column(BIT(1536), nullable=True)
     token_count: Mapped[int] = mapped_column(Integer, default=0)
 
     document: Mapped[Document] = relationship(back_populates="chunks")
+
+
+class QueryEmbedding(Base):
+    """Shared (cross-worker) tier of the query embedding cache."""
+
+    __tablename__ = "query_embeddings"
+
+    cache_key: Mapped[str] = mapped_column(String, primary_key=True)  # sha256(model + query)
+    model: Mapped[str] = mapped_column(String)
+    query: Mapped[str] = mapped_column(Text)
+    embedding = mapped_column(BinaryVector(1536))
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
@@ -1,15 +1,39 @@
 from __future__ import annotations
 
 from collections.abc import AsyncGenerator
+from typing import Any
 
+import structlog
+from pgvector.asyncpg import register_vector
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from takehome.config import settings
 
-engine = create_async_engine(settings.database_url, echo=False)
+logger = structlog.get_logger()
+
+engine = create_async_engine(
+    settings.database_url,
+    echo=False,
+    # Per-connection cache of prepared statements, keyed by SQL text — the hot
+    # search queries are module-level constants so they are prepared once
+    connect_args={"prepared_statement_cache_size": settings.db_prepared_statement_cache_size},
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+def _register_vector_codecs(dbapi_connection: Any, _connection_record: Any) -> None:
+    """Send and receive vector / halfvec values in pgvector's binary format."""
+    try:
+        dbapi_connection.run_async(register_vector)
+    except ValueError:
+        # The vector extension doesn't exist yet (migrations not run)
+        logger.warning("pgvector types not found; vector codecs not registered")
+
+
+event.listen(engine.sync_engine, "connect", _register_vector_codecs)
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from typing import Any
+
+from pgvector.sqlalchemy import HALFVEC, VECTOR
+
+# pgvector's SQLAlchemy types serialize values to their text form
+# ("[0.1,0.2,...]"). Connections register pgvector's binary asyncpg codecs
+# (see db/session.py), so these variants hand lists / numpy arrays straight
+# to the driver, which sends them as binary parameters.
+
+
+class BinaryVector(VECTOR):
+    cache_ok = True
+
+    def bind_processor(self, dialect: Any) -> Any:
+        return None
+
+
+class BinaryHalfVector(HALFVEC):
+    cache_ok = True
+
+    def bind_processor(self, dialect: Any) -> Any:
+        return None
@@ -0,0 +1,25 @@
+"""Backfill and index the configured vector storage tier.
+
+Run after changing ``vector_storage_tier`` (and before serving traffic with
+it); idempotent, so it is safe to re-run:
+
+    uv run python -m takehome.db.vector_storage
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from takehome.db.session import engine
+from takehome.services.rag import prepare_vector_storage
+
+
+async def main() -> None:
+    try:
+        await prepare_vector_storage()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
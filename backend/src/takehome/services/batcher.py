@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from takehome.services.metrics import metrics
+
+
+class MicroBatcher[K, V]:
+    """Coalesce concurrent single-item requests into batched calls.
+
+    Keys submitted within ``max_wait_ms`` of the first pending one (or until
+    ``max_batch`` keys are pending) are resolved by a single ``fn(keys)``
+    call, whose results are handed back to each waiting caller. Identical
+    keys in the same window share one slot.
+
+    Batches are bound to the running event loop — one per process in the
+    app; a new loop (e.g. in tests) starts with an empty queue.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[list[K]], Awaitable[list[V]]],
+        *,
+        max_batch: int,
+        max_wait_ms: float,
+        name: str,
+    ) -> None:
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: dict[K, asyncio.Future[V]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: set[asyncio.Task[None]] = set()
+
+    async def submit_many(self, keys: list[K]) -> list[V]:
+        futures = [self._enqueue(key) for key in keys]
+        # Shielded: a cancelled caller must not cancel a slot others share
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+
+    async def submit(self, key: K) -> V:
+        return (await self.submit_many([key]))[0]
+
+    def _enqueue(self, key: K) -> asyncio.Future[V]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._pending, self._timer = loop, {}, None
+
+        future = self._pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch and self._loop is not None:
+            task = self._loop.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: dict[K, asyncio.Future[V]]) -> None:
+        metrics.incr(f"{self.name}.calls")
+        metrics.observe(f"{self.name}.batch_size", len(batch))
+        try:
+            results = await self.fn(list(batch))
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"{self.name}: {len(results)} results for a batch of {len(batch)} keys"
+                )
+        except Exception as exc:
+            self._fail(batch, exc)
+            return
+        except BaseException as exc:
+            # Cancelled (e.g. at shutdown) or interrupted: waiters must not hang
+            self._fail(batch, exc)
+            raise
+        for future, result in zip(batch.values(), results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: dict[K, asyncio.Future[V]], exc: BaseException) -> None:
+        for future in batch.values():
+            if future.done():
+                continue
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+
+@dataclass
+class _Entry[V]:
+    value: V
+    expires_at: float | None
+    weight: int
+
+
+class LRUCache[K, V]:
+    """Bounded in-process LRU cache with an optional per-entry TTL.
+
+    Bounded by entry count and, when a ``weigher`` is given, by the total
+    weight of the entries (e.g. bytes) against ``max_weight``.
+
+    Not thread-safe — intended for use from a single asyncio event loop.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: float | None = None,
+        *,
+        max_weight: int | None = None,
+        weigher: Callable[[V], int] | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.total_weight = 0
+        self._data: OrderedDict[K, _Entry[V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value (marking it most recently used), or None."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            self.pop(key)
+            return None
+        self._data.move_to_end(key)
+        return entry.value
+
+    def put(self, key: K, value: V) -> None:
+        """Insert or replace a value, evicting the least recently used entries.
+
+        A value heavier than ``max_weight`` on its own is not cached at all.
+        """
+        if self.maxsize <= 0:
+            return
+        weight = self.weigher(value) if self.weigher is not None else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            self.pop(key)
+            return
+
+        self.pop(key)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self._data[key] = _Entry(value=value, expires_at=expires_at, weight=weight)
+        self.total_weight += weight
+        while len(self._data) > self.maxsize or (
+            self.max_weight is not None and self.total_weight > self.max_weight
+        ):
+            _key, evicted = self._data.popitem(last=False)
+            self.total_weight -= evicted.weight
+
+    def pop(self, key: K) -> V | None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return None
+        self.total_weight -= entry.weight
+        return entry.value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.total_weight = 0
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -38,6 +38,26 @@ async def get_conversation(session: AsyncSession, conversation_id: str) -> Conve
     return result.scalar_one_or_none()
 
 
+async def get_corpus_version(session: AsyncSession, conversation_id: str) -> int:
+    """Return the conversation's corpus version (0 if it doesn't exist)."""
+    stmt = select(Conversation.corpus_version).where(Conversation.id == conversation_id)
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none() or 0
+
+
+async def bump_corpus_version(session: AsyncSession, conversation_id: str) -> None:
+    """Invalidate cached retrieval state for a conversation whose documents changed.
+
+    Does not commit — callers bump inside the same transaction as the change.
+    """
+    stmt = (
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(corpus_version=Conversation.corpus_version + 1)
+    )
+    await session.execute(stmt)
+
+
 async def update_conversation(
     session: AsyncSession, conversation_id: str, title: str
 ) -> Conversation | None:
@@ -8,11 +8,12 @@ import anthropic
 import fitz  # PyMuPDF
 import structlog
 from fastapi import UploadFile
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from takehome.config import settings
 from takehome.db.models import Document
+from takehome.services.conversation import bump_corpus_version
 
 logger = structlog.get_logger()
 
@@ -157,11 +158,15 @@ async def upload_document(
         method="ocr" if use_ocr else "pymupdf",
     )
 
-    # Determine label: count existing documents in this conversation
-    count_stmt = select(func.count()).where(Document.conversation_id == conversation_id)
-    result = await session.execute(count_stmt)
-    existing_count = result.scalar() or 0
-    label = _label_for_index(existing_count)
+    # Determine label: first label not already used in this conversation
+    # (documents can be deleted, so the count alone could reuse a live label)
+    labels_stmt = select(Document.label).where(Document.conversation_id == conversation_id)
+    result = await session.execute(labels_stmt)
+    used_labels = set(result.scalars().all())
+    idx = 0
+    while _label_for_index(idx) in used_labels:
+        idx += 1
+    label = _label_for_index(idx)
 
     # Create the document record
     document = Document(
@@ -215,3 +220,29 @@ async def get_documents_for_conversation(
     )
     result = await session.execute(stmt)
     return list(result.scalars().all())
+
+
+async def delete_document(session: AsyncSession, document_id: str) -> bool:
+    """Delete a document, its chunks and its file. Returns True if it existed."""
+    document = await get_document(session, document_id)
+    if document is None:
+        return False
+
+    file_path = document.file_path
+    await session.delete(document)
+    await bump_corpus_version(session, document.conversation_id)
+    await session.commit()
+
+    from takehome.services.rag import refresh_search_index
+
+    await refresh_search_index(session, document.conversation_id)
+
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.exception("Failed to remove document file", path=file_path)
+
+    logger.info("Deleted document", document_id=document_id)
+    return True
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import AsyncGenerator, Callable
+from datetime import timedelta
+from typing import Any, Protocol, cast
+
+import asyncpg  # type: ignore[import-untyped]
+import structlog
+from sqlalchemy import delete, exists, func, insert, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.config import settings
+from takehome.db.models import MessageEvent
+from takehome.db.session import async_session
+from takehome.services.metrics import metrics
+
+logger = structlog.get_logger()
+
+# ---------------------------------------------------------------------------
+# Resumable response streams
+#
+# A generation runs detached from the HTTP request that started it and
+# publishes its SSE events to an EventStream. Followers on the same worker
+# read them straight from memory; the events are also written in small
+# batches to the message_events table, with a NOTIFY on EVENTS_CHANNEL, so a
+# client that reconnects with Last-Event-ID can be served by any worker: it
+# replays the log after that id, then follows the tail as notifications
+# arrive. Followers on other workers NOTIFY FOLLOWERS_CHANNEL periodically so
+# the generating worker knows the stream is still being read.
+# ---------------------------------------------------------------------------
+
+# Events after which a stream has nothing more to say
+TERMINAL_EVENTS = frozenset({"done", "interrupted"})
+
+EVENTS_CHANNEL = "message_events"
+FOLLOWERS_CHANNEL = "message_event_followers"
+
+StreamItem = tuple[int, dict[str, Any]]
+
+
+class EventStream:
+    """The producing side of one response stream, on the worker generating it."""
+
+    def __init__(self, stream_id: str) -> None:
+        self.stream_id = stream_id
+        self.events: list[dict[str, Any]] = []
+        self.finished = False
+        # Replaced on every publish; followers wait on the one they saw last
+        self._wakeup = asyncio.Event()
+        self._pending: list[tuple[int, dict[str, Any]]] = []
+        self._dirty = asyncio.Event()
+        self._followers = 0
+        self._attended_at = time.monotonic()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def publish(self, event: dict[str, Any]) -> None:
+        seq = len(self.events)
+        self.events.append(event)
+        self._pending.append((seq, event))
+        self._dirty.set()
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def close(self) -> None:
+        """Finish the stream once the last events have reached the log."""
+        self.finished = True
+        self._wakeup.set()
+        self._dirty.set()
+        await self._flusher
+        _local_streams.pop(self.stream_id, None)
+
+    def attended(self) -> None:
+        self._attended_at = time.monotonic()
+
+    def unattended_seconds(self) -> float:
+        """How long the stream has had no follower, here or on another worker."""
+        if self._followers:
+            return 0.0
+        return time.monotonic() - self._attended_at
+
+    async def follow(self, after: int = -1) -> AsyncGenerator[StreamItem, None]:
+        """Yield (seq, event) for every event after ``after``, live until the end."""
+        self._followers += 1
+        try:
+            seq = after + 1
+            while True:
+                wakeup = self._wakeup
+                while seq < len(self.events):
+                    yield seq, self.events[seq]
+                    seq += 1
+                if self.finished:
+                    return
+                await wakeup.wait()
+        finally:
+            self._followers -= 1
+            self.attended()
+
+    async def _flush_loop(self) -> None:
+        # Batches the deltas of a fast-streaming answer into one write
+        while True:
+            await self._dirty.wait()
+            if not self.finished:
+                await asyncio.sleep(settings.stream_flush_interval_ms / 1000)
+            self._dirty.clear()
+            batch, self._pending = self._pending, []
+            if batch:
+                await _write_events(self.stream_id, batch)
+            if self.finished and not self._pending:
+                return
+
+
+_local_streams: dict[str, EventStream] = {}
+_background_tasks: set[asyncio.Task[None]] = set()
+_last_prune = 0.0
+
+
+def open_stream(stream_id: str) -> EventStream:
+    """Start a stream on this worker and expire old logs now and then."""
+    global _last_prune
+    stream = EventStream(stream_id)
+    _local_streams[stream_id] = stream
+    now = time.monotonic()
+    if now - _last_prune > settings.stream_event_retention_seconds / 10:
+        _last_prune = now
+        task = asyncio.create_task(_prune_expired())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return stream
+
+
+def follow_stream(stream_id: str, after: int = -1) -> AsyncGenerator[StreamItem, None]:
+    """Follow a stream from memory if it runs on this worker, else from the log."""
+    local = _local_streams.get(stream_id)
+    if local is not None:
+        return local.follow(after)
+    return _follow_log(stream_id, after)
+
+
+async def stream_exists(stream_id: str) -> bool:
+    if stream_id in _local_streams:
+        return True
+    async with async_session() as session:
+        result = await session.execute(select(exists().where(MessageEvent.stream_id == stream_id)))
+        return bool(result.scalar())
+
+
+# ---------------------------------------------------------------------------
+# The message_events log
+# ---------------------------------------------------------------------------
+
+
+async def _notify(session: AsyncSession, channel: str, stream_id: str) -> None:
+    await session.execute(
+        text("SELECT pg_notify(:channel, :stream_id)"),
+        {"channel": channel, "stream_id": stream_id},
+    )
+
+
+async def _write_events(stream_id: str, batch: list[tuple[int, dict[str, Any]]]) -> None:
+    try:
+        async with async_session() as session:
+            await session.execute(
+                insert(MessageEvent),
+                [{"stream_id": stream_id, "seq": seq, "event": event} for seq, event in batch],
+            )
+            # Delivered on commit, once the rows are visible
+            await _notify(session, EVENTS_CHANNEL, stream_id)
+            await session.commit()
+        metrics.incr("event_log.writes")
+        metrics.incr("event_log.events", len(batch))
+    except Exception:
+        # Followers on this worker read from memory and are unaffected
+        logger.exception("Failed to write stream events", stream_id=stream_id)
+
+
+async def _prune_expired() -> None:
+    try:
+        async with async_session() as session:
+            await session.execute(
+                delete(MessageEvent).where(
+                    MessageEvent.created_at
+                    < func.now() - timedelta(seconds=settings.stream_event_retention_seconds)
+                )
+            )
+            await session.commit()
+    except Exception:
+        logger.exception("Failed to expire stream events")
+
+
+async def _follow_log(stream_id: str, after: int) -> AsyncGenerator[StreamItem, None]:
+    """Replay the log after ``after``, then follow it as NOTIFYs come in."""
+    metrics.incr("event_log.remote_follows")
+    await event_listener.ensure_started()
+    wakeup = event_listener.subscribe(stream_id)
+    loop = asyncio.get_running_loop()
+    # Often enough that the generating worker never sees a grace period pass
+    heartbeat_interval = settings.stream_resume_grace_seconds / 3
+    last_event_at = loop.time()
+    heartbeat_at = float("-inf")
+    try:
+        while True:
+            wakeup.clear()
+            async with async_session() as session:
+                if loop.time() - heartbeat_at >= heartbeat_interval:
+                    await _notify(session, FOLLOWERS_CHANNEL, stream_id)
+                    await session.commit()
+                    heartbeat_at = loop.time()
+                result = await session.execute(
+                    select(MessageEvent.seq, MessageEvent.event)
+                    .where(MessageEvent.stream_id == stream_id, MessageEvent.seq > after)
+                    .order_by(MessageEvent.seq)
+                )
+                rows = list(result.tuples())
+            for seq, event in rows:
+                yield seq, event
+                after = seq
+                if event.get("type") in TERMINAL_EVENTS:
+                    return
+            if rows:
+                last_event_at = loop.time()
+            elif loop.time() - last_event_at > settings.stream_idle_timeout_seconds:
+                logger.warning("Response stream went quiet; giving up", stream_id=stream_id)
+                return
+            # Without a LISTEN connection this degrades to polling
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), timeout=heartbeat_interval)
+    finally:
+        event_listener.unsubscribe(stream_id, wakeup)
+
+
+# ---------------------------------------------------------------------------
+# LISTEN connection
+# ---------------------------------------------------------------------------
+
+
+# asyncpg calls a listener with (connection, server pid, channel, payload);
+# every payload on our channels is a stream id (see _notify)
+type _NotificationCallback = Callable[[object, int, str, str], None]
+
+
+class _ListenConnection(Protocol):
+    """The part of asyncpg.Connection the listener uses (asyncpg is untyped)."""
+
+    async def add_listener(self, channel: str, callback: _NotificationCallback) -> None: ...
+
+    async def close(self) -> None: ...
+
+    def is_closed(self) -> bool: ...
+
+
+class EventListener:
+    """One LISTEN connection per worker, fanning notifications out in-process."""
+
+    def __init__(self) -> None:
+        self._conn: _ListenConnection | None = None
+        self._waiters: dict[str, set[asyncio.Event]] = {}
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._conn is not None and not self._conn.is_closed():
+                return
+            url = make_url(settings.database_url).set(drivername="postgresql")
+            dsn = url.render_as_string(hide_password=False)
+            conn = cast(_ListenConnection, await asyncpg.connect(dsn))  # type: ignore[no-untyped-call]
+            await conn.add_listener(EVENTS_CHANNEL, self._on_events)
+            await conn.add_listener(FOLLOWERS_CHANNEL, self._on_follower)
+            self._conn = conn
+
+    async def ensure_started(self) -> None:
+        """Reconnect if the LISTEN connection was lost; followers poll meanwhile."""
+        try:
+            await self.start()
+        except Exception:
+            logger.exception("Could not LISTEN for stream events")
+
+    async def stop(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def subscribe(self, stream_id: str) -> asyncio.Event:
+        wakeup = asyncio.Event()
+        self._waiters.setdefault(stream_id, set()).add(wakeup)
+        return wakeup
+
+    def unsubscribe(self, stream_id: str, wakeup: asyncio.Event) -> None:
+        waiters = self._waiters.get(stream_id)
+        if waiters is not None:
+            waiters.discard(wakeup)
+            if not waiters:
+                del self._waiters[stream_id]
+
+    def _on_events(self, _conn: object, _pid: int, _channel: str, stream_id: str) -> None:
+        for wakeup in self._waiters.get(stream_id, ()):
+            wakeup.set()
+
+    def _on_follower(self, _conn: object, _pid: int, _channel: str, stream_id: str) -> None:
+        stream = _local_streams.get(stream_id)
+        if stream is not None:
+            stream.attended()
+
+
+event_listener = EventListener()
@@ -0,0 +1,429 @@
+from __future__ import annotations
+
+import math
+import mmap
+import re
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy import select
+
+from takehome.config import settings
+from takehome.db.models import Document, DocumentChunk
+from takehome.db.session import async_session
+
+type Float32Array = npt.NDArray[np.float32]
+type Float64Array = npt.NDArray[np.float64]
+type Int32Array = npt.NDArray[np.int32]
+
+# ---------------------------------------------------------------------------
+# In-memory retrieval index for hot conversations
+#
+# A conversation has a few hundred chunks at most, so its whole retrieval
+# state fits comfortably in memory: a contiguous float32 matrix of normalized
+# embeddings (vector scoring is one matrix-vector product), an inverted BM25
+# index, and compact chunk metadata. Caching and snapshot publishing live in
+# index_cache.py; the on-disk format in snapshot.py.
+#
+# Data rooms with dozens of documents also get document and section centroid
+# embeddings, computed when the index is published at ingest. Vector search
+# then routes the query to the closest documents and sections first and only
+# scores the chunks inside them.
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedChunk:
+    chunk_id: str
+    document_id: str
+    doc_label: str
+    doc_filename: str
+    content: str
+    context_text: str | None
+    page_number: int
+    section_header: str | None
+    chunk_index: int
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokenizer shared by indexing and querying (lowercase, whitespace split)."""
+    return text.lower().split()
+
+
+# A quoted Title Case phrase, the way leases introduce defined terms:
+# "Permitted Use" means ..., (the "Premises")
+_DEFINITION_RE = re.compile(r"[\"“]([A-Z][\w'’-]*(?:\s+(?:of|the|and|[A-Z][\w'’-]*)){0,4})[\"”]")
+
+
+def defined_term_key(phrase: str) -> str:
+    """Normalized form under which defined terms are looked up."""
+    return " ".join(phrase.replace("’", "'").casefold().split())
+
+
+def keyword_text(chunk: IndexedChunk) -> str:
+    """The text a chunk is keyword-indexed under: context blurb + content."""
+    if chunk.context_text:
+        return chunk.context_text + " " + chunk.content
+    return chunk.content
+
+
+# ---------------------------------------------------------------------------
+# BM25 keyword index
+# ---------------------------------------------------------------------------
+
+
+class KeywordIndex:
+    """Inverted-index BM25, scoring identically to ``rank_bm25.BM25Okapi``.
+
+    Each term keeps a postings list of (document position, term frequency),
+    so a query only touches the documents that contain its terms.
+    """
+
+    K1 = 1.5
+    B = 0.75
+    EPSILON = 0.25
+
+    def __init__(
+        self,
+        postings: dict[str, tuple[Int32Array, Float32Array]],
+        idf: dict[str, float],
+        doc_len: Float64Array,
+    ) -> None:
+        self.postings = postings  # term -> (doc positions, term frequencies)
+        self.idf = idf
+        self.doc_len = doc_len
+        avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+        # Per-document part of the BM25 denominator, precomputed once
+        self._norm = self.K1 * (1 - self.B + self.B * doc_len / avgdl) if avgdl else doc_len
+
+    @classmethod
+    def build(cls, corpus: list[list[str]]) -> KeywordIndex:
+        term_docs: dict[str, dict[int, int]] = {}
+        for pos, tokens in enumerate(corpus):
+            for token in tokens:
+                freqs = term_docs.setdefault(token, {})
+                freqs[pos] = freqs.get(pos, 0) + 1
+
+        postings: dict[str, tuple[Int32Array, Float32Array]] = {}
+        for term, freqs in term_docs.items():
+            postings[term] = (
+                np.fromiter(freqs.keys(), dtype=np.int32, count=len(freqs)),
+                np.fromiter(freqs.values(), dtype=np.float32, count=len(freqs)),
+            )
+
+        # Okapi IDF; negative values are floored to EPSILON * mean idf (as BM25Okapi)
+        n_docs = len(corpus)
+        idf: dict[str, float] = {}
+        negative: list[str] = []
+        for term, freqs in term_docs.items():
+            df = len(freqs)
+            idf[term] = math.log(n_docs - df + 0.5) - math.log(df + 0.5)
+            if idf[term] < 0:
+                negative.append(term)
+        if idf:
+            floor = cls.EPSILON * (sum(idf.values()) / len(idf))
+            for term in negative:
+                idf[term] = floor
+
+        doc_len = np.array([len(tokens) for tokens in corpus], dtype=np.float64)
+        return cls(postings, idf, doc_len)
+
+    def scores(self, query_tokens: list[str]) -> Float64Array:
+        scores = np.zeros(len(self.doc_len), dtype=np.float64)
+        for token in query_tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            positions, tf = posting
+            scores[positions] += self.idf[token] * tf * (self.K1 + 1) / (tf + self._norm[positions])
+        return scores
+
+    @property
+    def nbytes(self) -> int:
+        size = self.doc_len.nbytes + self._norm.nbytes
+        for term, (positions, tf) in self.postings.items():
+            size += positions.nbytes + tf.nbytes + len(term) + 64
+        return size
+
+
+# ---------------------------------------------------------------------------
+# Document / section summaries for two-level vector retrieval
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SummaryIndex:
+    """Centroid embeddings of each document and each section of a conversation.
+
+    Sections are (document, section_header) groups, numbered so that each
+    document's sections are contiguous. Both levels are stored as CSR-style
+    offsets, so selecting the rows under a few documents/sections never
+    touches the rest of the corpus.
+    """
+
+    doc_centroids: Float32Array  # [n_docs, dim]
+    section_centroids: Float32Array  # [n_sections, dim]
+    doc_section_offsets: Int32Array  # sections of doc d: offsets[d]:offsets[d + 1]
+    section_row_offsets: Int32Array  # section_rows[offsets[s]:offsets[s + 1]]
+    section_rows: Int32Array  # embedding rows, grouped by section
+
+    @classmethod
+    def build(
+        cls, chunks: list[IndexedChunk], embeddings: Float32Array, vector_rows: Int32Array
+    ) -> SummaryIndex:
+        doc_ids: dict[str, int] = {}
+        section_ids: dict[tuple[str, str | None], int] = {}
+        section_docs: list[int] = []
+        row_sections = np.empty(len(vector_rows), dtype=np.int32)
+        row_docs = np.empty(len(vector_rows), dtype=np.int32)
+        positions: list[int] = vector_rows.tolist()
+        # Chunks are ordered by document, so each document's sections get contiguous ids
+        for row, pos in enumerate(positions):
+            chunk = chunks[pos]
+            doc = doc_ids.setdefault(chunk.document_id, len(doc_ids))
+            key = (chunk.document_id, chunk.section_header)
+            if key not in section_ids:
+                section_ids[key] = len(section_ids)
+                section_docs.append(doc)
+            row_sections[row] = section_ids[key]
+            row_docs[row] = doc
+
+        doc_section_offsets = np.zeros(len(doc_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(section_docs, minlength=len(doc_ids)), out=doc_section_offsets[1:])
+        section_row_offsets = np.zeros(len(section_ids) + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(row_sections, minlength=len(section_ids)), out=section_row_offsets[1:]
+        )
+        return cls(
+            doc_centroids=_centroids(embeddings, row_docs, len(doc_ids)),
+            section_centroids=_centroids(embeddings, row_sections, len(section_ids)),
+            doc_section_offsets=doc_section_offsets,
+            section_row_offsets=section_row_offsets,
+            section_rows=np.argsort(row_sections, kind="stable").astype(np.int32),
+        )
+
+    def candidate_rows(self, query: Float32Array, top_docs: int, top_sections: int) -> Int32Array:
+        """Embedding rows of the best sections within the best documents."""
+        docs: list[int] = _top_positions(self.doc_centroids @ query, top_docs).tolist()
+        bounds: list[int] = self.doc_section_offsets.tolist()
+        sections = np.concatenate(
+            [np.arange(bounds[d], bounds[d + 1], dtype=np.int32) for d in docs]
+        )
+        best: list[int] = sections[
+            _top_positions(self.section_centroids[sections] @ query, top_sections)
+        ].tolist()
+        return np.concatenate(
+            [
+                self.section_rows[self.section_row_offsets[s] : self.section_row_offsets[s + 1]]
+                for s in best
+            ]
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.doc_centroids.nbytes
+            + self.section_centroids.nbytes
+            + self.doc_section_offsets.nbytes
+            + self.section_row_offsets.nbytes
+            + self.section_rows.nbytes
+        )
+
+
+def _centroids(embeddings: Float32Array, groups: Int32Array, n_groups: int) -> Float32Array:
+    sums = np.zeros((n_groups, embeddings.shape[1]), dtype=np.float32)
+    np.add.at(sums, groups, embeddings)
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return sums / norms
+
+
+def _top_positions(scores: npt.NDArray[np.floating], limit: int) -> npt.NDArray[np.intp]:
+    """Positions of the ``limit`` highest scores, in no particular order."""
+    if len(scores) <= limit:
+        return np.arange(len(scores))
+    return np.argpartition(-scores, limit - 1)[:limit]
+
+
+# ---------------------------------------------------------------------------
+# Per-conversation index
+# ---------------------------------------------------------------------------
+
+
+def _top_ranks(scores: npt.NDArray[np.floating], ids: list[str], limit: int) -> dict[str, int]:
+    """Ranks (id -> 0-based rank) of the ``limit`` highest scores."""
+    if len(scores) == 0:
+        return {}
+    if len(scores) > limit:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+    else:
+        top = np.argsort(-scores, kind="stable")
+    return {ids[int(pos)]: rank for rank, pos in enumerate(top)}
+
+
+@dataclass
+class ConversationIndex:
+    conversation_id: str
+    corpus_version: int
+    chunks: list[IndexedChunk]
+    keyword: KeywordIndex
+    # Row i of ``embeddings`` is the unit-normalized embedding of
+    # chunks[vector_rows[i]]; chunks without an embedding have no row.
+    embeddings: Float32Array | None = None
+    vector_rows: Int32Array | None = None
+    summaries: SummaryIndex | None = None
+    # Set when the arrays are views into a memory-mapped snapshot (keeps it open)
+    mapping: mmap.mmap | None = field(default=None, repr=False)
+    by_id: dict[str, IndexedChunk] = field(init=False, repr=False)
+    _ids: list[str] = field(init=False, repr=False)
+    _vector_ids: list[str] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.by_id = {c.chunk_id: c for c in self.chunks}
+        self._ids = [c.chunk_id for c in self.chunks]
+        rows: list[int] = self.vector_rows.tolist() if self.vector_rows is not None else []
+        self._vector_ids = [self._ids[pos] for pos in rows]
+
+    @cached_property
+    def defined_terms(self) -> frozenset[str]:
+        """Terms the documents define in quotes, as defined_term_key forms."""
+        return frozenset(
+            defined_term_key(match)
+            for chunk in self.chunks
+            for match in _DEFINITION_RE.findall(chunk.content)
+        )
+
+    def keyword_ranks(
+        self, query: str, limit: int, *, matched_only: bool = False
+    ) -> dict[str, int]:
+        """BM25 ranks; with ``matched_only``, chunks sharing no term with the query are dropped."""
+        if not self.chunks:
+            return {}
+        scores = self.keyword.scores(tokenize(query))
+        ranks = _top_ranks(scores, self._ids, limit)
+        if matched_only:
+            matched = {self._ids[int(pos)] for pos in np.flatnonzero(scores > 0)}
+            ranks = {cid: rank for cid, rank in ranks.items() if cid in matched}
+        return ranks
+
+    def vector_ranks(self, query_embedding: list[float], limit: int) -> dict[str, int]:
+        if self.embeddings is None or len(self.embeddings) == 0:
+            return {}
+        query: Float32Array = np.asarray(query_embedding, dtype=np.float32)
+        # Scaling the query doesn't change the ranking, so no need to normalize it
+        if (
+            self.summaries is not None
+            and len(self.summaries.doc_centroids) >= settings.two_level_min_documents
+        ):
+            # Large data rooms: only score chunks under the best documents/sections
+            rows = self.summaries.candidate_rows(
+                query, settings.two_level_top_documents, settings.two_level_top_sections
+            )
+            row_list: list[int] = rows.tolist()
+            ids = [self._vector_ids[row] for row in row_list]
+            return _top_ranks(self.embeddings[rows] @ query, ids, limit)
+        return _top_ranks(self.embeddings @ query, self._vector_ids, limit)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate private memory held by this index."""
+        if self.mapping is not None:
+            # Matrix and postings live in the shared page cache
+            size = len(self.keyword.postings) * 64 + self.keyword.doc_len.nbytes
+        else:
+            size = self.keyword.nbytes
+            if self.embeddings is not None:
+                size += self.embeddings.nbytes
+            if self.summaries is not None:
+                size += self.summaries.nbytes
+        for chunk in self.chunks:
+            size += len(chunk.content) + len(chunk.context_text or "") + 256
+        return size
+
+
+def _normalized_matrix(vectors: list[Float32Array]) -> Float32Array:
+    matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+async def load_conversation_index(
+    conversation_id: str, corpus_version: int, *, with_embeddings: bool = True
+) -> ConversationIndex:
+    """Build a conversation's index from the database (one query, own session)."""
+    columns = [
+        DocumentChunk.id,
+        DocumentChunk.document_id,
+        DocumentChunk.content,
+        DocumentChunk.context_text,
+        DocumentChunk.page_number,
+        DocumentChunk.section_header,
+        DocumentChunk.chunk_index,
+        Document.label,
+        Document.filename,
+    ]
+    if with_embeddings:
+        columns.append(DocumentChunk.embedding)
+    stmt = (
+        select(*columns)
+        .join(Document, DocumentChunk.document_id == Document.id)
+        .where(Document.conversation_id == conversation_id)
+        # Document.id breaks upload-time ties: SummaryIndex.build needs each
+        # document's rows contiguous
+        .order_by(Document.uploaded_at, Document.id, DocumentChunk.chunk_index)
+    )
+    async with async_session() as session:
+        rows = (await session.execute(stmt)).all()
+
+    chunks: list[IndexedChunk] = []
+    vectors: list[Float32Array] = []
+    vector_rows: list[int] = []
+    for pos, row in enumerate(rows):
+        chunks.append(
+            IndexedChunk(
+                chunk_id=row.id,
+                document_id=row.document_id,
+                doc_label=row.label or "Doc",
+                doc_filename=row.filename,
+                content=row.content,
+                context_text=row.context_text,
+                page_number=row.page_number,
+                section_header=row.section_header,
+                chunk_index=row.chunk_index,
+            )
+        )
+        if with_embeddings and row.embedding is not None:
+            vectors.append(np.asarray(row.embedding, dtype=np.float32))
+            vector_rows.append(pos)
+
+    return build_conversation_index(conversation_id, corpus_version, chunks, vectors, vector_rows)
+
+
+def build_conversation_index(
+    conversation_id: str,
+    corpus_version: int,
+    chunks: list[IndexedChunk],
+    vectors: list[Float32Array],
+    vector_rows: list[int],
+) -> ConversationIndex:
+    """Build the keyword index, embedding matrix and summaries for ``chunks``."""
+    embeddings = _normalized_matrix(vectors) if vectors else None
+    rows = np.asarray(vector_rows, dtype=np.int32) if vectors else None
+    return ConversationIndex(
+        conversation_id=conversation_id,
+        corpus_version=corpus_version,
+        chunks=chunks,
+        keyword=KeywordIndex.build([tokenize(keyword_text(c)) for c in chunks]),
+        embeddings=embeddings,
+        vector_rows=rows,
+        summaries=(
+            SummaryIndex.build(chunks, embeddings, rows)
+            if embeddings is not None and rows is not None
+            else None
+        ),
+    )
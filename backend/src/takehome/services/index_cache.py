@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+
+import structlog
+
+from takehome.config import settings
+from takehome.db.session import async_session
+from takehome.services.cache import LRUCache
+from takehome.services.conversation import get_corpus_version
+from takehome.services.index import ConversationIndex, load_conversation_index
+from takehome.services.metrics import metrics
+from takehome.services.snapshot import delete_snapshots, open_snapshot, write_snapshot
+
+logger = structlog.get_logger()
+
+# ---------------------------------------------------------------------------
+# Process-wide cache of hot conversation indexes
+#
+# Indexes are built lazily, keyed by the conversation's corpus version, and
+# evicted LRU against a memory budget. A build maps the conversation's
+# snapshot when one exists, and otherwise loads from the database and
+# publishes a snapshot for the other workers.
+# ---------------------------------------------------------------------------
+
+_index_cache: LRUCache[str, ConversationIndex] = LRUCache(
+    maxsize=settings.index_cache_max_conversations,
+    max_weight=settings.index_cache_budget_mb * 1024 * 1024,
+    weigher=lambda index: index.nbytes,
+)
+# Builds in flight, so concurrent first searches share one load
+_building: dict[tuple[str, int], asyncio.Task[ConversationIndex]] = {}
+_background_tasks: set[asyncio.Task[None]] = set()
+
+metrics.register_ratio("index_cache.hit_rate", "index_cache.hits", "index_cache.lookups")
+
+
+async def get_conversation_index(conversation_id: str, corpus_version: int) -> ConversationIndex:
+    """Return the conversation's index at ``corpus_version``, building it if needed."""
+    metrics.incr("index_cache.lookups")
+    index = _index_cache.get(conversation_id)
+    if index is not None and index.corpus_version == corpus_version:
+        metrics.incr("index_cache.hits")
+        return index
+
+    key = (conversation_id, corpus_version)
+    task = _building.get(key)
+    if task is None:
+        task = asyncio.create_task(_build(conversation_id, corpus_version))
+        _building[key] = task
+        task.add_done_callback(lambda _t: _building.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _build(conversation_id: str, corpus_version: int) -> ConversationIndex:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    index: ConversationIndex | None = None
+    if settings.index_snapshots_enabled:
+        index = await asyncio.to_thread(open_snapshot, conversation_id, corpus_version)
+    if index is not None:
+        metrics.incr("index_cache.snapshot_loads")
+    else:
+        # No snapshot yet (e.g. ingested before snapshots existed): build from
+        # the database and publish one so other workers can map it.
+        index = await _load_and_publish(conversation_id, corpus_version)
+        metrics.incr("index_cache.builds")
+    metrics.observe("index_cache.build_ms", (loop.time() - start) * 1000)
+
+    _cache_index(index)
+    logger.info(
+        "Loaded conversation index",
+        conversation_id=conversation_id,
+        corpus_version=corpus_version,
+        num_chunks=len(index.chunks),
+        mmapped=index.mapping is not None,
+        nbytes=index.nbytes,
+    )
+    return index
+
+
+async def _load_and_publish(conversation_id: str, corpus_version: int) -> ConversationIndex:
+    index = await load_conversation_index(conversation_id, corpus_version)
+    if not settings.index_snapshots_enabled:
+        return index
+    try:
+        await asyncio.to_thread(write_snapshot, index)
+        # Swap the private arrays for views into the shared mapping
+        mapped = await asyncio.to_thread(open_snapshot, conversation_id, corpus_version)
+        return mapped or index
+    except OSError:
+        logger.exception("Failed to write index snapshot", conversation_id=conversation_id)
+        return index
+
+
+def _cache_index(index: ConversationIndex) -> None:
+    current = _index_cache.get(index.conversation_id)
+    if current is None or current.corpus_version <= index.corpus_version:
+        _index_cache.put(index.conversation_id, index)
+    metrics.observe("index_cache.total_mb", _index_cache.total_weight / (1024 * 1024))
+
+
+async def publish_conversation_index(conversation_id: str, corpus_version: int) -> None:
+    """Rebuild a conversation's index after its documents changed.
+
+    Writes the new snapshot version (pruning older ones) and replaces this
+    worker's cached copy; other workers map the new snapshot on their next
+    search, when they see the bumped corpus version.
+    """
+    _index_cache.pop(conversation_id)
+    if not (settings.index_cache_enabled or settings.index_snapshots_enabled):
+        return
+    index = await _load_and_publish(conversation_id, corpus_version)
+    if settings.index_cache_enabled:
+        _cache_index(index)
+
+
+def invalidate_conversation_index(conversation_id: str) -> None:
+    """Drop this worker's cached index and on-disk snapshots."""
+    _index_cache.pop(conversation_id)
+    delete_snapshots(conversation_id)
+
+
+async def _warm(conversation_id: str) -> None:
+    try:
+        async with async_session() as session:
+            corpus_version = await get_corpus_version(session, conversation_id)
+        await get_conversation_index(conversation_id, corpus_version)
+    except Exception:
+        logger.exception("Failed to warm conversation index", conversation_id=conversation_id)
+
+
+def warm_conversation_index(conversation_id: str) -> None:
+    """Start building the conversation's index in the background (e.g. on open)."""
+    if not settings.index_cache_enabled:
+        return
+    task = asyncio.create_task(_warm(conversation_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
@@ -2,15 +2,52 @@ from __future__ import annotations
 
 import asyncio
 import re
-from collections.abc import AsyncIterator
-from dataclasses import dataclass, field
+import time
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any
 
 import structlog
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.builtin_tools import WebSearchTool
-
-from takehome.config import settings  # noqa: F401 — triggers ANTHROPIC_API_KEY export
-from takehome.services.rag import SearchResult, format_search_results, search_chunks
+from pydantic_ai.messages import (
+    BuiltinToolCallPart,
+    BuiltinToolReturnPart,
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelRequestPart,
+    ModelResponse,
+    PartDeltaEvent,
+    PartEndEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta,
+    ToolCallPart,
+    ToolReturnPart,
+    UserContent,
+    UserPromptPart,
+)
+from pydantic_ai.models.anthropic import AnthropicModelSettings
+from pydantic_ai.usage import RunUsage
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.config import settings
+from takehome.db.session import async_session
+from takehome.services.metrics import metrics
+from takehome.services.rag import (
+    SearchResult,
+    count_tokens,
+    fetch_page_chunks,
+    fetch_section_chunks,
+    focus_results,
+    format_document_read,
+    format_search_results,
+    search_chunks,
+    search_chunks_batch,
+)
+from takehome.services.speculation import SpeculativeSearch, take_speculative_results
 
 logger = structlog.get_logger()
 
@@ -23,8 +60,17 @@ logger = structlog.get_logger()
 @dataclass
 class ChatDeps:
     conversation_id: str
-    session: object  # AsyncSession — typed as object to avoid import cycle
     status_queue: asyncio.Queue[str] = field(default_factory=asyncio.Queue)
+    # Caps how many of the turn's tool calls hold a database session at once
+    tool_slots: asyncio.Semaphore = field(
+        default_factory=lambda: asyncio.Semaphore(settings.tool_call_concurrency)
+    )
+    # Search of the user's message started alongside the first model request
+    speculative: SpeculativeSearch | None = None
+    # Usage so far, updated after each model request
+    usage: RunUsage | None = None
+    # Set once the agent run completes
+    tool_trace: list[dict[str, Any]] | None = None
 
 
 # ---------------------------------------------------------------------------
@@ -62,6 +108,35 @@ async def generate_title(user_message: str) -> str:
     return title
 
 
+# ---------------------------------------------------------------------------
+# Conversation summary agent (Haiku) — folds old turns into rolling memory
+# ---------------------------------------------------------------------------
+
+summary_agent = Agent(
+    "anthropic:claude-haiku-4-5-20251001",
+    system_prompt=(
+        "You maintain a running summary of a legal due-diligence conversation. "
+        "Keep the questions asked, the answers' key facts, figures and dates, the "
+        "documents, pages and clauses they came from, and any open points. "
+        "Be concise and factual."
+    ),
+)
+
+
+async def summarize_conversation(
+    previous_summary: str | None, messages: list[tuple[str, str]]
+) -> str:
+    """Fold (role, content) messages into the running conversation summary."""
+    transcript = "\n\n".join(f"{role.capitalize()}: {content}" for role, content in messages)
+    prompt = (
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"Newer messages to fold in:\n{transcript}\n\n"
+        "Return only the updated summary."
+    )
+    result = await summary_agent.run(prompt)
+    return str(result.output).strip()
+
+
 # ---------------------------------------------------------------------------
 # Chat agent (Sonnet with search_documents tool)
 # ---------------------------------------------------------------------------
@@ -71,23 +146,33 @@ You are a legal document assistant for commercial real estate lawyers. You help
 review and understand documents during due diligence.
 
 ## Your tools
-You have two search capabilities:
+You have these search capabilities:
 
 1. **search_documents** — search through uploaded documents for relevant passages. \
 Always try this first for questions about the uploaded documents.
-2. **web_search** (built-in) — search the web for external context: legal precedents, \
+2. **search_documents_batch** — run several document searches at once and get one merged, \
+de-duplicated set of passages. Use it whenever you already know you need more than one search.
+3. **read_page** / **read_section** — read a specific page or section of a document directly. \
+Use these instead of searching when the user names the page or section they want.
+4. **web_search** (built-in) — search the web for external context: legal precedents, \
 regulatory requirements, planning authority records, market comparables, or definitions \
 of legal concepts not found in the documents.
 
 ## How to work
-1. When the user asks a question about documents, ALWAYS use search_documents first.
-2. You may search multiple times with different queries to find all relevant information.
+1. When the user asks a question about documents, ALWAYS search the documents first.
+2. You may search multiple times with different queries to find all relevant information. \
+If you can anticipate the queries up front (several topics, clauses or documents), send them \
+together in one search_documents_batch call instead of separate search_documents calls.
 3. For cross-document analysis, search for the topic across different document contexts.
 4. Use web_search when the question involves external context — e.g. current market rates, \
 planning records, legal definitions, regulatory requirements, or comparisons with market practice. \
 You MUST use web_search for questions about current market data, recent developments, or anything \
 that requires up-to-date information beyond what is in the uploaded documents.
 5. Base your answers on the search results. Do not fabricate information.
+6. Searches return whole passages when they fit and focused excerpts when they would not. \
+Pass snippets=true for pinpoint lookups, and snippets=false for summaries, overviews or \
+whole-clause analysis, or repeat a search that way when an excerpt is not enough.
+7. Earlier turns include the results of your earlier tool calls. If they already contain what a follow-up question needs, answer from them instead of searching again.
 
 ## Document citation format
 When referencing information from documents, you MUST use this exact citation format:
@@ -99,6 +184,8 @@ For example:
 
 Rules for document citations:
 - Always include the doc label and page number
+- A result spanning several pages marks each page change with [Page N]; cite the page \
+the quoted text appears on
 - Include the section or clause name/number when available from the search results
 - The quoted text should be a direct or close paraphrase from the source
 - Use multiple citations when drawing from multiple sources
@@ -120,14 +207,33 @@ For example:
 
 chat_agent = Agent(
     "anthropic:claude-sonnet-4-20250514",
-    system_prompt=SYSTEM_PROMPT,
+    # Instructions (unlike system prompts) are sent with every request, including
+    # runs that continue a replayed message_history
+    instructions=SYSTEM_PROMPT,
     deps_type=ChatDeps,
     builtin_tools=[WebSearchTool(max_uses=5)],
 )
 
 
+@asynccontextmanager
+async def _tool_session(deps: ChatDeps) -> AsyncGenerator[AsyncSession, None]:
+    """A pooled session for one tool call.
+
+    The model often asks for several searches in one response and pydantic-ai
+    runs them concurrently; one shared AsyncSession can't serve overlapping
+    queries, so each call gets its own, within the turn's tool_slots.
+    """
+    wait_start = time.perf_counter()
+    async with deps.tool_slots:
+        metrics.observe("tools.slot_wait_ms", (time.perf_counter() - wait_start) * 1000)
+        async with async_session() as session:
+            yield session
+
+
 @chat_agent.tool  # type: ignore[misc]
-async def search_documents(ctx: RunContext[ChatDeps], query: str) -> str:
+async def search_documents(
+    ctx: RunContext[ChatDeps], query: str, snippets: bool | None = None
+) -> str:
     """Search uploaded documents for relevant passages.
 
     Use this tool to find information in the uploaded documents. You can call it
@@ -135,19 +241,71 @@ async def search_documents(ctx: RunContext[ChatDeps], query: str) -> str:
 
     Args:
         query: The search query — be specific about what you're looking for.
+        snippets: Return only the sentences around the best matches. By default this
+            happens only when the whole passages would not fit; set true for
+            pinpoint lookups, false for summaries that need whole passages.
     """
     # Push status to the queue so the SSE stream can emit it
     await ctx.deps.status_queue.put(f"Searching: {query}")
 
     logger.info("Agent searching documents", query=query, conversation_id=ctx.deps.conversation_id)
-    results: list[SearchResult] = await search_chunks(
-        query=query,
+    results = await take_speculative_results(ctx.deps.speculative, query)
+    if results is None:
+        async with _tool_session(ctx.deps) as session:
+            results = await search_chunks(
+                query=query,
+                conversation_id=ctx.deps.conversation_id,
+                session=session,
+                top_k=10,
+                snippets=snippets,
+            )
+    else:
+        results = focus_results(results, query, snippets)
+
+    # Summarize what was found
+    doc_labels = sorted({r.doc_label for r in results})
+    summary = f"Found {len(results)} results across {', '.join(doc_labels) if doc_labels else 'no documents'}"
+    await ctx.deps.status_queue.put(summary)
+
+    return format_search_results(results)
+
+
+MAX_BATCH_QUERIES = 6
+
+
+@chat_agent.tool  # type: ignore[misc]
+async def search_documents_batch(
+    ctx: RunContext[ChatDeps], queries: list[str], snippets: bool | None = None
+) -> str:
+    """Search uploaded documents for several queries in one step.
+
+    The queries run in parallel and their results are merged and
+    de-duplicated, ranked by how well each passage matches across queries.
+    Prefer this to several separate search_documents calls.
+
+    Args:
+        queries: 2-6 specific search queries, e.g. one per topic, clause or document.
+        snippets: Return only the sentences around the best matches. By default this
+            happens only when the whole passages would not fit; set true for
+            pinpoint lookups, false for summaries that need whole passages.
+    """
+    queries = queries[:MAX_BATCH_QUERIES]
+    await ctx.deps.status_queue.put(f"Searching: {' | '.join(queries)}")
+
+    logger.info(
+        "Agent batch-searching documents",
+        queries=queries,
         conversation_id=ctx.deps.conversation_id,
-        session=ctx.deps.session,  # type: ignore[arg-type]
-        top_k=10,
     )
+    async with _tool_session(ctx.deps) as session:
+        results: list[SearchResult] = await search_chunks_batch(
+            queries=queries,
+            conversation_id=ctx.deps.conversation_id,
+            session=session,
+            top_k=15,
+            snippets=snippets,
+        )
 
-    # Summarize what was found
     doc_labels = sorted({r.doc_label for r in results})
     summary = f"Found {len(results)} results across {', '.join(doc_labels) if doc_labels else 'no documents'}"
     await ctx.deps.status_queue.put(summary)
@@ -155,38 +313,163 @@ async def search_documents(ctx: RunContext[ChatDeps], query: str) -> str:
     return format_search_results(results)
 
 
+@chat_agent.tool  # type: ignore[misc]
+async def read_page(ctx: RunContext[ChatDeps], doc_label: str, page: int) -> str:
+    """Read the full text of one page of a document, without searching.
+
+    Use this when the user asks about a specific page, e.g. "what does page 7 of Doc B say".
+
+    Args:
+        doc_label: The document label, e.g. "Doc B".
+        page: The 1-based page number.
+    """
+    await ctx.deps.status_queue.put(f"Reading {doc_label}, page {page}")
+    logger.info(
+        "Agent reading page",
+        doc_label=doc_label,
+        page=page,
+        conversation_id=ctx.deps.conversation_id,
+    )
+    async with _tool_session(ctx.deps) as session:
+        results = await fetch_page_chunks(session, ctx.deps.conversation_id, doc_label, page)
+    if not results:
+        return f"No text found for page {page} of {doc_label}."
+    return format_document_read(results)
+
+
+@chat_agent.tool  # type: ignore[misc]
+async def read_section(ctx: RunContext[ChatDeps], doc_label: str, section: str) -> str:
+    """Read a whole section or clause of a document, without searching.
+
+    Use this when the user names a section, e.g. "show me Section 3 of the lease".
+
+    Args:
+        doc_label: The document label, e.g. "Doc A".
+        section: The section number and/or title, e.g. "3", "Clause 4.1" or "Rent Review".
+    """
+    await ctx.deps.status_queue.put(f"Reading {doc_label}, {section}")
+    logger.info(
+        "Agent reading section",
+        doc_label=doc_label,
+        section=section,
+        conversation_id=ctx.deps.conversation_id,
+    )
+    async with _tool_session(ctx.deps) as session:
+        results = await fetch_section_chunks(session, ctx.deps.conversation_id, doc_label, section)
+    if not results:
+        return f'No section matching "{section}" found in {doc_label}. Try search_documents.'
+    return format_document_read(results)
+
+
 # ---------------------------------------------------------------------------
 # Streaming chat using agent.iter() for proper tool-call support
 # ---------------------------------------------------------------------------
 
+STREAM_RESET = "__RESET__"
+
+
+@dataclass
+class HistoryMessage:
+    role: str
+    content: str  # cite-stripped (Message.content_plain)
+    # Assistant messages: stored tool calls/results that preceded the answer
+    tool_trace: list[dict[str, Any]] | None = None
+
+
+def _summary_block(summary: str) -> str:
+    return f"Summary of the earlier conversation:\n{summary}\n"
 
-async def chat_with_documents(
-    user_message: str,
-    conversation_history: list[dict[str, str]],
-    deps: ChatDeps,
-) -> AsyncIterator[str]:
-    """Stream a response using the agentic RAG pipeline.
 
-    Uses agent.iter() to properly handle tool calls, then streams the final
-    response text. Yields text chunks AND status markers (prefixed with __STATUS__:).
+def build_message_history(
+    history: list[HistoryMessage], summary: str | None = None
+) -> list[ModelMessage]:
+    """Replay earlier turns as native pydantic-ai messages.
+
+    Assistant answers are preceded by their stored tool calls and results, so
+    the model can reuse what it already retrieved instead of searching again.
+    Earlier turns render identically on every request, which keeps the prefix
+    cacheable (see _model_settings).
     """
-    # Build the prompt with conversation context
-    prompt_parts: list[str] = []
-    if conversation_history:
-        prompt_parts.append("Previous conversation:\n")
-        for msg in conversation_history:
-            role = msg["role"]
-            content = msg["content"]
-            if role == "user":
-                prompt_parts.append(f"User: {content}\n")
-            elif role == "assistant":
-                clean = strip_cite_tags(content)
-                prompt_parts.append(f"Assistant: {clean}\n")
-        prompt_parts.append("\n")
-
-    prompt_parts.append(f"User: {user_message}")
-    full_prompt = "\n".join(prompt_parts)
+    messages: list[ModelMessage] = []
+    for msg in history:
+        if msg.role == "user":
+            parts: list[ModelRequestPart] = []
+            if summary and not messages:
+                parts.append(UserPromptPart(_summary_block(summary)))
+            parts.append(UserPromptPart(msg.content))
+            messages.append(ModelRequest(parts=parts))
+        elif msg.role == "assistant" and messages:
+            if msg.tool_trace and settings.history_replay_tool_results:
+                messages.extend(ModelMessagesTypeAdapter.validate_python(msg.tool_trace))
+            messages.append(ModelResponse(parts=[TextPart(msg.content)]))
+    return messages
+
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to about ``max_tokens``, at a paragraph boundary where possible."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept: list[str] = []
+    used = 0
+    for paragraph in text.split("\n\n"):
+        cost = count_tokens(paragraph) + 1  # the separator
+        if used + cost > max_tokens:
+            if not kept:  # a single oversized paragraph: cut it proportionally
+                kept.append(paragraph[: len(paragraph) * max_tokens // cost])
+            break
+        kept.append(paragraph)
+        used += cost
+    return "\n\n".join(kept) + " [...]"
+
 
+def compact_tool_trace(run_messages: list[ModelMessage]) -> list[dict[str, Any]] | None:
+    """Serialize a run's tool calls and results for replay in later turns.
+
+    Keeps the messages between the user prompt and the final answer (both are
+    stored as the messages themselves), drops per-request instructions and
+    truncates tool results over history_tool_result_max_tokens. Compacting
+    once, at write time, means a turn replays the same way on every later
+    request.
+    """
+    middle = run_messages[1:-1]
+    if not middle:
+        return None
+    limit = settings.history_tool_result_max_tokens
+    compact: list[ModelMessage] = []
+    for message in middle:
+        if isinstance(message, ModelRequest):
+            parts = [
+                replace(part, content=_truncate_tokens(part.content, limit))
+                if isinstance(part, ToolReturnPart) and isinstance(part.content, str)
+                else part
+                for part in message.parts
+            ]
+            message = replace(message, parts=parts, instructions=None)
+        compact.append(message)
+    return ModelMessagesTypeAdapter.dump_python(compact, mode="json")
+
+
+def _model_settings() -> AnthropicModelSettings | None:
+    """Cache breakpoints on the instructions, tool definitions and latest message.
+
+    The last-message breakpoint lets each tool-loop request within a turn reuse
+    the prefix written by the previous one, and the next turn finds that same
+    prefix within Anthropic's block lookback, since history is replayed as-is.
+    """
+    if not settings.prompt_cache_enabled:
+        return None
+    ttl = settings.prompt_cache_ttl
+    return AnthropicModelSettings(
+        anthropic_cache_instructions=ttl,
+        anthropic_cache_tool_definitions=ttl,
+        anthropic_cache_messages=ttl,
+    )
+
+
+async def _stream_agent(
+    prompt: str | list[UserContent], message_history: list[ModelMessage], deps: ChatDeps
+) -> AsyncIterator[str]:
+    """Run the agent, yielding answer text deltas, web search statuses and resets."""
     # Use agent.iter() to step through the graph, handling tool calls properly
     logger.info(
         "Starting agent iteration",
@@ -194,7 +477,12 @@ async def chat_with_documents(
         builtin_tools=[t.kind for t in chat_agent._builtin_tools],
         function_tools=list(chat_agent._function_toolset.tools.keys()),
     )
-    async with chat_agent.iter(full_prompt, deps=deps) as run:
+    async with chat_agent.iter(
+        prompt,
+        message_history=message_history,
+        deps=deps,
+        model_settings=_model_settings(),
+    ) as run:
         async for node in run:
             logger.debug(
                 "Agent node",
@@ -202,60 +490,142 @@ async def chat_with_documents(
                 conversation_id=deps.conversation_id,
             )
 
-            # Drain status messages from the tool queue
-            while not deps.status_queue.empty():
-                try:
-                    status = deps.status_queue.get_nowait()
-                    yield f"__STATUS__:{status}"
-                except asyncio.QueueEmpty:
-                    break
-
-            # When we hit the final node (agent is about to produce final text),
-            # stream it. The final node is a CallToolsNode with only text (no tool calls).
-            if hasattr(node, 'model_response'):
-                response = node.model_response  # type: ignore[attr-defined]
+            if not Agent.is_model_request_node(node):
+                continue
+
+            # Stream the model response, forwarding text deltas as they arrive.
+            # Builtin tool calls (web_search) are resolved server-side within the
+            # same response and don't interrupt the answer; a function tool call
+            # means any text so far was preamble ("Let me search..."), not the answer.
+            streamed_text = False
+            calls_tools = False
+            web_results = False
+            async with node.stream(run.ctx) as request_stream:
+                async for event in request_stream:
+                    if isinstance(event, PartStartEvent):
+                        part = event.part
+                        if isinstance(part, TextPart):
+                            if part.content and not calls_tools:
+                                streamed_text = True
+                                yield part.content
+                        elif isinstance(part, ToolCallPart):
+                            calls_tools = True
+                            if streamed_text:
+                                streamed_text = False
+                                yield STREAM_RESET
+                        elif (
+                            isinstance(part, BuiltinToolReturnPart)
+                            and part.tool_name == "web_search"
+                            and not web_results
+                        ):
+                            web_results = True
+                            yield "__STATUS__:Found web results"
+                    elif isinstance(event, PartDeltaEvent):
+                        delta = event.delta
+                        if isinstance(delta, TextPartDelta) and not calls_tools:
+                            streamed_text = True
+                            yield delta.content_delta
+                    elif isinstance(event, PartEndEvent):
+                        # Builtin tool args arrive as deltas — report the query once complete
+                        part = event.part
+                        if isinstance(part, BuiltinToolCallPart) and part.tool_name == "web_search":
+                            args = part.args
+                            query = ""
+                            if isinstance(args, dict):
+                                query = str(args.get("query", ""))
+                            elif isinstance(args, str):
+                                query = args
+                            logger.info(
+                                "Web search triggered",
+                                query=query,
+                                conversation_id=deps.conversation_id,
+                            )
+                            yield f"__STATUS__:Web search: {query}"
 
-                part_kinds = [getattr(p, 'part_kind', '?') for p in response.parts]
                 logger.info(
                     "Agent response parts",
-                    part_kinds=part_kinds,
+                    part_kinds=[p.part_kind for p in request_stream.get().parts],
                     conversation_id=deps.conversation_id,
                 )
+            # Running total, so a run cancelled mid-way still reports what it spent
+            deps.usage = run.usage()
+
+        new_messages = run.new_messages()
+        deps.tool_trace = compact_tool_trace(new_messages)
+        tool_calls = sum(
+            1
+            for m in new_messages
+            if isinstance(m, ModelResponse)
+            for p in m.parts
+            if isinstance(p, ToolCallPart)
+        )
+        metrics.observe("chat.tool_calls", tool_calls)
+
+        # Summed over every model request in the run; input_tokens includes cached tokens
+        deps.usage = run.usage()
+        logger.info(
+            "Agent usage",
+            conversation_id=deps.conversation_id,
+            requests=deps.usage.requests,
+            tool_calls=tool_calls,
+            replayed_messages=len(message_history),
+            input_tokens=deps.usage.input_tokens,
+            cache_read_tokens=deps.usage.cache_read_tokens,
+            cache_write_tokens=deps.usage.cache_write_tokens,
+            output_tokens=deps.usage.output_tokens,
+        )
 
-                # Detect web_search builtin tool calls and emit status
-                web_search_count = 0
-                for part in response.parts:
-                    if getattr(part, 'part_kind', None) == 'builtin-tool-call' and getattr(part, 'tool_name', None) == 'web_search':
-                        query = ""
-                        args = getattr(part, 'args', None)
-                        if isinstance(args, dict):
-                            query = args.get('query', '')
-                        elif isinstance(args, str):
-                            query = args
-                        logger.info("Web search triggered", query=query, conversation_id=deps.conversation_id)
-                        yield f"__STATUS__:Web search: {query}"
-                        web_search_count += 1
-                if web_search_count:
-                    yield "__STATUS__:Found web results"
-
-                # Check if this is the final response (has text parts, no pending function tool calls).
-                # Builtin tool calls (part_kind='builtin-tool-call') are resolved server-side
-                # and don't block text extraction — only function tool calls do.
-                text_parts = [p for p in response.parts if getattr(p, 'part_kind', None) == 'text']
-                fn_tool_parts = [p for p in response.parts if getattr(p, 'part_kind', None) == 'tool-call']
-
-                if text_parts and not fn_tool_parts:
-                    # This is the final answer — yield the text
-                    for part in text_parts:
-                        yield part.content
-
-    # Drain any remaining status messages
-    while not deps.status_queue.empty():
-        try:
-            status = deps.status_queue.get_nowait()
-            yield f"__STATUS__:{status}"
-        except asyncio.QueueEmpty:
-            break
+
+async def chat_with_documents(
+    user_message: str,
+    conversation_history: list[HistoryMessage],
+    deps: ChatDeps,
+    summary: str | None = None,
+) -> AsyncGenerator[str, None]:
+    """Stream a response using the agentic RAG pipeline.
+
+    Uses agent.iter() to properly handle tool calls and streams each model
+    response as it is generated. Yields text deltas, status markers (prefixed
+    with __STATUS__:) and STREAM_RESET when text already yielded turns out to be
+    preamble to a tool call and should be discarded.
+    """
+    message_history = build_message_history(conversation_history, summary)
+    prompt: str | list[UserContent] = user_message
+    if summary and not message_history:
+        prompt = [_summary_block(summary), user_message]
+
+    # The agent run and the tool status queue are consumed concurrently and
+    # merged into one stream, so a status is emitted the moment a tool pushes
+    # it — while the tool is still running or the model is still streaming.
+    merged: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def run_agent() -> None:
+        async for chunk in _stream_agent(prompt, message_history, deps):
+            merged.put_nowait(chunk)
+
+    async def forward_status() -> None:
+        while True:
+            merged.put_nowait(f"__STATUS__:{await deps.status_queue.get()}")
+
+    agent_task = asyncio.create_task(run_agent())
+    status_task = asyncio.create_task(forward_status())
+    agent_task.add_done_callback(lambda _task: merged.put_nowait(None))
+    try:
+        while (item := await merged.get()) is not None:
+            yield item
+        status_task.cancel()
+        agent_task.result()  # re-raise errors from the agent run
+
+        # Statuses queued just before the run finished
+        while not merged.empty():
+            item = merged.get_nowait()
+            if item is not None:
+                yield item
+        while not deps.status_queue.empty():
+            yield f"__STATUS__:{deps.status_queue.get_nowait()}"
+    finally:
+        status_task.cancel()
+        agent_task.cancel()
 
 
 # ---------------------------------------------------------------------------
@@ -285,14 +655,15 @@ def extract_citations(response: str) -> list[Citation]:
 
 def strip_cite_tags(text: str) -> str:
     """Strip <cite> XML tags, leaving just the quoted text with a readable reference."""
+
     def _replace(m: re.Match[str]) -> str:
         doc = m.group(1)
         page = m.group(2)
         section = m.group(3)
         quoted = m.group(4).strip()
         if section:
-            return f'{quoted} [{doc}, {section}, p.{page}]'
-        return f'{quoted} [{doc}, p.{page}]'
+            return f"{quoted} [{doc}, {section}, p.{page}]"
+        return f"{quoted} [{doc}, p.{page}]"
 
     return CITE_RE.sub(_replace, text)
 
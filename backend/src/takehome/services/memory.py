@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+
+import structlog
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.config import settings
+from takehome.db.models import Conversation, Message
+from takehome.db.session import async_session
+from takehome.services.llm import HistoryMessage, strip_cite_tags, summarize_conversation
+from takehome.services.metrics import metrics
+from takehome.services.rag import count_tokens
+
+logger = structlog.get_logger()
+
+# ---------------------------------------------------------------------------
+# Token-budgeted conversation memory
+#
+# The prompt carries a rolling summary of the oldest messages plus every
+# message after it verbatim. Only that unsummarized tail is loaded from the
+# database. Once the turns that no longer fit the recent window
+# (memory_recent_turns / memory_token_budget) add up to
+# memory_summary_batch_turns, a background task folds them into the summary.
+# Folding in batches keeps the prompt prefix — and so Anthropic's prompt
+# cache — stable between folds, while bounding the tail to the window plus
+# one batch.
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ConversationMemory:
+    conversation_id: str
+    summary: str | None
+    summarized_count: int
+    # Unsummarized messages, oldest first
+    history: list[HistoryMessage]
+    # Oldest messages outside the recent window, folded once they fill a batch
+    overflow: list[Message]
+    overflow_turns: int
+
+    @property
+    def is_empty(self) -> bool:
+        return self.summarized_count == 0 and not self.history
+
+
+def plain_content(message: Message) -> str:
+    """The message as replayed to the model; strips cite tags only for legacy rows."""
+    if message.content_plain is not None:
+        return message.content_plain
+    return strip_cite_tags(message.content) if message.role == "assistant" else message.content
+
+
+def _message_tokens(message: Message) -> int:
+    tokens = count_tokens(plain_content(message))
+    if message.tool_trace and settings.history_replay_tool_results:
+        # Replayed tool calls/results count too; ~4 characters per token is close enough
+        tokens += len(json.dumps(message.tool_trace)) // 4
+    return tokens
+
+
+def _split_turns(messages: list[Message]) -> list[list[Message]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: list[list[Message]] = []
+    for message in messages:
+        if message.role == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _recent_window(turns: list[list[Message]]) -> tuple[int, int]:
+    """Index of the first turn in the recent window, and the window's tokens.
+
+    Walks back from the newest turn while the turn and token limits allow;
+    the newest turn is always kept.
+    """
+    tokens = 0
+    start = len(turns)
+    for i in range(len(turns) - 1, -1, -1):
+        turn_tokens = sum(_message_tokens(m) for m in turns[i])
+        if start < len(turns) and (
+            len(turns) - i > settings.memory_recent_turns
+            or tokens + turn_tokens > settings.memory_token_budget
+        ):
+            break
+        tokens += turn_tokens
+        start = i
+    return start, tokens
+
+
+async def load_memory(
+    session: AsyncSession, conversation: Conversation, exclude_message_id: str | None = None
+) -> ConversationMemory:
+    """Load the summary and the unsummarized messages of a conversation."""
+    stmt = (
+        select(Message)
+        .where(Message.conversation_id == conversation.id)
+        .order_by(Message.created_at.asc())
+        .offset(conversation.summary_message_count)
+    )
+    if exclude_message_id is not None:
+        stmt = stmt.where(Message.id != exclude_message_id)
+    result = await session.execute(stmt)
+    messages = list(result.scalars().all())
+
+    turns = _split_turns(messages)
+    window_start, tokens = _recent_window(turns)
+    metrics.observe("memory.window_tokens", tokens)
+    return ConversationMemory(
+        conversation_id=conversation.id,
+        summary=conversation.summary,
+        summarized_count=conversation.summary_message_count,
+        history=[HistoryMessage(m.role, plain_content(m), m.tool_trace) for m in messages],
+        overflow=[m for turn in turns[:window_start] for m in turn],
+        overflow_turns=window_start,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Background summary folding
+# ---------------------------------------------------------------------------
+
+_background_tasks: set[asyncio.Task[None]] = set()
+_folding: set[str] = set()
+
+
+async def _fold(memory: ConversationMemory) -> None:
+    conversation_id = memory.conversation_id
+    try:
+        summary = await summarize_conversation(
+            memory.summary, [(m.role, plain_content(m)) for m in memory.overflow]
+        )
+        async with async_session() as session:
+            # Conditional on the count we read, so a concurrent fold in another
+            # worker can't double-count messages
+            result = await session.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .where(Conversation.summary_message_count == memory.summarized_count)
+                .values(
+                    summary=summary,
+                    summary_message_count=memory.summarized_count + len(memory.overflow),
+                )
+            )
+            await session.commit()
+        if result.rowcount:  # type: ignore[attr-defined]
+            metrics.incr("memory.folds")
+            metrics.incr("memory.folded_messages", len(memory.overflow))
+        logger.info(
+            "Folded messages into conversation summary",
+            conversation_id=conversation_id,
+            messages=len(memory.overflow),
+            applied=bool(result.rowcount),  # type: ignore[attr-defined]
+        )
+    except Exception:
+        logger.exception("Failed to update conversation summary", conversation_id=conversation_id)
+    finally:
+        _folding.discard(conversation_id)
+
+
+def schedule_summary_fold(memory: ConversationMemory) -> None:
+    """Fold the overflow into the summary in the background once it fills a batch."""
+    if memory.overflow_turns < settings.memory_summary_batch_turns:
+        return
+    if memory.conversation_id in _folding:
+        return
+    _folding.add(memory.conversation_id)
+    task = asyncio.create_task(_fold(memory))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+# ---------------------------------------------------------------------------
+# Lightweight in-process metrics
+#
+# Counters and distributions are per worker process and reset on restart.
+# They are exposed read-only via GET /api/metrics.
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Distribution:
+    count: int = 0
+    total: float = 0.0
+    min: float = 0.0
+    max: float = 0.0
+
+    def add(self, value: float) -> None:
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def as_dict(self) -> dict[str, float]:
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "total": round(self.total, 3),
+            "mean": round(mean, 3),
+            "min": round(self.min, 3),
+            "max": round(self.max, 3),
+        }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._counters: dict[str, float] = {}
+        self._distributions: dict[str, _Distribution] = {}
+        self._ratios: dict[str, tuple[str, str]] = {}
+
+    def incr(self, name: str, value: float = 1.0) -> None:
+        """Increment a monotonically increasing counter."""
+        self._counters[name] = self._counters.get(name, 0.0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation (latency in ms, batch size, ...) of a distribution."""
+        self._distributions.setdefault(name, _Distribution()).add(value)
+
+    def register_ratio(self, name: str, numerator: str, denominator: str) -> None:
+        """Report ``numerator / denominator`` counters as a derived value in snapshots."""
+        self._ratios[name] = (numerator, denominator)
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0.0)
+
+    def mean(self, name: str) -> float | None:
+        dist = self._distributions.get(name)
+        if dist is None or dist.count == 0:
+            return None
+        return dist.total / dist.count
+
+    def snapshot(self) -> dict[str, Any]:
+        ratios: dict[str, float] = {}
+        for name, (num, den) in self._ratios.items():
+            denominator = self._counters.get(den, 0.0)
+            ratios[name] = (
+                round(self._counters.get(num, 0.0) / denominator, 4) if denominator else 0.0
+            )
+        return {
+            "counters": dict(sorted(self._counters.items())),
+            "distributions": {
+                name: dist.as_dict() for name, dist in sorted(self._distributions.items())
+            },
+            "ratios": ratios,
+        }
+
+    def reset(self) -> None:
+        self._counters.clear()
+        self._distributions.clear()
+
+
+metrics = Metrics()
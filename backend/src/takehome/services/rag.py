@@ -1,18 +1,39 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import math
+import os
 import re
+import time
+import unicodedata
 import uuid
-from dataclasses import dataclass
+from collections.abc import Awaitable
+from collections.abc import Set as AbstractSet
+from dataclasses import dataclass, replace
+from datetime import timedelta
+from typing import Any, Literal
 
 import structlog
 import tiktoken
 from openai import AsyncOpenAI
-from rank_bm25 import BM25Okapi
-from sqlalchemy import select, text
+from sqlalchemy import Row, func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from takehome.config import settings  # noqa: F401 — triggers env export
-from takehome.db.models import Document, DocumentChunk
+from takehome.config import settings
+from takehome.db.models import Document, DocumentChunk, QueryEmbedding
+from takehome.db.session import async_session
+from takehome.services.batcher import MicroBatcher
+from takehome.services.cache import LRUCache
+from takehome.services.conversation import bump_corpus_version, get_corpus_version
+from takehome.services.index import (
+    ConversationIndex,
+    defined_term_key,
+    load_conversation_index,
+)
+from takehome.services.index_cache import get_conversation_index, publish_conversation_index
+from takehome.services.metrics import metrics
 
 logger = structlog.get_logger()
 
@@ -38,7 +59,8 @@ def _get_encoder() -> tiktoken.Encoding:
     return _encoder
 
 
-def _count_tokens(text: str) -> int:
+def count_tokens(text: str) -> int:
+    """Tokens in ``text`` under the cl100k_base encoding used for all budgets."""
     return len(_get_encoder().encode(text))
 
 
@@ -46,6 +68,11 @@ def _count_tokens(text: str) -> int:
 # Data structures
 # ---------------------------------------------------------------------------
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+# Shortened embedding used for the coarse ANN pass of two-stage vector search
+COARSE_EMBEDDING_DIMENSIONS = 256
+
 CHUNK_TARGET_TOKENS = 500
 CHUNK_OVERLAP_TOKENS = 50
 
@@ -72,6 +99,9 @@ class SearchResult:
     page_number: int
     section_header: str | None
     score: float
+    chunk_index: int | None = None
+    # True when ``content`` is a query-focused excerpt rather than the whole chunk
+    snippet: bool = False
 
 
 # ---------------------------------------------------------------------------
@@ -129,10 +159,13 @@ def chunk_document(extracted_text: str) -> list[ChunkInfo]:
                     )
                 )
                 # Overlap: keep the last part if it's small enough
-                if current_chunk_parts and _count_tokens(current_chunk_parts[-1]) <= CHUNK_OVERLAP_TOKENS:
+                if (
+                    current_chunk_parts
+                    and count_tokens(current_chunk_parts[-1]) <= CHUNK_OVERLAP_TOKENS
+                ):
                     overlap_part = current_chunk_parts[-1]
                     current_chunk_parts = [overlap_part]
-                    current_tokens = _count_tokens(overlap_part)
+                    current_tokens = count_tokens(overlap_part)
                 else:
                     current_chunk_parts = []
                     current_tokens = 0
@@ -197,13 +230,13 @@ async def generate_chunk_contexts(
             f"{chunk.content}\n"
             "</chunk>\n\n"
             "Return a JSON object with exactly two fields:\n"
-            "1. \"context\": A short succinct context (2-3 sentences) to situate this chunk "
+            '1. "context": A short succinct context (2-3 sentences) to situate this chunk '
             "within the overall document for the purposes of improving search retrieval. "
             "If this is a legal document, mention the document type, relevant section/clause, "
             "parties involved, and any defined terms.\n"
-            "2. \"section\": The specific section, clause, or article identifier this chunk falls under "
-            "(e.g. \"Section 3 — Rent\", \"4.1 Tenant's Obligations\", \"Clause 7.2\", "
-            "\"Executive Summary\"). Use the exact heading from the document. "
+            '2. "section": The specific section, clause, or article identifier this chunk falls under '
+            '(e.g. "Section 3 — Rent", "4.1 Tenant\'s Obligations", "Clause 7.2", '
+            '"Executive Summary"). Use the exact heading from the document. '
             "If no clear section applies, use null.\n\n"
             "Return ONLY the JSON object, no other text."
         )
@@ -232,7 +265,9 @@ async def generate_chunk_contexts(
                 results.append(ChunkMetadata(context=context, section=section))
             except _json.JSONDecodeError:
                 # Fallback: treat entire response as context
-                logger.warning("Failed to parse JSON from Haiku, using raw text", page=chunk.page_number)
+                logger.warning(
+                    "Failed to parse JSON from Haiku, using raw text", page=chunk.page_number
+                )
                 results.append(ChunkMetadata(context=raw, section=None))
         except Exception:
             logger.exception("Failed to generate context for chunk", page=chunk.page_number)
@@ -246,19 +281,205 @@ async def generate_chunk_contexts(
 # ---------------------------------------------------------------------------
 
 
-async def embed_texts(texts: list[str]) -> list[list[float]]:
-    """Embed a batch of texts using OpenAI text-embedding-3-small."""
+async def embed_texts(texts: list[str], dimensions: int | None = None) -> list[list[float]]:
+    """Embed a batch of texts using OpenAI text-embedding-3-small.
+
+    ``dimensions`` asks the model for a shortened embedding; by default the
+    full 1536-dimensional vector is returned.
+    """
     if not texts:
         return []
 
     client = _get_openai()
-    response = await client.embeddings.create(
-        model="text-embedding-3-small",
-        input=texts,
-    )
+    if dimensions is None:
+        response = await client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    else:
+        response = await client.embeddings.create(
+            model=EMBEDDING_MODEL, input=texts, dimensions=dimensions
+        )
     return [item.embedding for item in response.data]
 
 
+def shorten_embedding(embedding: list[float], dimensions: int) -> list[float]:
+    """Truncate a full embedding to its first ``dimensions`` and re-normalize.
+
+    text-embedding-3 models are trained so that this is equivalent to
+    requesting ``dimensions`` from the API, so one embedding call yields
+    both the full and the coarse vector.
+    """
+    head = embedding[:dimensions]
+    norm = math.sqrt(sum(x * x for x in head))
+    return [x / norm for x in head] if norm else head
+
+
+# -- Query embedding cache ---------------------------------------------------
+#
+# Agents repeat and lightly rephrase queries, so query embeddings are cached
+# under a normalized form of the query: first in a per-process LRU, then
+# (optionally) in the shared ``query_embeddings`` table so other workers and
+# restarts benefit too. Both tiers honour the same TTL.
+
+_query_embedding_cache: LRUCache[str, list[float]] = LRUCache(
+    maxsize=settings.query_embedding_cache_size,
+    ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+)
+_shared_cache_writes = 0
+_SHARED_CACHE_PRUNE_EVERY = 256
+# Shared-tier writes run off the search path; held here so they aren't collected
+_background_tasks: set[asyncio.Task[None]] = set()
+
+metrics.register_ratio(
+    "embedding_cache.hit_rate", "embedding_cache.hits", "embedding_cache.lookups"
+)
+
+
+async def _embed_query_batch(queries: list[str]) -> list[list[float]]:
+    return await embed_texts(queries)
+
+
+# Cache misses from concurrent chats arriving within a few milliseconds are
+# embedded together in one API call instead of one request each.
+_query_embedding_batcher: MicroBatcher[str, list[float]] = MicroBatcher(
+    _embed_query_batch,
+    max_batch=settings.query_embedding_batch_max_size,
+    max_wait_ms=settings.query_embedding_batch_max_wait_ms,
+    name="embedding_batch",
+)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so trivial variations share a cache entry."""
+    normalized = unicodedata.normalize("NFKC", query).casefold()
+    normalized = " ".join(normalized.split())
+    return normalized.rstrip("?!.;: ")
+
+
+def _query_cache_key(normalized_query: str) -> str:
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\n{normalized_query}".encode()).hexdigest()
+
+
+def _record_cache_hit(tier: str, lookup_ms: float) -> None:
+    metrics.incr("embedding_cache.hits")
+    metrics.incr(f"embedding_cache.hits.{tier}")
+    # Saved latency is estimated from the running mean of real embedding calls
+    miss_latency_ms = metrics.mean("embedding_cache.miss_latency_ms")
+    if miss_latency_ms is not None:
+        metrics.incr("embedding_cache.saved_ms", max(0.0, miss_latency_ms - lookup_ms))
+
+
+async def _load_shared_query_embedding(cache_key: str) -> list[float] | None:
+    stmt = select(QueryEmbedding.embedding).where(
+        QueryEmbedding.cache_key == cache_key,
+        QueryEmbedding.created_at
+        > func.now() - timedelta(seconds=settings.query_embedding_cache_ttl_seconds),
+    )
+    try:
+        async with async_session() as session:
+            embedding = (await session.execute(stmt)).scalar_one_or_none()
+    except Exception:
+        logger.exception("Shared query embedding cache lookup failed")
+        return None
+    return [float(x) for x in embedding] if embedding is not None else None
+
+
+async def _store_shared_query_embedding(
+    cache_key: str, normalized_query: str, embedding: list[float]
+) -> None:
+    global _shared_cache_writes
+    stmt = (
+        pg_insert(QueryEmbedding)
+        .values(
+            cache_key=cache_key, model=EMBEDDING_MODEL, query=normalized_query, embedding=embedding
+        )
+        .on_conflict_do_update(
+            index_elements=[QueryEmbedding.cache_key],
+            set_={"embedding": embedding, "created_at": func.now()},
+        )
+    )
+    try:
+        async with async_session() as session:
+            await session.execute(stmt)
+            _shared_cache_writes += 1
+            if _shared_cache_writes % _SHARED_CACHE_PRUNE_EVERY == 0:
+                await session.execute(
+                    text(
+                        """
+                        DELETE FROM query_embeddings
+                        WHERE created_at < now() - make_interval(secs => :ttl)
+                           OR cache_key IN (
+                               SELECT cache_key FROM query_embeddings
+                               ORDER BY created_at DESC
+                               OFFSET :max_rows
+                           )
+                        """
+                    ),
+                    {
+                        "ttl": settings.query_embedding_cache_ttl_seconds,
+                        "max_rows": settings.query_embedding_cache_shared_max_rows,
+                    },
+                )
+            await session.commit()
+    except Exception:
+        logger.exception("Shared query embedding cache write failed")
+
+
+async def embed_query(query: str) -> list[float]:
+    """Embed a single search query, going through the query embedding cache."""
+    return (await embed_queries([query]))[0]
+
+
+async def embed_queries(queries: list[str]) -> list[list[float]]:
+    """Embed search queries through the cache; all misses share one API call."""
+    normalized = [normalize_query(q) or q for q in queries]
+    embeddings: list[list[float] | None] = []
+
+    start = time.perf_counter()
+    for norm in normalized:
+        metrics.incr("embedding_cache.lookups")
+        cached = _query_embedding_cache.get(norm)
+        if cached is not None:
+            _record_cache_hit("memory", (time.perf_counter() - start) * 1000)
+        embeddings.append(cached)
+
+    missing = sorted(
+        {norm for norm, emb in zip(normalized, embeddings, strict=True) if emb is None}
+    )
+    resolved: dict[str, list[float]] = {}
+
+    if missing and settings.query_embedding_cache_shared:
+        shared = await asyncio.gather(
+            *(_load_shared_query_embedding(_query_cache_key(norm)) for norm in missing)
+        )
+        for norm, emb in zip(missing, shared, strict=True):
+            if emb is not None:
+                _query_embedding_cache.put(norm, emb)
+                _record_cache_hit("postgres", (time.perf_counter() - start) * 1000)
+                resolved[norm] = emb
+        missing = [norm for norm in missing if norm not in resolved]
+
+    if missing:
+        metrics.incr("embedding_cache.misses", len(missing))
+        embed_start = time.perf_counter()
+        fresh = await _query_embedding_batcher.submit_many(missing)
+        metrics.observe(
+            "embedding_cache.miss_latency_ms", (time.perf_counter() - embed_start) * 1000
+        )
+        for norm, emb in zip(missing, fresh, strict=True):
+            _query_embedding_cache.put(norm, emb)
+            resolved[norm] = emb
+            if settings.query_embedding_cache_shared:
+                task = asyncio.create_task(
+                    _store_shared_query_embedding(_query_cache_key(norm), norm, emb)
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+
+    return [
+        emb if emb is not None else resolved[norm]
+        for norm, emb in zip(normalized, embeddings, strict=True)
+    ]
+
+
 # ---------------------------------------------------------------------------
 # 4. Full ingestion pipeline
 # ---------------------------------------------------------------------------
@@ -309,141 +530,933 @@ async def process_document(session: AsyncSession, document: Document) -> list[Do
             page_number=chunk.page_number,
             section_header=meta.section,
             embedding=emb,
+            **_tier_embedding(emb),
             token_count=chunk.token_count,
         )
         session.add(db_chunk)
         db_chunks.append(db_chunk)
 
+    await bump_corpus_version(session, document.conversation_id)
     await session.commit()
+    await refresh_search_index(session, document.conversation_id)
     logger.info("Stored chunks in DB", document_id=document.id, num_chunks=len(db_chunks))
 
     return db_chunks
 
 
+async def refresh_search_index(session: AsyncSession, conversation_id: str) -> None:
+    """Publish the conversation's new index version (snapshot + local cache)."""
+    try:
+        corpus_version = await get_corpus_version(session, conversation_id)
+        await publish_conversation_index(conversation_id, corpus_version)
+    except Exception:
+        # Searches still work: they rebuild from the database on demand
+        logger.exception("Failed to publish conversation index", conversation_id=conversation_id)
+
+
 # ---------------------------------------------------------------------------
 # 5. Hybrid search: pgvector + BM25 + Reciprocal Rank Fusion
 # ---------------------------------------------------------------------------
 
 
+# Results only change when the conversation's documents do, so they are cached
+# under the conversation's corpus version, which every ingest/delete bumps.
+_search_result_cache: LRUCache[tuple[str, int, str, int], list[SearchResult]] = LRUCache(
+    maxsize=settings.search_result_cache_size,
+)
+
+metrics.register_ratio("search_cache.hit_rate", "search_cache.hits", "search_cache.lookups")
+
+
 async def search_chunks(
     query: str,
     conversation_id: str,
     session: AsyncSession,
     top_k: int = 10,
+    snippets: bool | None = False,
 ) -> list[SearchResult]:
-    """Hybrid search: vector similarity + BM25 keyword search merged with RRF."""
-    # Embed the query
-    query_embeddings = await embed_texts([query])
-    if not query_embeddings:
-        return []
-    query_embedding = query_embeddings[0]
+    """Hybrid search: vector similarity + BM25 keyword search merged with RRF.
 
-    # Load all chunks for this conversation's documents
-    stmt = (
-        select(DocumentChunk, Document.label, Document.filename)
-        .join(Document, DocumentChunk.document_id == Document.id)
-        .where(Document.conversation_id == conversation_id)
+    With ``snippets`` each result's content is cut down to the sentences
+    around its best query matches (see focus_results).
+    """
+    normalized = normalize_query(query)
+    corpus_version = await get_corpus_version(session, conversation_id)
+    cache_key = (conversation_id, corpus_version, normalized, top_k)
+
+    metrics.incr("search_cache.lookups")
+    cached = _search_result_cache.get(cache_key)
+    if cached is not None:
+        metrics.incr("search_cache.hits")
+        results = list(cached)
+    else:
+        results: list[SearchResult] = []
+        index: ConversationIndex | None = None
+        defined_terms: frozenset[str] = frozenset()
+        if defined_term_candidate(query):
+            index = await _search_index(conversation_id, corpus_version)
+            defined_terms = index.defined_terms
+        route = classify_query(query, defined_terms)
+        if route == "lexical":
+            index = index or await _search_index(conversation_id, corpus_version)
+            results = _keyword_search(index, query, top_k)
+            if not results:
+                route = "hybrid"  # nothing matched literally; let the vector leg try
+        if route == "hybrid":
+            results = await _hybrid_search(
+                normalized or query, conversation_id, corpus_version, top_k
+            )
+        _log_route(query, route)
+        _search_result_cache.put(cache_key, list(results))
+    return focus_results(results, query, snippets)
+
+
+# -- Query routing -----------------------------------------------------------
+#
+# Exact lookups ("clause 4.1", "NGL885533", "Schedule 3", a quoted phrase, a
+# bare defined term) are answered by the keyword leg alone: the vector leg
+# adds an embedding round trip and only dilutes the exact match. A Title Case
+# phrase only counts as a defined term if the documents define it ("Permitted
+# Use" means ...); otherwise "Rent Review Provisions" or "Summary" would lose
+# the vector leg whenever one of their words happened to match.
+
+_QUOTED_RE = re.compile(r'"[^"]+"|“[^”]+”|‘[^’]+’')
+_REFERENCE_RE = re.compile(
+    r"\b(?:clause|section|schedule|paragraph|para|part|annex|appendix|article|rule|"
+    r"regulation|sub-clause|item)\s+[0-9ivxlc]+(?:\.\d+)*[a-z]?\b",
+    re.IGNORECASE,
+)
+# Title numbers and other codes: a letter/digit token with at least three digits
+_IDENTIFIER_RE = re.compile(r"\b(?=[A-Za-z0-9-]*\d{3})(?=[A-Za-z0-9-]*[A-Za-z])[A-Za-z0-9-]+\b")
+_NUMBERED_RE = re.compile(r"^\d+(?:\.\d+)+[a-z]?$")
+_DEFINED_TERM_RE = re.compile(r"^(?:[A-Z][\w'’-]*)(?:\s+(?:of|the|and|[A-Z][\w'’-]*)){0,4}$")
+_QUOTE_CHARS_RE = re.compile(r"[\"“”‘’]")
+
+# Lookups longer than this are treated as questions, whatever they contain
+LEXICAL_MAX_WORDS = 6
+
+
+def _strip_query(query: str) -> str:
+    return query.strip().rstrip("?!.")
+
+
+def defined_term_candidate(query: str) -> bool:
+    """Whether the query is shaped like a bare defined term (routing needs the corpus)."""
+    return bool(_DEFINED_TERM_RE.match(_strip_query(query)))
+
+
+def classify_query(
+    query: str, defined_terms: AbstractSet[str] = frozenset()
+) -> Literal["lexical", "hybrid"]:
+    """Route exact-lookup queries to keyword-only retrieval.
+
+    ``defined_terms`` holds the corpus's defined terms (see
+    ConversationIndex.defined_terms); without them no bare phrase is lexical.
+    """
+    stripped = _strip_query(query)
+    if _QUOTED_RE.search(stripped):
+        return "lexical"
+    if len(stripped.split()) > LEXICAL_MAX_WORDS:
+        return "hybrid"
+    if (
+        _REFERENCE_RE.search(stripped)
+        or _IDENTIFIER_RE.search(stripped)
+        or _NUMBERED_RE.match(stripped)
+        or (_DEFINED_TERM_RE.match(stripped) and defined_term_key(stripped) in defined_terms)
+    ):
+        return "lexical"
+    return "hybrid"
+
+
+def _keyword_query(query: str) -> str:
+    """Query text for the keyword leg — quote marks would stop tokens matching."""
+    return _QUOTE_CHARS_RE.sub(" ", query)
+
+
+def _log_route(query: str, route: str) -> None:
+    metrics.incr(f"search.route.{route}")
+    logger.info("Search routed", route=route, query=query)
+
+
+async def _search_index(conversation_id: str, corpus_version: int) -> ConversationIndex:
+    if settings.index_cache_enabled:
+        return await get_conversation_index(conversation_id, corpus_version)
+    return await load_conversation_index(conversation_id, corpus_version, with_embeddings=False)
+
+
+def _keyword_search(index: ConversationIndex, query: str, top_k: int) -> list[SearchResult]:
+    keyword_ranks = index.keyword_ranks(
+        _keyword_query(query), RETRIEVAL_CANDIDATES, matched_only=True
     )
-    result = await session.execute(stmt)
-    rows = result.all()
+    return _fuse_candidates(index, [keyword_ranks], top_k)
+
+
+# Candidates each leg contributes to fusion
+RETRIEVAL_CANDIDATES = 20
+RRF_K = 60  # RRF constant
+
+
+async def _hybrid_search(
+    query: str,
+    conversation_id: str,
+    corpus_version: int,
+    top_k: int,
+) -> list[SearchResult]:
+    if settings.index_cache_enabled:
+        # Hot path: both legs score against the in-memory index; only the
+        # query embedding (usually cached) can touch the network.
+        index, query_embedding = await asyncio.gather(
+            get_conversation_index(conversation_id, corpus_version),
+            embed_query(query),
+        )
+        vector_ranks = index.vector_ranks(query_embedding, RETRIEVAL_CANDIDATES)
+    else:
+        # The keyword leg needs no embedding, so both legs run concurrently —
+        # each on its own pooled connection, since one AsyncSession can't serve
+        # overlapping queries. Latency is max(legs) rather than their sum.
+        index, vector_ranks = await _run_legs(
+            load_conversation_index(conversation_id, corpus_version, with_embeddings=False),
+            _vector_leg(query, conversation_id),
+        )
+    keyword_ranks = index.keyword_ranks(_keyword_query(query), RETRIEVAL_CANDIDATES)
+    return _fuse_candidates(index, [vector_ranks, keyword_ranks], top_k)
+
+
+async def _run_legs[A, B](first: Awaitable[A], second: Awaitable[B]) -> tuple[A, B]:
+    """Await both retrieval legs concurrently; if either fails, cancel the other."""
+    legs = (asyncio.ensure_future(first), asyncio.ensure_future(second))
+    try:
+        return await asyncio.gather(legs[0], legs[1])
+    except BaseException:
+        for leg in legs:
+            leg.cancel()
+        raise
+
 
-    if not rows:
+async def search_chunks_batch(
+    queries: list[str],
+    conversation_id: str,
+    session: AsyncSession,
+    top_k: int = 15,
+    snippets: bool | None = False,
+) -> list[SearchResult]:
+    """Run several searches at once and fuse them into one de-duplicated list.
+
+    All uncached queries are embedded in a single API call, the chunk corpus
+    is loaded once for every keyword leg, and the vector legs run
+    concurrently. Per-query results are cached exactly like search_chunks.
+    With ``snippets``, excerpts are focused on all of the queries.
+    """
+    # Normalized query -> first original spelling (routing looks at case and quotes)
+    originals: dict[str, str] = {}
+    for q in queries:
+        if q.strip():
+            originals.setdefault(normalize_query(q) or q, q)
+    unique = list(originals)
+    if not unique:
         return []
 
-    # -- Vector search (pgvector cosine similarity) --
-    embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
-    vector_sql = text(
-        """
-        SELECT dc.id, (dc.embedding <=> CAST(:query_vec AS vector)) AS distance
+    corpus_version = await get_corpus_version(session, conversation_id)
+    per_query: dict[str, list[SearchResult]] = {}
+    pending: list[str] = []
+    for query in unique:
+        metrics.incr("search_cache.lookups")
+        cached = _search_result_cache.get((conversation_id, corpus_version, query, top_k))
+        if cached is not None:
+            metrics.incr("search_cache.hits")
+            per_query[query] = list(cached)
+        else:
+            pending.append(query)
+
+    if pending:
+        lexical = [q for q in pending if classify_query(originals[q]) == "lexical"]
+        semantic = [q for q in pending if q not in lexical]
+        index, semantic_embeddings = await asyncio.gather(
+            _search_index(conversation_id, corpus_version),
+            embed_queries(semantic),
+        )
+        # Defined terms are only known once the corpus is loaded
+        lexical += [
+            q
+            for q in semantic
+            if defined_term_candidate(originals[q])
+            and classify_query(originals[q], index.defined_terms) == "lexical"
+        ]
+        keyword_ranks = {
+            q: index.keyword_ranks(
+                _keyword_query(originals[q]), RETRIEVAL_CANDIDATES, matched_only=q in lexical
+            )
+            for q in pending
+        }
+        embeddings = {
+            q: e for q, e in zip(semantic, semantic_embeddings, strict=True) if q not in lexical
+        }
+        # Lexical queries that match nothing literally fall back to hybrid
+        fallback = [q for q in lexical if not keyword_ranks[q]]
+        if fallback:
+            embeddings.update(zip(fallback, await embed_queries(fallback), strict=True))
+
+        if settings.index_cache_enabled:
+            vector_ranks = {
+                q: index.vector_ranks(e, RETRIEVAL_CANDIDATES) for q, e in embeddings.items()
+            }
+        else:
+            vector_ranks = dict(
+                zip(
+                    embeddings,
+                    await asyncio.gather(
+                        *(_vector_ranks(e, conversation_id) for e in embeddings.values())
+                    ),
+                    strict=True,
+                )
+            )
+
+        for query in pending:
+            if query in vector_ranks:
+                _log_route(originals[query], "hybrid")
+                rankings = [vector_ranks[query], keyword_ranks[query]]
+            else:
+                _log_route(originals[query], "lexical")
+                rankings = [keyword_ranks[query]]
+            results = _fuse_candidates(index, rankings, top_k)
+            _search_result_cache.put((conversation_id, corpus_version, query, top_k), list(results))
+            per_query[query] = results
+
+    # Fuse across queries: chunks found by several queries rise to the top
+    by_id = {r.chunk_id: r for query in unique for r in per_query[query]}
+    fused = _reciprocal_rank_fusion(
+        [{r.chunk_id: rank for rank, r in enumerate(per_query[query])} for query in unique]
+    )
+    top_ids = sorted(fused.keys(), key=lambda cid: fused[cid], reverse=True)[:top_k]
+    results = [replace(by_id[cid], score=fused[cid]) for cid in top_ids]
+    return focus_results(results, " ".join(unique), snippets)
+
+
+async def _vector_leg(query: str, conversation_id: str) -> dict[str, int]:
+    """Embed the query, then rank chunks by pgvector cosine distance."""
+    # Served from the query embedding cache when possible
+    query_embedding = await embed_query(query)
+    return await _vector_ranks(query_embedding, conversation_id)
+
+
+# Query vectors are bound as lists and sent in pgvector's binary format (the
+# codec is registered per connection in db/session.py), not as text literals.
+# The statements are module constants, so each connection prepares them once.
+
+# Approximate nearest neighbours over the full vectors via their HNSW index
+_VECTOR_SQL = text(
+    """
+    SELECT dc.id, (dc.embedding <=> CAST(:query_vec AS vector)) AS distance
+    FROM document_chunks dc
+    JOIN documents d ON dc.document_id = d.id
+    WHERE d.conversation_id = :conv_id
+      AND dc.embedding IS NOT NULL
+    ORDER BY distance ASC
+    LIMIT :limit
+    """
+)
+
+# Two-stage search for the compact tiers: an oversampled ANN pass over the
+# compact representation picks the candidates, which are then re-ranked
+# exactly by full-precision distance.
+_TWO_STAGE_VECTOR_SQL_TEMPLATE = """
+    WITH candidates AS (
+        SELECT dc.id, dc.embedding
         FROM document_chunks dc
         JOIN documents d ON dc.document_id = d.id
         WHERE d.conversation_id = :conv_id
-          AND dc.embedding IS NOT NULL
-        ORDER BY distance ASC
-        LIMIT :limit
-        """
-    )
-    vector_result = await session.execute(
-        vector_sql,
-        {"query_vec": embedding_str, "conv_id": conversation_id, "limit": 20},
+          AND {column} IS NOT NULL
+        ORDER BY {column} {op} {query}
+        LIMIT :candidates
     )
-    vector_rows = vector_result.all()
-    vector_ranks: dict[str, int] = {row[0]: rank for rank, row in enumerate(vector_rows)}
-
-    # -- BM25 keyword search --
-    chunk_map: dict[str, tuple] = {}  # chunk_id -> (chunk, label, filename)
-    corpus: list[list[str]] = []
-    chunk_ids: list[str] = []
-
-    for row in rows:
-        chunk = row[0]
-        label = row[1]
-        filename = row[2]
-        chunk_map[chunk.id] = (chunk, label, filename)
-        # Tokenize for BM25
-        combined = chunk.content
-        if chunk.context_text:
-            combined = chunk.context_text + " " + combined
-        corpus.append(combined.lower().split())
-        chunk_ids.append(chunk.id)
-
-    bm25 = BM25Okapi(corpus)
-    bm25_scores = bm25.get_scores(query.lower().split())
-    bm25_ranked = sorted(
-        enumerate(bm25_scores), key=lambda x: x[1], reverse=True
-    )[:20]
-    bm25_ranks: dict[str, int] = {
-        chunk_ids[idx]: rank for rank, (idx, _score) in enumerate(bm25_ranked)
+    SELECT id, (embedding <=> CAST(:query_vec AS vector)) AS distance
+    FROM candidates
+    ORDER BY distance ASC
+    LIMIT :limit
+"""
+
+_TWO_STAGE_VECTOR_SQL = {
+    # 256-d shortened vectors, cosine distance
+    "coarse": text(
+        _TWO_STAGE_VECTOR_SQL_TEMPLATE.format(
+            column="dc.embedding_coarse", op="<=>", query="CAST(:coarse_vec AS vector)"
+        )
+    ),
+    # float16 vectors, cosine distance
+    "halfvec": text(
+        _TWO_STAGE_VECTOR_SQL_TEMPLATE.format(
+            column="dc.embedding_half",
+            op="<=>",
+            query=f"CAST(:query_vec AS vector)::halfvec({EMBEDDING_DIMENSIONS})",
+        )
+    ),
+    # 1 bit per dimension (sign), Hamming distance
+    "binary": text(
+        _TWO_STAGE_VECTOR_SQL_TEMPLATE.format(
+            column="dc.embedding_bits",
+            op="<~>",
+            query=f"binary_quantize(CAST(:query_vec AS vector))::bit({EMBEDDING_DIMENSIONS})",
+        )
+    ),
+}
+
+
+def binary_quantize(embedding: list[float]) -> str:
+    """Sign-quantize an embedding to a bit string, like pgvector's binary_quantize."""
+    return "".join("1" if x > 0 else "0" for x in embedding)
+
+
+@dataclass(frozen=True)
+class _TierStorage:
+    column: str
+    index: str
+    opclass: str
+    # SQL deriving the column from the float32 vector; None for "full" itself
+    backfill: str | None
+
+
+_TIER_STORAGE: dict[str, _TierStorage] = {
+    "full": _TierStorage("embedding", "idx_chunks_embedding", "vector_cosine_ops", None),
+    "coarse": _TierStorage(
+        "embedding_coarse",
+        "idx_chunks_embedding_coarse",
+        "vector_cosine_ops",
+        f"l2_normalize(subvector(embedding, 1, {COARSE_EMBEDDING_DIMENSIONS}))",
+    ),
+    "halfvec": _TierStorage(
+        "embedding_half",
+        "idx_chunks_embedding_half",
+        "halfvec_cosine_ops",
+        f"embedding::halfvec({EMBEDDING_DIMENSIONS})",
+    ),
+    "binary": _TierStorage(
+        "embedding_bits",
+        "idx_chunks_embedding_bits",
+        "bit_hamming_ops",
+        f"binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})",
+    ),
+}
+
+# Serializes concurrent prepare_vector_storage runs
+_VECTOR_STORAGE_LOCK_KEY = 0x5EC7_0001
+
+
+def _tier_embedding(embedding: list[float]) -> dict[str, object]:
+    """The configured compact tier's column for a new chunk (the float32 vector aside)."""
+    tier = settings.vector_storage_tier
+    if tier == "coarse":
+        return {"embedding_coarse": shorten_embedding(embedding, COARSE_EMBEDDING_DIMENSIONS)}
+    if tier == "halfvec":
+        return {"embedding_half": embedding}
+    if tier == "binary":
+        return {"embedding_bits": binary_quantize(embedding)}
+    return {}
+
+
+async def prepare_vector_storage() -> None:
+    """Keep only the configured tier's column and HNSW index in document_chunks.
+
+    Run via ``python -m takehome.db.vector_storage`` after switching
+    vector_storage_tier, not at startup: a backfill and HNSW build over the
+    whole table can take minutes. The float32 vectors are always kept for
+    re-ranking; the configured compact tier is backfilled from them and
+    indexed, and the other tiers' columns and indexes are dropped. Idempotent.
+    """
+    configured = settings.vector_storage_tier
+    async with async_session() as session:
+        await session.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": _VECTOR_STORAGE_LOCK_KEY}
+        )
+        for tier, storage in _TIER_STORAGE.items():
+            if tier == configured:
+                continue
+            await session.execute(text(f"DROP INDEX IF EXISTS {storage.index}"))
+            if storage.backfill is not None:
+                await session.execute(
+                    text(
+                        f"UPDATE document_chunks SET {storage.column} = NULL "
+                        f"WHERE {storage.column} IS NOT NULL"
+                    )
+                )
+
+        storage = _TIER_STORAGE[configured]
+        if storage.backfill is not None:
+            await session.execute(
+                text(
+                    f"UPDATE document_chunks SET {storage.column} = {storage.backfill} "
+                    f"WHERE {storage.column} IS NULL AND embedding IS NOT NULL"
+                )
+            )
+        await session.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS {storage.index} ON document_chunks "
+                f"USING hnsw ({storage.column} {storage.opclass})"
+            )
+        )
+        await session.commit()
+    logger.info("Vector storage ready", tier=configured, index=storage.index)
+
+
+async def _vector_ranks(query_embedding: list[float], conversation_id: str) -> dict[str, int]:
+    tier = settings.vector_storage_tier
+    params: dict[str, object] = {
+        "query_vec": query_embedding,
+        "conv_id": conversation_id,
+        "limit": RETRIEVAL_CANDIDATES,
     }
+    async with async_session() as session:
+        if tier == "full":
+            vector_result = await session.execute(_VECTOR_SQL, params)
+        else:
+            candidates = max(settings.vector_search_rerank_candidates, RETRIEVAL_CANDIDATES)
+            params["candidates"] = candidates
+            if tier == "coarse":
+                params["coarse_vec"] = shorten_embedding(
+                    query_embedding, COARSE_EMBEDDING_DIMENSIONS
+                )
+            # HNSW returns at most ef_search rows, so widen it to the candidate pool
+            await session.execute(
+                text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(candidates)}
+            )
+            vector_result = await session.execute(_TWO_STAGE_VECTOR_SQL[tier], params)
+        vector_rows = vector_result.all()
+    return {row[0]: rank for rank, row in enumerate(vector_rows)}
 
-    # -- Reciprocal Rank Fusion --
-    k = 60  # RRF constant
-    all_chunk_ids = set(vector_ranks.keys()) | set(bm25_ranks.keys())
-    rrf_scores: dict[str, float] = {}
-    for cid in all_chunk_ids:
-        score = 0.0
-        if cid in vector_ranks:
-            score += 1.0 / (k + vector_ranks[cid])
-        if cid in bm25_ranks:
-            score += 1.0 / (k + bm25_ranks[cid])
-        rrf_scores[cid] = score
+
+def _fuse_candidates(
+    index: ConversationIndex, rankings: list[dict[str, int]], top_k: int
+) -> list[SearchResult]:
+    """Merge the legs' rankings with RRF and return the top_k chunks."""
+    rrf_scores = _reciprocal_rank_fusion(rankings)
 
     # Sort by RRF score descending
     top_ids = sorted(rrf_scores.keys(), key=lambda cid: rrf_scores[cid], reverse=True)[:top_k]
 
-    # Build results
     results: list[SearchResult] = []
     for cid in top_ids:
-        if cid not in chunk_map:
+        chunk = index.by_id.get(cid)
+        if chunk is None:
             continue
-        chunk, label, filename = chunk_map[cid]
         results.append(
             SearchResult(
-                chunk_id=chunk.id,
+                chunk_id=chunk.chunk_id,
                 document_id=chunk.document_id,
-                doc_label=label or "Doc",
-                doc_filename=filename,
+                doc_label=chunk.doc_label,
+                doc_filename=chunk.doc_filename,
                 content=chunk.content,
                 context_text=chunk.context_text,
                 page_number=chunk.page_number,
                 section_header=chunk.section_header,
                 score=rrf_scores[cid],
+                chunk_index=chunk.chunk_index,
             )
         )
-
     return results
 
 
-def format_search_results(results: list[SearchResult]) -> str:
-    """Format search results for Claude to consume."""
+def _reciprocal_rank_fusion(rankings: list[dict[str, int]]) -> dict[str, float]:
+    """Merge several rank lists (chunk_id -> 0-based rank) into RRF scores."""
+    rrf_scores: dict[str, float] = {}
+    for ranks in rankings:
+        for cid, rank in ranks.items():
+            rrf_scores[cid] = rrf_scores.get(cid, 0.0) + 1.0 / (RRF_K + rank)
+    return rrf_scores
+
+
+# -- Query-focused snippets -------------------------------------------------
+#
+# For pinpoint questions only a sentence or two of a ~500-token chunk matters.
+# Sentences are scored by the query terms they contain, weighted by how rare
+# each term is among all sentences of the results; the best ones are kept
+# with a sentence of context either side. Chunks with no lexical match (pure
+# vector hits) are kept whole, since there is nothing to focus on.
+
+SNIPPET_MAX_SENTENCES = 2  # best-matching sentences kept per chunk
+SNIPPET_WINDOW = 1  # sentences of context either side of a match
+SNIPPET_SEPARATOR = " [...] "
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.;:!?])\s+|\n+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s.strip()]
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORD_RE.findall(text.casefold()))
+
+
+def extract_snippets(results: list[SearchResult], query: str) -> list[SearchResult]:
+    """Replace each result's content with the sentence windows that best match ``query``."""
+    query_terms = _words(query)
+    sentences = [_split_sentences(r.content) for r in results]
+    sentence_words = [[_words(sentence) for sentence in chunk] for chunk in sentences]
+
+    total = sum(len(chunk) for chunk in sentences)
+    doc_freq = {
+        term: sum(term in words for chunk in sentence_words for words in chunk)
+        for term in query_terms
+    }
+    idf = {
+        term: math.log(1.0 + (total - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items() if df
+    }
+
+    snippets: list[SearchResult] = []
+    for result, chunk, chunk_words in zip(results, sentences, sentence_words, strict=True):
+        if len(chunk) <= 2 * SNIPPET_WINDOW + 1:
+            snippets.append(result)
+            continue
+        scores = [sum(idf.get(term, 0.0) for term in words & query_terms) for words in chunk_words]
+        best = [i for i in sorted(range(len(chunk)), key=lambda i: -scores[i]) if scores[i] > 0]
+        if not best:
+            snippets.append(result)
+            continue
+
+        keep: set[int] = set()
+        for i in best[:SNIPPET_MAX_SENTENCES]:
+            keep.update(range(max(0, i - SNIPPET_WINDOW), min(len(chunk), i + SNIPPET_WINDOW + 1)))
+        kept = sorted(keep)
+        spans: list[list[str]] = []
+        for i in kept:
+            if spans and i - 1 in keep:
+                spans[-1].append(chunk[i])
+            else:
+                spans.append([chunk[i]])
+        # Elided text is marked, so the model knows this is an excerpt
+        content = SNIPPET_SEPARATOR.join(" ".join(span) for span in spans)
+        if kept[0] > 0:
+            content = "[...] " + content
+        if kept[-1] < len(chunk) - 1:
+            content += " [...]"
+        snippets.append(replace(result, content=content, snippet=True))
+    return snippets
+
+
+def focus_results(
+    results: list[SearchResult], query: str, snippets: bool | None
+) -> list[SearchResult]:
+    """Apply a search's ``snippets`` mode to its results.
+
+    True always cuts results down to excerpts and False never does. None
+    excerpts only when the whole passages would overrun the result token
+    budget, so short result sets keep their full context.
+    """
+    if snippets is None:
+        whole_tokens = sum(count_tokens(r.content) for r in results)
+        snippets = whole_tokens > settings.search_result_token_budget
+    return extract_snippets(results, query) if snippets else results
+
+
+# ---------------------------------------------------------------------------
+# 6. Result packing: merge neighbours, drop repeats, fit a token budget
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Passage:
+    """One or more adjacent chunks of a document, rendered as a single result."""
+
+    document_id: str
+    doc_label: str
+    doc_filename: str
+    score: float
+    # (page_number, paragraph) in document order
+    paragraphs: list[tuple[int, str]]
+    sections: list[str]
+    snippet: bool = False
+
+    def render(self, position: int) -> str:
+        pages = sorted({page for page, _ in self.paragraphs})
+        page_ref = f"Page {pages[0]}" if len(pages) == 1 else f"Pages {pages[0]}-{pages[-1]}"
+        header = f"[Result {position}] {self.doc_label} ({self.doc_filename}), {page_ref}"
+        if self.sections:
+            header += f", Section: {'; '.join(self.sections)}"
+        if self.snippet:
+            header += " (excerpt)"
+
+        body: list[str] = []
+        current_page = self.paragraphs[0][0] if self.paragraphs else None
+        for page, paragraph in self.paragraphs:
+            # Mark page changes inside merged passages so citations stay exact
+            if page != current_page:
+                body.append(f"[Page {page}]")
+                current_page = page
+            body.append(paragraph)
+        return f"{header}\n" + "\n\n".join(body)
+
+
+_RESULT_SEPARATOR = "\n\n---\n\n"
+
+
+def _paragraph_key(paragraph: str) -> str:
+    return " ".join(paragraph.split()).casefold()
+
+
+def _merge_adjacent(results: list[SearchResult]) -> list[Passage]:
+    """Merge results that are consecutive chunks of the same document.
+
+    The chunker repeats a short trailing paragraph at the start of the next
+    chunk, so overlapping paragraphs are dropped while merging.
+    """
+    by_document: dict[str, list[SearchResult]] = {}
+    for r in results:
+        by_document.setdefault(r.document_id, []).append(r)
+
+    passages: list[Passage] = []
+    for group in by_document.values():
+        group.sort(key=lambda r: (r.chunk_index is None, r.chunk_index or 0))
+        run: list[SearchResult] = []
+        for r in group:
+            if (
+                run
+                and r.chunk_index is not None
+                and run[-1].chunk_index is not None
+                and r.chunk_index == run[-1].chunk_index + 1
+            ):
+                run.append(r)
+            else:
+                if run:
+                    passages.append(_passage_from_run(run))
+                run = [r]
+        if run:
+            passages.append(_passage_from_run(run))
+    return passages
+
+
+def _passage_from_run(run: list[SearchResult]) -> Passage:
+    paragraphs: list[tuple[int, str]] = []
+    sections: list[str] = []
+    for r in run:
+        for paragraph in r.content.split("\n\n"):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if paragraphs and _paragraph_key(paragraphs[-1][1]) == _paragraph_key(paragraph):
+                continue
+            paragraphs.append((r.page_number, paragraph))
+        if r.section_header and r.section_header not in sections:
+            sections.append(r.section_header)
+    first = run[0]
+    return Passage(
+        document_id=first.document_id,
+        doc_label=first.doc_label,
+        doc_filename=first.doc_filename,
+        score=max(r.score for r in run),
+        paragraphs=paragraphs,
+        sections=sections,
+        snippet=any(r.snippet for r in run),
+    )
+
+
+def pack_search_results(results: list[SearchResult], token_budget: int) -> list[Passage]:
+    """Turn ranked results into passages that fit ``token_budget`` tokens.
+
+    Adjacent chunks of a document are merged, paragraphs already included
+    by a higher-scoring passage are dropped, and passages are added in
+    score order while they fit. Token counts are of the rendered text.
+    """
+    passages = sorted(_merge_adjacent(results), key=lambda p: p.score, reverse=True)
+    separator_tokens = count_tokens(_RESULT_SEPARATOR)
+
+    packed: list[Passage] = []
+    seen: set[str] = set()
+    used = 0
+    for passage in passages:
+        passage.paragraphs = [
+            (page, para) for page, para in passage.paragraphs if _paragraph_key(para) not in seen
+        ]
+        if not passage.paragraphs:
+            continue
+
+        cost = count_tokens(passage.render(len(packed) + 1))
+        if packed:
+            cost += separator_tokens
+        if used + cost > token_budget:
+            if packed:
+                continue
+            # Always return something: trim the best passage to the budget
+            while len(passage.paragraphs) > 1 and cost > token_budget:
+                passage.paragraphs.pop()
+                cost = count_tokens(passage.render(1))
+
+        packed.append(passage)
+        used += cost
+        seen.update(_paragraph_key(para) for _, para in passage.paragraphs)
+    return packed
+
+
+def format_search_results(results: list[SearchResult], token_budget: int | None = None) -> str:
+    """Format search results for Claude to consume, packed into a token budget."""
     if not results:
         return "No relevant passages found."
 
-    parts: list[str] = []
-    for i, r in enumerate(results, 1):
-        header = f"[Result {i}] {r.doc_label} ({r.doc_filename}), Page {r.page_number}"
-        if r.section_header:
-            header += f", Section: {r.section_header}"
-        parts.append(f"{header}\n{r.content}")
+    budget = settings.search_result_token_budget if token_budget is None else token_budget
+    passages = pack_search_results(results, budget)
+    formatted = _RESULT_SEPARATOR.join(p.render(i) for i, p in enumerate(passages, 1))
+
+    unpacked_tokens = sum(count_tokens(r.content) for r in results)
+    packed_tokens = count_tokens(formatted)
+    metrics.observe("search_results.tokens", packed_tokens)
+    metrics.incr("search_results.tokens_saved", max(0, unpacked_tokens - packed_tokens))
+    return formatted
+
+
+# ---------------------------------------------------------------------------
+# 7. Direct reads: a page or a section of a document, no search involved
+# ---------------------------------------------------------------------------
+
+_SECTION_KEYWORD_RE = re.compile(
+    r"^(?:section|clause|schedule|part|article|paragraph)\s+", re.IGNORECASE
+)
+
+
+@dataclass(frozen=True)
+class DocumentRef:
+    id: str
+    label: str | None
+    filename: str
+
+
+def match_document(documents: list[DocumentRef], doc_ref: str) -> DocumentRef | None:
+    """Resolve "Doc B", "b" or a filename to one of ``documents``; labels win."""
+    ref = doc_ref.strip().casefold()
+    for doc in documents:
+        label = (doc.label or "").casefold()
+        if ref in (label, label.removeprefix("doc ")):
+            return doc
+    for doc in documents:
+        if ref in (doc.filename.casefold(), os.path.splitext(doc.filename)[0].casefold()):
+            return doc
+    return None
+
+
+async def _find_document(
+    session: AsyncSession, conversation_id: str, doc_ref: str
+) -> DocumentRef | None:
+    stmt = select(Document.id, Document.label, Document.filename).where(
+        Document.conversation_id == conversation_id
+    )
+    rows = (await session.execute(stmt)).all()
+    return match_document([DocumentRef(r.id, r.label, r.filename) for r in rows], doc_ref)
+
+
+# Only what SearchResult needs — not the embedding columns
+_CHUNK_COLUMNS = (
+    DocumentChunk.id,
+    DocumentChunk.content,
+    DocumentChunk.context_text,
+    DocumentChunk.page_number,
+    DocumentChunk.section_header,
+    DocumentChunk.chunk_index,
+)
+
+
+def _chunk_result(document: DocumentRef, chunk: Row[Any]) -> SearchResult:
+    return SearchResult(
+        chunk_id=chunk.id,
+        document_id=document.id,
+        doc_label=document.label or document.filename,
+        doc_filename=document.filename,
+        content=chunk.content,
+        context_text=chunk.context_text,
+        page_number=chunk.page_number,
+        section_header=chunk.section_header,
+        score=1.0,
+        chunk_index=chunk.chunk_index,
+    )
+
+
+async def fetch_page_chunks(
+    session: AsyncSession, conversation_id: str, doc_ref: str, page: int
+) -> list[SearchResult]:
+    """All chunks of one page of a document, in document order."""
+    document = await _find_document(session, conversation_id, doc_ref)
+    if document is None:
+        return []
+    stmt = (
+        select(*_CHUNK_COLUMNS)
+        .where(DocumentChunk.document_id == document.id, DocumentChunk.page_number == page)
+        .order_by(DocumentChunk.chunk_index)
+    )
+    chunks = (await session.execute(stmt)).all()
+    return [_chunk_result(document, chunk) for chunk in chunks]
+
+
+def section_prefixes(section: str) -> list[str]:
+    """Lowercased header prefixes for ``section``, also without "Section"/"Clause"."""
+    wanted = section.strip().lower()
+    return [p for p in dict.fromkeys([wanted, _SECTION_KEYWORD_RE.sub("", wanted)]) if p]
+
+
+def continues_number(header: str | None, prefixes: list[str]) -> bool:
+    """Whether a header only matched by extending a number: "3" vs "30 Notices".
+
+    "3" must match "3 Rent" and "3.2 Review", not "30 Notices".
+    """
+    header_text = (header or "").lower()
+    return any(
+        p[-1].isdigit() and header_text.startswith(p) and header_text[len(p) : len(p) + 1].isdigit()
+        for p in prefixes
+    )
+
 
-    return "\n\n---\n\n".join(parts)
+async def fetch_section_chunks(
+    session: AsyncSession, conversation_id: str, doc_ref: str, section: str
+) -> list[SearchResult]:
+    """All chunks whose section header matches ``section``, in document order.
+
+    Headers starting with the requested text win (indexed prefix match, also
+    tried without a leading "Section"/"Clause"); otherwise any header
+    containing it.
+    """
+    document = await _find_document(session, conversation_id, doc_ref)
+    if document is None:
+        return []
+
+    prefixes = section_prefixes(section)
+    if not prefixes:
+        return []
+    header = func.lower(DocumentChunk.section_header)
+    base = (
+        select(*_CHUNK_COLUMNS)
+        .where(DocumentChunk.document_id == document.id)
+        .order_by(DocumentChunk.chunk_index)
+    )
+
+    starts = or_(*(header.startswith(p, autoescape=True) for p in prefixes))
+    prefixed = (await session.execute(base.where(starts))).all()
+    chunks = [chunk for chunk in prefixed if not continues_number(chunk.section_header, prefixes)]
+    if not chunks:
+        contains = or_(*(header.contains(p, autoescape=True) for p in prefixes))
+        chunks = (await session.execute(base.where(contains))).all()
+    return [_chunk_result(document, chunk) for chunk in chunks]
+
+
+def format_document_read(results: list[SearchResult], token_budget: int | None = None) -> str:
+    """Format a page or section read in document order, within its own budget.
+
+    Reads use read_result_token_budget, larger than a search's, since the
+    model asked for the whole text. Chunks that still don't fit are not
+    dropped silently: a closing note says how many were left out.
+    """
+    budget = settings.read_result_token_budget if token_budget is None else token_budget
+    kept: list[SearchResult] = []
+    used = 0
+    for r in results:
+        cost = count_tokens(r.content)
+        if kept and used + cost > budget:
+            break
+        kept.append(r)
+        used += cost
+
+    formatted = _RESULT_SEPARATOR.join(p.render(i) for i, p in enumerate(_merge_adjacent(kept), 1))
+    omitted = len(results) - len(kept)
+    if omitted:
+        metrics.incr("document_reads.truncated")
+        formatted += (
+            f"\n\n[truncated — {omitted} more chunk{'s' if omitted != 1 else ''}; "
+            "read a narrower section or one page at a time]"
+        )
+    metrics.observe("document_reads.tokens", used)
+    return formatted
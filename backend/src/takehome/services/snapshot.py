@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+import structlog
+
+from takehome.config import settings
+from takehome.services.index import (
+    ConversationIndex,
+    Float32Array,
+    IndexedChunk,
+    Int32Array,
+    KeywordIndex,
+    SummaryIndex,
+)
+
+logger = structlog.get_logger()
+
+# ---------------------------------------------------------------------------
+# Memory-mapped index snapshots
+#
+# process_document writes each conversation's index to an immutable,
+# versioned file: {index_snapshot_dir}/{conversation_id}/v{corpus_version}.idx.
+# Workers open snapshots with mmap, so the embedding matrix and postings are
+# shared by every process through the OS page cache instead of being rebuilt
+# (and held privately) per worker.
+#
+# A snapshot appears atomically: it is written to a temp file in the same
+# directory, fsynced, then renamed into place. Readers always ask for the
+# version the database reports, so they never see a stale or partial file.
+#
+# Layout (little-endian, numeric sections 64-byte aligned):
+#   header    see _HEADER
+#   float32   embeddings      [n_vectors, dim]  unit-normalized
+#   int32     vector_rows     [n_vectors]       chunk position of each row
+#   float64   doc_len         [n_chunks]        BM25 document lengths
+#   int32     positions       [n_postings]      postings, grouped by term
+#   float32   term_freqs      [n_postings]
+#   float32   doc_centroids        [n_docs, dim]      (two-level retrieval)
+#   float32   section_centroids    [n_sections, dim]
+#   int32     doc_section_offsets  [n_docs + 1]
+#   int32     section_row_offsets  [n_sections + 1]
+#   int32     section_rows         [n_vectors]
+#   utf-8     JSON metadata   {"chunks": [...], "terms": [[term, start, count, idf], ...]}
+# ---------------------------------------------------------------------------
+
+_MAGIC = b"ORBIDX\x00\x01"
+_FORMAT_VERSION = 2
+# magic, format, corpus_version, n_chunks, n_vectors, dim, n_postings, n_docs, n_sections,
+# then offsets of embeddings, vector_rows, doc_len, positions, term_freqs, the five
+# summary sections, meta, and meta length
+_HEADER = struct.Struct("<8sIQIIIQII12Q")
+_ALIGN = 64
+_SNAPSHOT_RE = re.compile(r"^v(\d+)\.idx$")
+
+
+def _conversation_dir(conversation_id: str) -> str:
+    return os.path.join(settings.index_snapshot_dir, conversation_id)
+
+
+def snapshot_path(conversation_id: str, corpus_version: int) -> str:
+    return os.path.join(_conversation_dir(conversation_id), f"v{corpus_version}.idx")
+
+
+def _pad(buf: bytearray) -> None:
+    buf.extend(b"\x00" * (-len(buf) % _ALIGN))
+
+
+def _encode(index: ConversationIndex) -> bytes:
+    embeddings = (
+        index.embeddings if index.embeddings is not None else np.zeros((0, 0), dtype=np.float32)
+    )
+    vector_rows = (
+        index.vector_rows if index.vector_rows is not None else np.zeros(0, dtype=np.int32)
+    )
+    summaries = index.summaries
+
+    terms: list[list[object]] = []
+    positions: list[Int32Array] = []
+    term_freqs: list[Float32Array] = []
+    start = 0
+    for term, (term_positions, tf) in index.keyword.postings.items():
+        terms.append([term, start, len(term_positions), index.keyword.idf[term]])
+        positions.append(term_positions)
+        term_freqs.append(tf)
+        start += len(term_positions)
+
+    meta = json.dumps(
+        {
+            "chunks": [
+                [
+                    c.chunk_id,
+                    c.document_id,
+                    c.doc_label,
+                    c.doc_filename,
+                    c.content,
+                    c.context_text,
+                    c.page_number,
+                    c.section_header,
+                    c.chunk_index,
+                ]
+                for c in index.chunks
+            ],
+            "terms": terms,
+        },
+        separators=(",", ":"),
+    ).encode()
+
+    body = bytearray(b"\x00" * _HEADER.size)
+    offsets: list[int] = []
+    for section in (
+        np.ascontiguousarray(embeddings, dtype="<f4").tobytes(),
+        np.ascontiguousarray(vector_rows, dtype="<i4").tobytes(),
+        np.ascontiguousarray(index.keyword.doc_len, dtype="<f8").tobytes(),
+        np.concatenate(positions).astype("<i4").tobytes() if positions else b"",
+        np.concatenate(term_freqs).astype("<f4").tobytes() if term_freqs else b"",
+        *(
+            (
+                np.ascontiguousarray(summaries.doc_centroids, dtype="<f4").tobytes(),
+                np.ascontiguousarray(summaries.section_centroids, dtype="<f4").tobytes(),
+                np.ascontiguousarray(summaries.doc_section_offsets, dtype="<i4").tobytes(),
+                np.ascontiguousarray(summaries.section_row_offsets, dtype="<i4").tobytes(),
+                np.ascontiguousarray(summaries.section_rows, dtype="<i4").tobytes(),
+            )
+            if summaries is not None
+            else (b"",) * 5
+        ),
+        meta,
+    ):
+        _pad(body)
+        offsets.append(len(body))
+        body.extend(section)
+
+    n_vectors, dim = embeddings.shape if embeddings.size else (0, 0)
+    _HEADER.pack_into(
+        body,
+        0,
+        _MAGIC,
+        _FORMAT_VERSION,
+        index.corpus_version,
+        len(index.chunks),
+        n_vectors,
+        dim,
+        start,
+        len(summaries.doc_centroids) if summaries is not None else 0,
+        len(summaries.section_centroids) if summaries is not None else 0,
+        *offsets,
+        len(meta),
+    )
+    return bytes(body)
+
+
+def write_snapshot(index: ConversationIndex) -> str:
+    """Atomically write the index's snapshot and prune older versions.
+
+    Blocking file I/O — call via asyncio.to_thread from async code.
+    """
+    directory = _conversation_dir(index.conversation_id)
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(index.conversation_id, index.corpus_version)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_encode(index))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Older versions can go: processes that still map them keep their pages
+    # until they close the mapping, and new readers ask for the new version.
+    for name in os.listdir(directory):
+        match = _SNAPSHOT_RE.match(name)
+        if match and int(match.group(1)) < index.corpus_version:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+    logger.info(
+        "Wrote index snapshot",
+        conversation_id=index.conversation_id,
+        corpus_version=index.corpus_version,
+        path=path,
+    )
+    return path
+
+
+def open_snapshot(conversation_id: str, corpus_version: int) -> ConversationIndex | None:
+    """Map the snapshot for exactly ``corpus_version``, or return None if absent.
+
+    The embedding matrix and postings are zero-copy views into the mapping.
+    Blocking file I/O — call via asyncio.to_thread from async code.
+    """
+    path = snapshot_path(conversation_id, corpus_version)
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+    (
+        magic,
+        format_version,
+        snapshot_version,
+        n_chunks,
+        n_vectors,
+        dim,
+        n_postings,
+        n_docs,
+        n_sections,
+        off_embeddings,
+        off_vector_rows,
+        off_doc_len,
+        off_positions,
+        off_term_freqs,
+        off_doc_centroids,
+        off_section_centroids,
+        off_doc_section_offsets,
+        off_section_row_offsets,
+        off_section_rows,
+        off_meta,
+        meta_len,
+    ) = _HEADER.unpack_from(mapped, 0)
+    if magic != _MAGIC or format_version != _FORMAT_VERSION or snapshot_version != corpus_version:
+        logger.warning("Ignoring incompatible index snapshot", path=path)
+        mapped.close()
+        return None
+
+    embeddings = np.frombuffer(
+        mapped, dtype="<f4", count=n_vectors * dim, offset=off_embeddings
+    ).reshape(n_vectors, dim)
+    vector_rows = np.frombuffer(mapped, dtype="<i4", count=n_vectors, offset=off_vector_rows)
+    doc_len = np.frombuffer(mapped, dtype="<f8", count=n_chunks, offset=off_doc_len)
+    positions = np.frombuffer(mapped, dtype="<i4", count=n_postings, offset=off_positions)
+    term_freqs = np.frombuffer(mapped, dtype="<f4", count=n_postings, offset=off_term_freqs)
+    meta = json.loads(mapped[off_meta : off_meta + meta_len])
+    summaries = (
+        SummaryIndex(
+            doc_centroids=np.frombuffer(
+                mapped, dtype="<f4", count=n_docs * dim, offset=off_doc_centroids
+            ).reshape(n_docs, dim),
+            section_centroids=np.frombuffer(
+                mapped, dtype="<f4", count=n_sections * dim, offset=off_section_centroids
+            ).reshape(n_sections, dim),
+            doc_section_offsets=np.frombuffer(
+                mapped, dtype="<i4", count=n_docs + 1, offset=off_doc_section_offsets
+            ),
+            section_row_offsets=np.frombuffer(
+                mapped, dtype="<i4", count=n_sections + 1, offset=off_section_row_offsets
+            ),
+            section_rows=np.frombuffer(
+                mapped, dtype="<i4", count=n_vectors, offset=off_section_rows
+            ),
+        )
+        if n_docs
+        else None
+    )
+
+    postings: dict[str, tuple[Int32Array, Float32Array]] = {}
+    idf: dict[str, float] = {}
+    for term, start, count, term_idf in meta["terms"]:
+        postings[term] = (positions[start : start + count], term_freqs[start : start + count])
+        idf[term] = term_idf
+
+    return ConversationIndex(
+        conversation_id=conversation_id,
+        corpus_version=corpus_version,
+        chunks=[IndexedChunk(*fields) for fields in meta["chunks"]],
+        keyword=KeywordIndex(postings, idf, doc_len),
+        embeddings=embeddings if n_vectors else None,
+        vector_rows=vector_rows if n_vectors else None,
+        summaries=summaries,
+        mapping=mapped,
+    )
+
+
+def delete_snapshots(conversation_id: str) -> None:
+    shutil.rmtree(_conversation_dir(conversation_id), ignore_errors=True)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import structlog
+
+from takehome.config import settings
+from takehome.db.session import async_session
+from takehome.services.metrics import metrics
+from takehome.services.rag import SearchResult, embed_queries, normalize_query, search_chunks
+
+logger = structlog.get_logger()
+
+# ---------------------------------------------------------------------------
+# Speculative pre-retrieval
+#
+# Almost every question makes the agent call search_documents on its first
+# step, so retrieval normally waits for a full model round trip. Instead the
+# user's message is searched as soon as the turn starts, concurrently with
+# that first request. When the agent's first search query is close enough to
+# the speculative one, its results are handed over instead of searching
+# again — by then they are usually ready, so the tool returns immediately.
+# ---------------------------------------------------------------------------
+
+# Same as search_documents, so a hit returns exactly what the tool would have
+SPECULATIVE_TOP_K = 10
+
+metrics.register_ratio(
+    "speculative_search.hit_rate", "speculative_search.hits", "speculative_search.started"
+)
+
+
+@dataclass
+class SpeculativeSearch:
+    conversation_id: str
+    query: str
+    # Resolves to (results, search ms), or None if the search failed
+    task: asyncio.Task[tuple[list[SearchResult], float] | None]
+    # Set once a tool call has checked it, hit or miss; only the first is eligible
+    consumed: bool = False
+
+
+def speculative_query(user_message: str, previous_user_message: str | None = None) -> str:
+    """The query to speculate on: short follow-ups carry the previous question."""
+    if (
+        previous_user_message
+        and len(user_message.split()) < settings.speculative_search_context_words
+    ):
+        return f"{previous_user_message}\n{user_message}"
+    return user_message
+
+
+async def _run(conversation_id: str, query: str) -> tuple[list[SearchResult], float] | None:
+    start = time.perf_counter()
+    try:
+        # Own session: the agent's session is busy with the turn itself
+        async with async_session() as session:
+            results = await search_chunks(
+                query=query,
+                conversation_id=conversation_id,
+                session=session,
+                top_k=SPECULATIVE_TOP_K,
+            )
+    except Exception:
+        logger.exception("Speculative search failed", conversation_id=conversation_id)
+        return None
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    metrics.observe("speculative_search.latency_ms", elapsed_ms)
+    return results, elapsed_ms
+
+
+def start_speculative_search(
+    conversation_id: str, user_message: str, previous_user_message: str | None = None
+) -> SpeculativeSearch | None:
+    """Start searching the user's message in the background, if enabled."""
+    if not settings.speculative_search_enabled or not user_message.strip():
+        return None
+    query = speculative_query(user_message, previous_user_message)
+    metrics.incr("speculative_search.started")
+    return SpeculativeSearch(
+        conversation_id=conversation_id,
+        query=query,
+        task=asyncio.create_task(_run(conversation_id, query)),
+    )
+
+
+async def _similarity(a: str, b: str) -> float:
+    if normalize_query(a) == normalize_query(b):
+        return 1.0
+    # The speculative query's embedding is normally cached by its search, and
+    # the tool query's is needed by the fallback search on a miss anyway
+    first, second = await embed_queries([a, b])
+    u, v = np.asarray(first), np.asarray(second)
+    return float(u @ v / (np.linalg.norm(u) * np.linalg.norm(v)))
+
+
+async def take_speculative_results(
+    spec: SpeculativeSearch | None, query: str
+) -> list[SearchResult] | None:
+    """The speculative results if ``query`` matches the speculation, else None.
+
+    Only the first search to ask is considered; a miss cancels the speculation.
+    """
+    if spec is None or spec.consumed:
+        return None
+    spec.consumed = True
+
+    try:
+        similarity = await _similarity(spec.query, query)
+    except Exception:
+        logger.exception("Speculative query comparison failed")
+        similarity = 0.0
+    if similarity < settings.speculative_search_min_similarity:
+        spec.task.cancel()
+        metrics.incr("speculative_search.misses")
+        logger.info(
+            "Speculative search missed",
+            conversation_id=spec.conversation_id,
+            query=query,
+            similarity=round(similarity, 3),
+        )
+        return None
+
+    wait_start = time.perf_counter()
+    outcome = await spec.task
+    if outcome is None:
+        metrics.incr("speculative_search.misses")
+        return None
+    results, search_ms = outcome
+    waited_ms = (time.perf_counter() - wait_start) * 1000
+    # Without speculation the tool would have spent the whole search from here
+    metrics.incr("speculative_search.hits")
+    metrics.observe("speculative_search.saved_ms", max(search_ms - waited_ms, 0.0))
+    logger.info(
+        "Speculative search hit",
+        conversation_id=spec.conversation_id,
+        query=query,
+        similarity=round(similarity, 3),
+        waited_ms=round(waited_ms, 1),
+    )
+    return list(results)
+
+
+def discard_speculative_search(spec: SpeculativeSearch | None) -> None:
+    """End of turn: cancel a speculation no search asked for."""
+    if spec is None or spec.consumed:
+        return
+    spec.consumed = True
+    spec.task.cancel()
+    metrics.incr("speculative_search.unused")
@@ -21,7 +21,13 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # which cannot nest inside the already-running event loop.
     await asyncio.to_thread(command.upgrade, alembic_cfg, "head")
     logger.info("Migrations complete")
+
+    from takehome.services.event_log import event_listener
+
+    # Wakes followers of response streams generated on other workers
+    await event_listener.ensure_started()
     yield
+    await event_listener.stop()
 
 
 app = FastAPI(title="Orbital Document Q&A", lifespan=lifespan)
@@ -34,8 +40,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from takehome.web.routers import conversations, documents, messages  # noqa: E402
+from takehome.web.routers import conversations, documents, messages, metrics  # noqa: E402
 
 app.include_router(conversations.router)
 app.include_router(messages.router)
 app.include_router(documents.router)
+app.include_router(metrics.router)
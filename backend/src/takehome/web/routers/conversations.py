@@ -14,6 +14,7 @@ from takehome.services.conversation import (
     list_conversations,
     update_conversation,
 )
+from takehome.services.index_cache import invalidate_conversation_index, warm_conversation_index
 
 router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 
@@ -132,6 +133,9 @@ async def get_conversation_endpoint(
     conversation = await get_conversation(session, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    # Opening a conversation is a strong hint it's about to be searched
+    if conversation.documents:
+        warm_conversation_index(conversation_id)
     return _build_detail(conversation)
 
 
@@ -157,3 +161,4 @@ async def delete_conversation_endpoint(
     deleted = await delete_conversation(session, conversation_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    invalidate_conversation_index(conversation_id)
@@ -2,32 +2,47 @@ from __future__ import annotations
 
 import asyncio
 import json
-from collections.abc import AsyncIterator
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Coroutine
 from datetime import datetime
+from typing import Any
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from pydantic import BaseModel
+from pydantic_ai.usage import RunUsage
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import StreamingResponse
 
+from takehome.config import settings
 from takehome.db.models import Message
-from takehome.db.session import get_session
+from takehome.db.session import async_session, get_session
 from takehome.services.conversation import get_conversation, update_conversation
 from takehome.services.document import get_documents_for_conversation
+from takehome.services.event_log import EventStream, follow_stream, open_stream, stream_exists
 from takehome.services.llm import (
+    STREAM_RESET,
     ChatDeps,
     chat_with_documents,
     count_sources_cited,
     extract_citations,
     generate_title,
+    strip_cite_tags,
 )
+from takehome.services.memory import load_memory, schedule_summary_fold
+from takehome.services.metrics import metrics
+from takehome.services.speculation import discard_speculative_search, start_speculative_search
 
 logger = structlog.get_logger()
 
 router = APIRouter(tags=["messages"])
 
+# Share of prompt tokens served from Anthropic's prompt cache
+metrics.register_ratio(
+    "chat.prompt_cache_read_ratio", "chat.cache_read_tokens", "chat.input_tokens"
+)
+
 
 # --------------------------------------------------------------------------- #
 # Schemas
@@ -41,6 +56,7 @@ class MessageOut(BaseModel):
     content: str
     sources_cited: int
     created_at: datetime
+    interrupted: bool = False
 
     model_config = {"from_attributes": True}
 
@@ -49,6 +65,239 @@ class MessageCreate(BaseModel):
     content: str
 
 
+# --------------------------------------------------------------------------- #
+# SSE encoding
+# --------------------------------------------------------------------------- #
+
+
+def _stamp(event: dict[str, Any]) -> dict[str, Any]:
+    """Stamp an event with the server time it was emitted (epoch ms)."""
+    return {**event, "ts": round(time.time() * 1000, 1)}
+
+
+def _sse(event_id: str, event: dict[str, Any]) -> str:
+    """Encode one SSE event; its id is what the client sends back as Last-Event-ID."""
+    return f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
+
+
+def _stream_response(stream_id: str, after: int, request: Request) -> StreamingResponse:
+    """Follow a response stream as SSE, from the event after ``after``."""
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for seq, event in _until_disconnected(follow_stream(stream_id, after), request):
+                yield _sse(f"{stream_id}:{seq}", event)
+        except ClientDisconnected:
+            logger.info("Stream client disconnected", stream_id=stream_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# --------------------------------------------------------------------------- #
+# Background tasks
+# --------------------------------------------------------------------------- #
+
+# Strong references so detached tasks aren't garbage-collected mid-flight
+_background_tasks: set[asyncio.Task[Any]] = set()
+
+
+def _spawn[T](coro: Coroutine[Any, Any, T]) -> asyncio.Task[T]:
+    """Run ``coro`` detached from the request, so a disconnect can't cancel it."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _generate_and_save_title(conversation_id: str, user_message: str) -> str | None:
+    try:
+        title = await generate_title(user_message)
+        async with async_session() as session:
+            await update_conversation(session, conversation_id, title)
+    except Exception:
+        logger.exception("Failed to generate title", conversation_id=conversation_id)
+        return None
+    logger.info("Auto-generated conversation title", conversation_id=conversation_id, title=title)
+    return title
+
+
+def _start_title_generation(conversation_id: str, user_message: str) -> asyncio.Task[str | None]:
+    """Title the conversation in the background, independent of the response stream."""
+    return _spawn(_generate_and_save_title(conversation_id, user_message))
+
+
+# --------------------------------------------------------------------------- #
+# Token usage
+# --------------------------------------------------------------------------- #
+
+
+def _record_usage(message: Message, usage: RunUsage | None) -> None:
+    """Store the agent run's token usage on the assistant message and in metrics."""
+    if usage is None:
+        return
+    message.input_tokens = usage.input_tokens
+    message.output_tokens = usage.output_tokens
+    message.cache_read_tokens = usage.cache_read_tokens
+    message.cache_write_tokens = usage.cache_write_tokens
+    metrics.incr("chat.input_tokens", usage.input_tokens)
+    metrics.incr("chat.output_tokens", usage.output_tokens)
+    metrics.incr("chat.cache_read_tokens", usage.cache_read_tokens)
+    metrics.incr("chat.cache_write_tokens", usage.cache_write_tokens)
+
+
+# --------------------------------------------------------------------------- #
+# Client disconnects
+#
+# A generation runs detached from the request, so a client whose connection
+# drops can reconnect and resume it (see services/event_log.py). But a
+# response nobody reads still costs model tokens, web searches and a pooled
+# connection, so once no client has followed it for
+# stream_resume_grace_seconds the agent run is cancelled. What was generated
+# so far is saved as an interrupted assistant message.
+# --------------------------------------------------------------------------- #
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response finished."""
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(settings.disconnect_poll_interval_seconds)
+
+
+async def _until_disconnected[T](
+    chunks: AsyncGenerator[T, None], request: Request
+) -> AsyncIterator[T]:
+    """Forward ``chunks`` until the client disconnects, then raise ClientDisconnected.
+
+    Writes to a closed connection don't fail, so without watching for the
+    disconnect a follower would only notice at the end of the stream.
+    """
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    next_chunk: asyncio.Future[T] | None = None
+    try:
+        while True:
+            next_chunk = asyncio.ensure_future(anext(chunks))
+            await asyncio.wait({next_chunk, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_chunk.done():
+                raise ClientDisconnected
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        watcher.cancel()
+        if next_chunk is not None and not next_chunk.done():
+            # Cancelling the pending step unwinds the generator itself
+            next_chunk.cancel()
+        else:
+            await chunks.aclose()
+
+
+async def _save_interrupted_message(
+    conversation_id: str, partial: str, usage: RunUsage | None
+) -> None:
+    plain = strip_cite_tags(partial)
+    try:
+        async with async_session() as session:
+            message = Message(
+                conversation_id=conversation_id,
+                role="assistant",
+                content=partial,
+                # Replayed to the model, which should know the answer was cut short
+                content_plain=f"{plain}\n\n[Response interrupted before it finished.]".lstrip(),
+                sources_cited=count_sources_cited(partial),
+                interrupted=True,
+            )
+            _record_usage(message, usage)
+            session.add(message)
+            await session.commit()
+    except Exception:
+        logger.exception("Failed to save interrupted response", conversation_id=conversation_id)
+
+
+async def _save_assistant_message(
+    conversation_id: str,
+    content: str,
+    usage: RunUsage | None,
+    tool_trace: list[dict[str, Any]] | None,
+) -> Message:
+    async with async_session() as session:
+        message = Message(
+            conversation_id=conversation_id,
+            role="assistant",
+            content=content,
+            content_plain=strip_cite_tags(content),
+            sources_cited=count_sources_cited(content),
+            tool_trace=tool_trace,
+        )
+        _record_usage(message, usage)
+        if usage is not None:
+            metrics.observe("chat.turn_tokens", usage.input_tokens + usage.output_tokens)
+        session.add(message)
+        await session.commit()
+        await session.refresh(message)
+    return message
+
+
+async def _handle_abandoned(
+    conversation_id: str, partial: str, usage: RunUsage | None, elapsed_ms: float
+) -> None:
+    """Count the cancelled run and save its partial response."""
+    spent = usage.input_tokens + usage.output_tokens if usage is not None else 0
+    metrics.incr("chat.cancelled")
+    metrics.observe("chat.cancelled_after_ms", elapsed_ms)
+    metrics.incr("chat.cancelled_tokens_spent", spent)
+    # Estimated against the average completed turn
+    typical = metrics.mean("chat.turn_tokens")
+    if typical is not None:
+        metrics.incr("chat.tokens_saved_estimate", max(typical - spent, 0.0))
+    logger.info(
+        "Response abandoned by its client; agent run cancelled",
+        conversation_id=conversation_id,
+        elapsed_ms=round(elapsed_ms),
+        partial_chars=len(partial),
+        tokens_spent=spent,
+    )
+    # Called from a task being cancelled: a second cancel must not cut the save short
+    await asyncio.shield(_save_interrupted_message(conversation_id, partial, usage))
+
+
+async def _run_generation(stream: EventStream, events: AsyncIterator[dict[str, Any]]) -> None:
+    """Drive a generation to its end, publishing each event as it is produced."""
+    try:
+        async for event in events:
+            stream.publish(_stamp(event))
+    except asyncio.CancelledError:
+        stream.publish(_stamp({"type": "interrupted"}))
+        raise
+    except Exception:
+        logger.exception("Response generation failed", stream_id=stream.stream_id)
+        stream.publish(_stamp({"type": "interrupted"}))
+    finally:
+        await stream.close()
+
+
+async def _cancel_when_abandoned(stream: EventStream, generation: asyncio.Task[None]) -> None:
+    """Cancel the generation once no client has followed it for the grace period."""
+    grace = settings.stream_resume_grace_seconds
+    while not generation.done():
+        if stream.unattended_seconds() > grace:
+            generation.cancel()
+            return
+        await asyncio.wait({generation}, timeout=min(grace / 4, 1.0))
+
+
 # --------------------------------------------------------------------------- #
 # Endpoints
 # --------------------------------------------------------------------------- #
@@ -84,6 +333,7 @@ async def list_messages(
             content=m.content,
             sources_cited=m.sources_cited,
             created_at=m.created_at,
+            interrupted=m.interrupted,
         )
         for m in messages
     ]
@@ -93,6 +343,7 @@ async def list_messages(
 async def send_message(
     conversation_id: str,
     body: MessageCreate,
+    request: Request,
     session: AsyncSession = Depends(get_session),
 ) -> StreamingResponse:
     """Send a user message and stream back the AI response via SSE."""
@@ -106,6 +357,7 @@ async def send_message(
         conversation_id=conversation_id,
         role="user",
         content=body.content,
+        content_plain=body.content,
     )
     session.add(user_message)
     await session.commit()
@@ -117,90 +369,107 @@ async def send_message(
     documents = await get_documents_for_conversation(session, conversation_id)
     has_documents = len(documents) > 0
 
-    # Load conversation history (exclude the message we just saved)
-    stmt = (
-        select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .where(Message.id != user_message.id)
-        .order_by(Message.created_at.asc())
-    )
-    result = await session.execute(stmt)
-    history_messages = list(result.scalars().all())
+    # Load the summary and unsummarized history (exclude the message we just saved)
+    memory = await load_memory(session, conversation, exclude_message_id=user_message.id)
 
-    conversation_history: list[dict[str, str]] = [
-        {"role": m.role, "content": m.content} for m in history_messages
-    ]
+    # Title the conversation from its first message, in parallel with the answer.
+    # The title is sent as a "title" event if it's ready before the stream ends;
+    # otherwise the client picks it up the next time it lists conversations.
+    title_task = _start_title_generation(conversation_id, body.content) if memory.is_empty else None
+
+    async def generate() -> AsyncIterator[dict[str, Any]]:
+        """Generate the response's events, streaming the LLM answer."""
+        title_sent = False
 
-    # Determine if this is the first user message (for title generation)
-    user_msg_count = sum(1 for m in history_messages if m.role == "user")
-    is_first_message = user_msg_count == 0
+        def title_event() -> dict[str, Any] | None:
+            nonlocal title_sent
+            if title_task is None or title_sent or not title_task.done():
+                return None
+            title_sent = True
+            title = title_task.result()
+            if title is None:
+                return None
+            return {"type": "title", "conversation_id": conversation_id, "title": title}
 
-    async def event_stream() -> AsyncIterator[str]:
-        """Generate SSE events with the streamed LLM response."""
         full_response = ""
+        usage: RunUsage | None = None
+        tool_trace: list[dict[str, Any]] | None = None
+        loop = asyncio.get_running_loop()
+        started = loop.time()
 
         # Send status event — the agent will decide whether to search docs, web, or both
         if has_documents:
-            status_data = json.dumps({"type": "status", "content": "Analyzing question..."})
-            yield f"data: {status_data}\n\n"
+            yield {"type": "status", "content": "Analyzing question..."}
 
-        try:
-            # Use a fresh session for the agentic pipeline
-            from takehome.db.session import async_session as session_factory
-
-            async with session_factory() as agent_session:
-                deps = ChatDeps(
-                    conversation_id=conversation_id,
-                    session=agent_session,
-                )
-
-                pending_status = False
-                async for chunk in chat_with_documents(
-                    user_message=body.content,
-                    conversation_history=conversation_history,
-                    deps=deps,
-                ):
-                    # Check for status markers from tool calls
-                    if chunk.startswith("__STATUS__:"):
-                        status_msg = chunk[len("__STATUS__:"):]
-                        event_data = json.dumps({"type": "status", "content": status_msg})
-                        yield f"data: {event_data}\n\n"
-                        pending_status = True
-                        continue
-
-                    # If we just sent status events, pause briefly so the
-                    # browser flushes and renders them before content arrives.
-                    if pending_status:
-                        await asyncio.sleep(0.05)
-                        pending_status = False
-
-                    full_response += chunk
-
-                    # Stream large chunks in smaller pieces so the UI can
-                    # render incrementally (builtin tools return all text at once).
-                    CHUNK_SIZE = 80
-                    if len(chunk) > CHUNK_SIZE:
-                        for i in range(0, len(chunk), CHUNK_SIZE):
-                            piece = chunk[i : i + CHUNK_SIZE]
-                            event_data = json.dumps({"type": "content", "content": piece})
-                            yield f"data: {event_data}\n\n"
-                    else:
-                        event_data = json.dumps({"type": "content", "content": chunk})
-                        yield f"data: {event_data}\n\n"
+        # Search the question while the model's first request is in flight;
+        # the agent's first search_documents call reuses it if it matches
+        speculative = None
+        if has_documents:
+            previous_question = next(
+                (m.content for m in reversed(memory.history) if m.role == "user"), None
+            )
+            speculative = start_speculative_search(conversation_id, body.content, previous_question)
 
+        # Tool calls open their own pooled sessions, so they can run in parallel
+        deps = ChatDeps(
+            conversation_id=conversation_id,
+            speculative=speculative,
+        )
+        try:
+            first_token = True
+            async for chunk in chat_with_documents(
+                user_message=body.content,
+                conversation_history=memory.history,
+                deps=deps,
+                summary=memory.summary,
+            ):
+                if (event := title_event()) is not None:
+                    yield event
+
+                # Check for status markers from tool calls
+                if chunk.startswith("__STATUS__:"):
+                    status_msg = chunk[len("__STATUS__:") :]
+                    yield {"type": "status", "content": status_msg}
+                    continue
+
+                # Text streamed so far was preamble to a tool call — discard it
+                if chunk == STREAM_RESET:
+                    full_response = ""
+                    yield {"type": "reset"}
+                    continue
+
+                if first_token:
+                    first_token = False
+                    metrics.observe("chat.first_token_ms", (loop.time() - started) * 1000)
+
+                # Forward each model text delta as it arrives
+                full_response += chunk
+                yield {"type": "delta", "delta": chunk}
+
+            usage = deps.usage
+            tool_trace = deps.tool_trace
+
+        except asyncio.CancelledError:
+            # Nobody followed the stream for the grace period
+            await _handle_abandoned(
+                conversation_id, full_response, deps.usage, (loop.time() - started) * 1000
+            )
+            raise
         except Exception:
             logger.exception(
                 "Error during LLM streaming",
                 conversation_id=conversation_id,
             )
-            error_msg = "I'm sorry, an error occurred while generating a response. Please try again."
+            error_msg = (
+                "I'm sorry, an error occurred while generating a response. Please try again."
+            )
             full_response = error_msg
-            event_data = json.dumps({"type": "content", "content": error_msg})
-            yield f"data: {event_data}\n\n"
+            yield {"type": "content", "content": error_msg}
+        finally:
+            discard_speculative_search(speculative)
 
         # Extract citations from the full response
         citations = extract_citations(full_response)
-        sources = count_sources_cited(full_response)
 
         # Build citation data for the frontend
         citation_data = [
@@ -219,70 +488,71 @@ async def send_message(
             if doc.label:
                 doc_label_map[doc.label] = doc.id
 
-        # Save the assistant message to the database
-        from takehome.db.session import async_session as session_factory
-
-        async with session_factory() as save_session:
-            assistant_message = Message(
-                conversation_id=conversation_id,
-                role="assistant",
-                content=full_response,
-                sources_cited=sources,
-            )
-            save_session.add(assistant_message)
-            await save_session.commit()
-            await save_session.refresh(assistant_message)
-
-            # Auto-generate title from first user message
-            if is_first_message:
-                try:
-                    title = await generate_title(body.content)
-                    await update_conversation(save_session, conversation_id, title)
-                    logger.info(
-                        "Auto-generated conversation title",
-                        conversation_id=conversation_id,
-                        title=title,
-                    )
-                except Exception:
-                    logger.exception(
-                        "Failed to generate title",
-                        conversation_id=conversation_id,
-                    )
-
-            # Send the final message event with the complete assistant message
-            message_data = json.dumps(
-                {
-                    "type": "message",
-                    "message": {
-                        "id": assistant_message.id,
-                        "conversation_id": assistant_message.conversation_id,
-                        "role": assistant_message.role,
-                        "content": assistant_message.content,
-                        "sources_cited": assistant_message.sources_cited,
-                        "created_at": assistant_message.created_at.isoformat(),
-                    },
-                }
-            )
-            yield f"data: {message_data}\n\n"
-
-            # Send the done signal with citation data
-            done_data = json.dumps(
-                {
-                    "type": "done",
-                    "sources_cited": sources,
-                    "message_id": assistant_message.id,
-                    "citations": citation_data,
-                    "doc_label_map": doc_label_map,
-                }
-            )
-            yield f"data: {done_data}\n\n"
+        # Save the assistant message to the database. The answer is complete, so
+        # a cancel arriving now (the grace period running out) must not lose it.
+        assistant_message = await asyncio.shield(
+            _save_assistant_message(conversation_id, full_response, usage, tool_trace)
+        )
 
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+        # Older turns outside the recent window go into the rolling summary
+        schedule_summary_fold(memory)
+
+        if (event := title_event()) is not None:
+            yield event
+
+        # Send the final message event with the complete assistant message
+        yield {
+            "type": "message",
+            "message": {
+                "id": assistant_message.id,
+                "conversation_id": assistant_message.conversation_id,
+                "role": assistant_message.role,
+                "content": assistant_message.content,
+                "sources_cited": assistant_message.sources_cited,
+                "created_at": assistant_message.created_at.isoformat(),
+            },
+        }
+
+        # Send the done signal with citation data
+        yield {
+            "type": "done",
+            "sources_cited": assistant_message.sources_cited,
+            "message_id": assistant_message.id,
+            "citations": citation_data,
+            "doc_label_map": doc_label_map,
+        }
+
+    # The generation runs detached from this request: if the connection drops,
+    # the client resumes it with Last-Event-ID (resume_stream below)
+    stream = open_stream(user_message.id)
+    generation = _spawn(_run_generation(stream, generate()))
+    _spawn(_cancel_when_abandoned(stream, generation))
+    return _stream_response(stream.stream_id, -1, request)
+
+
+@router.get("/api/conversations/{conversation_id}/messages/stream")
+async def resume_stream(
+    conversation_id: str,
+    request: Request,
+    last_event_id: str | None = Header(default=None),
+    session: AsyncSession = Depends(get_session),
+) -> StreamingResponse:
+    """Resume a response stream after the Last-Event-ID the client saw last.
+
+    Missed events are replayed from the stream's event log, then the live
+    tail is followed. Any worker can serve this, not just the generating one.
+    """
+    stream_id, _, seq = (last_event_id or "").rpartition(":")
+    if not stream_id or not seq.isdigit():
+        raise HTTPException(status_code=400, detail="Last-Event-ID header required")
+
+    # Stream ids are the ids of the user messages they answer
+    message = await session.get(Message, stream_id)
+    if message is None or message.conversation_id != conversation_id:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    if not await stream_exists(stream_id):
+        raise HTTPException(status_code=404, detail="Stream expired")
+
+    metrics.incr("chat.stream_resumes")
+    logger.info("Resuming response stream", stream_id=stream_id, after=int(seq))
+    return _stream_response(stream_id, int(seq), request)
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter
+
+from takehome.services.metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+# --------------------------------------------------------------------------- #
+# Endpoints
+# --------------------------------------------------------------------------- #
+
+
+@router.get("/api/metrics")
+async def get_metrics() -> dict[str, Any]:
+    """Return this worker's in-process counters (cache hit rates, latencies, ...)."""
+    return metrics.snapshot()
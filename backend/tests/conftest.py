@@ -1,5 +1,58 @@
-"""Load .env before any test module imports trigger Agent() creation."""
+"""Shared test fixtures.
 
+.env is loaded before any test module imports trigger Agent() creation.
+"""
+
+from collections.abc import Callable
+
+import pytest
 from dotenv import load_dotenv
 
 load_dotenv()
+
+from takehome.services import llm, memory, rag  # noqa: E402
+from takehome.services.rag import SearchResult  # noqa: E402
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+@pytest.fixture
+def offline_token_counts(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Count whitespace-separated words as tokens.
+
+    tiktoken downloads its encoding on first use; word counts keep tests
+    offline while exercising the same budget arithmetic.
+    """
+    monkeypatch.setattr(rag, "count_tokens", _count_words)
+    monkeypatch.setattr(memory, "count_tokens", _count_words)
+    monkeypatch.setattr(llm, "count_tokens", _count_words)
+
+
+@pytest.fixture
+def make_result() -> Callable[..., SearchResult]:
+    """Factory for SearchResults; document "d1" is Doc A, any other Doc B."""
+
+    def make(
+        chunk_index: int = 0,
+        content: str = "",
+        score: float = 1.0,
+        page: int = 1,
+        document_id: str = "d1",
+        section_header: str | None = None,
+    ) -> SearchResult:
+        return SearchResult(
+            chunk_id=f"{document_id}-{chunk_index}",
+            document_id=document_id,
+            doc_label="Doc A" if document_id == "d1" else "Doc B",
+            doc_filename=f"{document_id}.pdf",
+            content=content,
+            context_text=None,
+            page_number=page,
+            section_header=section_header,
+            score=score,
+            chunk_index=chunk_index,
+        )
+
+    return make
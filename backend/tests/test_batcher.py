@@ -0,0 +1,57 @@
+"""
+Tests for MicroBatcher's failure paths: every waiter is resolved, never left hanging.
+
+Usage:
+    uv run pytest backend/tests/test_batcher.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from takehome.services.batcher import MicroBatcher
+
+
+async def test_result_count_mismatch_fails_every_waiter():
+    async def drops_one(keys: list[str]) -> list[int]:
+        return [len(k) for k in keys][:-1]
+
+    batcher = MicroBatcher(drops_one, max_batch=8, max_wait_ms=1, name="test")
+
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.submit("a"), batcher.submit("bb"), return_exceptions=True),
+        timeout=1,
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+async def test_failing_call_fails_every_waiter():
+    async def fails(_keys: list[str]) -> list[int]:
+        raise ConnectionError("embedding API unavailable")
+
+    batcher = MicroBatcher(fails, max_batch=8, max_wait_ms=1, name="test")
+
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(batcher.submit_many(["a", "b"]), timeout=1)
+
+
+async def test_cancelled_batch_cancels_waiters_instead_of_hanging():
+    started = asyncio.Event()
+
+    async def stalls(keys: list[str]) -> list[int]:
+        started.set()
+        await asyncio.Event().wait()
+        return [len(k) for k in keys]
+
+    batcher = MicroBatcher(stalls, max_batch=8, max_wait_ms=1, name="test")
+    waiter = asyncio.ensure_future(batcher.submit("a"))
+    await asyncio.wait_for(started.wait(), timeout=1)
+
+    for task in list(batcher._running):
+        task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(waiter, timeout=1)
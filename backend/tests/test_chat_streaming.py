@@ -0,0 +1,261 @@
+"""
+Tests for the chat agent's streaming and its replayed conversation history.
+
+Usage:
+    uv run pytest backend/tests/test_chat_streaming.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+from takehome.services import llm
+from takehome.services.llm import (
+    STREAM_RESET,
+    ChatDeps,
+    HistoryMessage,
+    build_message_history,
+    chat_agent,
+    chat_with_documents,
+    compact_tool_trace,
+)
+
+# Every run that calls a tool compacts its trace, which counts tokens
+pytestmark = pytest.mark.usefixtures("offline_token_counts")
+
+
+async def _collect(deps: ChatDeps) -> list[str]:
+    return [chunk async for chunk in chat_with_documents("When is rent due?", [], deps)]
+
+
+@pytest.mark.asyncio
+async def test_answer_is_forwarded_delta_by_delta():
+    async def stream(_messages: list[ModelMessage], _info: AgentInfo) -> AsyncIterator[str]:
+        for token in ["Rent ", "is due ", "quarterly."]:
+            yield token
+
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        chunks = await _collect(ChatDeps(conversation_id="conv"))
+
+    assert chunks == ["Rent ", "is due ", "quarterly."]
+
+
+@pytest.mark.asyncio
+async def test_preamble_before_tool_call_is_reset(monkeypatch: pytest.MonkeyPatch):
+    async def no_results(**_kwargs: object) -> list[llm.SearchResult]:
+        return []
+
+    monkeypatch.setattr(llm, "search_chunks", no_results)
+
+    async def stream(
+        messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[str | DeltaToolCalls]:
+        last = messages[-1]
+        if isinstance(last, ModelRequest) and any(
+            isinstance(p, ToolReturnPart) for p in last.parts
+        ):
+            yield "No rent clause found."
+            return
+        yield "Let me search."
+        yield {0: DeltaToolCall(name="search_documents", json_args='{"query": "rent"}')}
+
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        chunks = await _collect(ChatDeps(conversation_id="conv"))
+
+    assert chunks[0] == "Let me search."
+    reset = chunks.index(STREAM_RESET)
+    answer = "".join(c for c in chunks[reset + 1 :] if not c.startswith("__STATUS__:"))
+    assert answer == "No rent clause found."
+    assert "__STATUS__:Searching: rent" in chunks
+
+
+@pytest.mark.asyncio
+async def test_tool_status_is_emitted_while_the_tool_is_running(monkeypatch: pytest.MonkeyPatch):
+    status_seen = asyncio.Event()
+
+    async def slow_search(**_kwargs: object) -> list[llm.SearchResult]:
+        # Only finishes once the consumer has already received the "Searching" status
+        await asyncio.wait_for(status_seen.wait(), timeout=2)
+        return []
+
+    monkeypatch.setattr(llm, "search_chunks", slow_search)
+
+    async def stream(
+        messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[str | DeltaToolCalls]:
+        last = messages[-1]
+        if isinstance(last, ModelRequest) and any(
+            isinstance(p, ToolReturnPart) for p in last.parts
+        ):
+            yield "Done."
+            return
+        yield {0: DeltaToolCall(name="search_documents", json_args='{"query": "rent"}')}
+
+    deps = ChatDeps(conversation_id="conv")
+    chunks: list[str] = []
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        async for chunk in chat_with_documents("When is rent due?", [], deps):
+            chunks.append(chunk)
+            if chunk == "__STATUS__:Searching: rent":
+                status_seen.set()
+
+    assert chunks == [
+        "__STATUS__:Searching: rent",
+        "__STATUS__:Found 0 results across no documents",
+        "Done.",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_follow_up_reuses_replayed_tool_results(monkeypatch: pytest.MonkeyPatch):
+    searches: list[str] = []
+
+    async def fake_search(**kwargs: object) -> list[llm.SearchResult]:
+        searches.append(str(kwargs["query"]))
+        return []
+
+    monkeypatch.setattr(llm, "search_chunks", fake_search)
+
+    async def stream(
+        messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[str | DeltaToolCalls]:
+        # Search only when no earlier tool result is visible in the conversation
+        if any(
+            isinstance(p, ToolReturnPart)
+            for m in messages
+            if isinstance(m, ModelRequest)
+            for p in m.parts
+        ):
+            yield "Quarterly, per the earlier search."
+            return
+        yield {0: DeltaToolCall(name="search_documents", json_args='{"query": "rent"}')}
+
+    first = ChatDeps(conversation_id="conv")
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        await _collect(first)
+        assert first.tool_trace is not None
+
+        history = [
+            HistoryMessage("user", "When is rent due?"),
+            HistoryMessage("assistant", "Quarterly, per the earlier search.", first.tool_trace),
+        ]
+        second = ChatDeps(conversation_id="conv")
+        chunks = [c async for c in chat_with_documents("And how much is it?", history, second)]
+
+    assert searches == ["rent"]
+    assert "".join(chunks) == "Quarterly, per the earlier search."
+    assert second.tool_trace is None
+
+
+def _replayed_tool_result(content: str) -> ModelRequest:
+    run = [
+        ModelRequest(parts=[UserPromptPart("q")]),
+        ModelResponse(parts=[ToolCallPart("search_documents", {"query": "q"}, "t1")]),
+        ModelRequest(
+            parts=[ToolReturnPart("search_documents", content, "t1")], instructions="system"
+        ),
+        ModelResponse(parts=[TextPart("answer")]),
+    ]
+
+    trace = compact_tool_trace(run)
+    assert trace is not None
+    replayed = build_message_history(
+        [HistoryMessage("user", "q"), HistoryMessage("assistant", "answer", trace)]
+    )
+
+    assert len(replayed) == 4
+    returned = replayed[2]
+    assert isinstance(returned, ModelRequest) and returned.instructions is None
+    return returned
+
+
+def test_tool_trace_truncates_long_results_at_a_paragraph(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(llm.settings, "history_tool_result_max_tokens", 10)
+    content = "\n\n".join(["rent is payable"] * 5)
+
+    returned = _replayed_tool_result(content)
+
+    assert returned.parts[0].content == "rent is payable\n\nrent is payable [...]"
+
+
+@pytest.mark.parametrize("budget", ["search_result_token_budget", "read_result_token_budget"])
+def test_tool_trace_keeps_a_budget_sized_result_whole(budget: str):
+    content = " ".join(["word"] * getattr(llm.settings, budget))
+
+    returned = _replayed_tool_result(content)
+
+    assert returned.parts[0].content == content
+
+
+@pytest.mark.asyncio
+async def test_run_usage_is_recorded_on_deps():
+    async def stream(_messages: list[ModelMessage], _info: AgentInfo) -> AsyncIterator[str]:
+        yield "Quarterly."
+
+    deps = ChatDeps(conversation_id="conv")
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        await _collect(deps)
+
+    assert deps.usage is not None
+    assert deps.usage.requests == 1
+    assert deps.usage.output_tokens > 0
+
+
+async def _run_two_searches(monkeypatch: pytest.MonkeyPatch) -> int:
+    """Have the model ask for two searches in one response; return peak concurrency."""
+    in_flight = 0
+    peak = 0
+
+    async def slow_search(**_kwargs: object) -> list[llm.SearchResult]:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return []
+
+    monkeypatch.setattr(llm, "search_chunks", slow_search)
+
+    async def stream(
+        messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[str | DeltaToolCalls]:
+        last = messages[-1]
+        if isinstance(last, ModelRequest) and any(
+            isinstance(p, ToolReturnPart) for p in last.parts
+        ):
+            yield "Done."
+            return
+        yield {
+            0: DeltaToolCall(name="search_documents", json_args='{"query": "rent"}'),
+            1: DeltaToolCall(name="search_documents", json_args='{"query": "break clause"}'),
+        }
+
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        chunks = await _collect(ChatDeps(conversation_id="conv"))
+
+    assert chunks[-1] == "Done."
+    return peak
+
+
+@pytest.mark.asyncio
+async def test_sibling_tool_calls_run_in_parallel(monkeypatch: pytest.MonkeyPatch):
+    assert await _run_two_searches(monkeypatch) == 2
+
+
+@pytest.mark.asyncio
+async def test_tool_call_concurrency_is_capped(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(llm.settings, "tool_call_concurrency", 1)
+    assert await _run_two_searches(monkeypatch) == 1
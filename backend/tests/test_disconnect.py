@@ -0,0 +1,122 @@
+"""
+Tests for cancelling the agent run when the SSE client disconnects.
+
+Usage:
+    uv run pytest backend/tests/test_disconnect.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from typing import cast
+
+import pytest
+from fastapi import Request
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+from takehome.services import llm
+from takehome.services.llm import ChatDeps, chat_agent, chat_with_documents
+from takehome.web.routers import messages
+from takehome.web.routers.messages import ClientDisconnected, _until_disconnected
+
+
+class FakeRequest:
+    def __init__(self) -> None:
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(messages.settings, "disconnect_poll_interval_seconds", 0.001)
+
+
+async def _forward(
+    chunks: AsyncGenerator[str, None],
+    request: FakeRequest,
+    on_chunk: Callable[[str], None] | None = None,
+) -> list[str]:
+    received: list[str] = []
+    with pytest.raises(ClientDisconnected):
+        async for chunk in _until_disconnected(chunks, cast(Request, request)):
+            received.append(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
+    return received
+
+
+@pytest.mark.asyncio
+async def test_disconnect_stops_a_blocked_stream():
+    closed = asyncio.Event()
+
+    async def stalled() -> AsyncGenerator[str, None]:
+        try:
+            yield "Rent is"
+            await asyncio.Event().wait()
+            yield "never sent"
+        finally:
+            closed.set()
+
+    request = FakeRequest()
+
+    def disconnect(_chunk: str) -> None:
+        request.disconnected = True
+
+    received = await _forward(stalled(), request, disconnect)
+
+    assert received == ["Rent is"]
+    await asyncio.wait_for(closed.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_stream_runs_to_completion_while_connected():
+    async def answer() -> AsyncGenerator[str, None]:
+        for token in ["Rent ", "is due ", "quarterly."]:
+            yield token
+
+    received = [c async for c in _until_disconnected(answer(), cast(Request, FakeRequest()))]
+
+    assert received == ["Rent ", "is due ", "quarterly."]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_in_flight_tool_calls(monkeypatch: pytest.MonkeyPatch):
+    search_cancelled = asyncio.Event()
+
+    async def hanging_search(**_kwargs: object) -> list[llm.SearchResult]:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            search_cancelled.set()
+            raise
+        return []
+
+    monkeypatch.setattr(llm, "search_chunks", hanging_search)
+
+    async def stream(
+        _messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[str | DeltaToolCalls]:
+        yield {0: DeltaToolCall(name="search_documents", json_args='{"query": "rent"}')}
+
+    request = FakeRequest()
+
+    def disconnect_once_searching(chunk: str) -> None:
+        if chunk == "__STATUS__:Searching: rent":
+            request.disconnected = True
+
+    deps = ChatDeps(conversation_id="conv")
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        received = await _forward(
+            chat_with_documents("When is rent due?", [], deps),
+            request,
+            disconnect_once_searching,
+        )
+
+    assert received == ["__STATUS__:Searching: rent"]
+    await asyncio.wait_for(search_cancelled.wait(), timeout=1)
+    # The one model request completed before the tool call was cancelled
+    assert deps.usage is not None and deps.usage.requests == 1
@@ -0,0 +1,144 @@
+"""
+Tests for the read_page / read_section direct reads.
+
+Usage:
+    uv run pytest backend/tests/test_document_reads.py -v
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any, cast
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.services.rag import (
+    DocumentRef,
+    SearchResult,
+    continues_number,
+    fetch_section_chunks,
+    format_document_read,
+    match_document,
+    section_prefixes,
+)
+
+DOCUMENTS = [
+    DocumentRef("d1", "Doc A", "lease.pdf"),
+    DocumentRef("d2", "Doc B", "licence-to-assign.pdf"),
+    # A filename that looks like another document's label
+    DocumentRef("d3", "Doc C", "doc b.pdf"),
+]
+
+ResultFactory = Callable[..., SearchResult]
+
+
+@pytest.mark.parametrize(
+    ("ref", "document_id"),
+    [
+        ("Doc B", "d2"),
+        ("doc b", "d2"),
+        ("B", "d2"),
+        ("licence-to-assign.pdf", "d2"),
+        ("licence-to-assign", "d2"),
+        ("LEASE", "d1"),
+        ("Doc Z", None),
+    ],
+)
+def test_match_document(ref: str, document_id: str | None):
+    match = match_document(DOCUMENTS, ref)
+    assert (match.id if match else None) == document_id
+
+
+def test_section_prefixes_drop_the_section_keyword():
+    assert section_prefixes("Clause 4.1") == ["clause 4.1", "4.1"]
+    assert section_prefixes("  Rent Review ") == ["rent review"]
+
+
+@pytest.mark.parametrize(
+    ("header", "continues"),
+    [
+        ("3 Rent", False),
+        ("3.2 Review", False),
+        ("30 Notices", True),
+        ("Rent Review", False),
+    ],
+)
+def test_section_number_is_not_a_prefix_of_a_longer_number(header: str, continues: bool):
+    assert continues_number(header, section_prefixes("3")) is continues
+
+
+class FakeSession:
+    """Returns the queued rows for each statement, in order."""
+
+    def __init__(self, *results: list[Any]) -> None:
+        self.results = list(results)
+
+    async def execute(self, _stmt: object) -> SimpleNamespace:
+        rows = self.results.pop(0)
+        return SimpleNamespace(all=lambda: rows)
+
+
+def _doc_row(document: DocumentRef) -> SimpleNamespace:
+    return SimpleNamespace(id=document.id, label=document.label, filename=document.filename)
+
+
+def _chunk_row(index: int, header: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=f"c{index}",
+        content=f"Text of {header}.",
+        context_text=None,
+        page_number=1,
+        section_header=header,
+        chunk_index=index,
+    )
+
+
+async def test_section_read_skips_longer_numbers():
+    session = FakeSession(
+        [_doc_row(d) for d in DOCUMENTS],
+        [_chunk_row(3, "3 Rent"), _chunk_row(4, "3.2 Review"), _chunk_row(30, "30 Notices")],
+    )
+
+    results = await fetch_section_chunks(cast(AsyncSession, session), "conv", "Doc A", "3")
+
+    assert [r.section_header for r in results] == ["3 Rent", "3.2 Review"]
+    assert {r.doc_label for r in results} == {"Doc A"}
+
+
+async def test_section_read_falls_back_to_headers_containing_the_text():
+    session = FakeSession(
+        [_doc_row(d) for d in DOCUMENTS],
+        [_chunk_row(30, "30 Notices")],
+        [_chunk_row(7, "Schedule 3")],
+    )
+
+    results = await fetch_section_chunks(cast(AsyncSession, session), "conv", "B", "3")
+
+    assert [r.section_header for r in results] == ["Schedule 3"]
+    assert session.results == []
+
+
+def _read_chunks(make_result: ResultFactory, count: int, words: int) -> list[SearchResult]:
+    return [
+        make_result(i, " ".join([f"w{i}"] * words), section_header="4 Rent") for i in range(count)
+    ]
+
+
+@pytest.mark.usefixtures("offline_token_counts")
+def test_read_that_fits_is_returned_whole(make_result: ResultFactory):
+    formatted = format_document_read(_read_chunks(make_result, 3, 100), token_budget=300)
+
+    assert all(formatted.count(f"w{i} ") >= 99 for i in range(3))
+    assert "truncated" not in formatted
+
+
+@pytest.mark.usefixtures("offline_token_counts")
+def test_read_over_budget_says_how_much_was_left_out(make_result: ResultFactory):
+    formatted = format_document_read(_read_chunks(make_result, 5, 100), token_budget=250)
+
+    assert "w1 " in formatted and "w2 " not in formatted
+    assert formatted.endswith(
+        "[truncated — 3 more chunks; read a narrower section or one page at a time]"
+    )
@@ -0,0 +1,109 @@
+"""
+Tests for resumable response streams: the per-stream event log and its followers.
+
+Usage:
+    uv run pytest backend/tests/test_event_log.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+
+from takehome.services import event_log
+from takehome.services.event_log import follow_stream, open_stream
+from takehome.web.routers import messages
+from takehome.web.routers.messages import _cancel_when_abandoned, _run_generation
+
+
+@pytest.fixture(autouse=True)
+def written(monkeypatch: pytest.MonkeyPatch) -> list[list[int]]:
+    """Record the seqs of each batch written to the log instead of hitting Postgres."""
+    batches: list[list[int]] = []
+
+    async def fake_write(_stream_id: str, batch: list[tuple[int, dict[str, Any]]]) -> None:
+        batches.append([seq for seq, _event in batch])
+
+    async def no_prune() -> None:
+        return None
+
+    monkeypatch.setattr(event_log, "_write_events", fake_write)
+    monkeypatch.setattr(event_log, "_prune_expired", no_prune)
+    return batches
+
+
+async def _collect(stream_id: str, after: int = -1) -> list[tuple[int, str]]:
+    return [(seq, event["type"]) async for seq, event in follow_stream(stream_id, after)]
+
+
+@pytest.mark.asyncio
+async def test_reconnect_replays_missed_events_then_follows_the_tail():
+    stream = open_stream("s-replay")
+    for kind in ["status", "delta", "delta"]:
+        stream.publish({"type": kind})
+
+    # Resuming after seq 0: the two deltas are replayed, then "done" arrives live
+    follower = asyncio.create_task(_collect("s-replay", after=0))
+    await asyncio.sleep(0)
+    stream.publish({"type": "done"})
+    await stream.close()
+
+    assert await follower == [(1, "delta"), (2, "delta"), (3, "done")]
+
+
+@pytest.mark.asyncio
+async def test_events_are_written_to_the_log_in_batches(
+    written: list[list[int]], monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(event_log.settings, "stream_flush_interval_ms", 20.0)
+    stream = open_stream("s-batch")
+    for _ in range(5):
+        stream.publish({"type": "delta"})
+    await asyncio.sleep(0.05)
+    stream.publish({"type": "done"})
+    await stream.close()
+
+    assert written == [[0, 1, 2, 3, 4], [5]]
+    assert "s-batch" not in event_log._local_streams
+
+
+@pytest.mark.asyncio
+async def test_cancelled_generation_ends_the_stream_as_interrupted():
+    started = asyncio.Event()
+
+    async def generate() -> AsyncIterator[dict[str, Any]]:
+        yield {"type": "status"}
+        started.set()
+        await asyncio.Event().wait()
+        yield {"type": "done"}
+
+    stream = open_stream("s-cancel")
+    follower = asyncio.create_task(_collect("s-cancel"))
+    generation = asyncio.create_task(_run_generation(stream, generate()))
+    await started.wait()
+    generation.cancel()
+
+    assert await follower == [(0, "status"), (1, "interrupted")]
+
+
+@pytest.mark.asyncio
+async def test_generation_nobody_follows_is_cancelled_after_the_grace_period(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(messages.settings, "stream_resume_grace_seconds", 0.05)
+
+    async def generate() -> AsyncIterator[dict[str, Any]]:
+        yield {"type": "status"}
+        await asyncio.Event().wait()
+        yield {"type": "done"}
+
+    stream = open_stream("s-abandoned")
+    generation = asyncio.create_task(_run_generation(stream, generate()))
+    await asyncio.wait_for(_cancel_when_abandoned(stream, generation), timeout=2)
+
+    with pytest.raises(asyncio.CancelledError):
+        await generation
+    assert [e["type"] for e in stream.events] == ["status", "interrupted"]
@@ -0,0 +1,111 @@
+"""
+Tests for the database path of hybrid search, where the keyword and vector
+legs each run on their own pooled session.
+
+Usage:
+    uv run pytest backend/tests/test_hybrid_search.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from takehome.services import rag
+from takehome.services.index import ConversationIndex, IndexedChunk, KeywordIndex, tokenize
+
+LEG_SECONDS = 0.2
+
+
+def _keyword_index() -> ConversationIndex:
+    chunks = [
+        IndexedChunk(
+            chunk_id=f"c{i}",
+            document_id="d1",
+            doc_label="Doc A",
+            doc_filename="lease.pdf",
+            content=text,
+            context_text=None,
+            page_number=1,
+            section_header=None,
+            chunk_index=i,
+        )
+        for i, text in enumerate(["The rent is payable quarterly.", "Break on six months notice."])
+    ]
+    return ConversationIndex(
+        conversation_id="conv",
+        corpus_version=1,
+        chunks=chunks,
+        keyword=KeywordIndex.build([tokenize(c.content) for c in chunks]),
+        embeddings=np.zeros((0, 0), dtype=np.float32),
+        vector_rows=np.zeros(0, dtype=np.int32),
+    )
+
+
+@pytest.fixture(autouse=True)
+def database_path(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(rag.settings, "index_cache_enabled", False)
+
+
+async def test_legs_run_concurrently(monkeypatch: pytest.MonkeyPatch):
+    async def slow_keyword_leg(*_args: object, **_kwargs: object) -> ConversationIndex:
+        await asyncio.sleep(LEG_SECONDS)
+        return _keyword_index()
+
+    async def slow_vector_leg(_query: str, _conversation_id: str) -> dict[str, int]:
+        await asyncio.sleep(LEG_SECONDS)
+        return {"c1": 0}
+
+    monkeypatch.setattr(rag, "load_conversation_index", slow_keyword_leg)
+    monkeypatch.setattr(rag, "_vector_leg", slow_vector_leg)
+
+    start = time.perf_counter()
+    results = await rag._hybrid_search("rent", "conv", 1, top_k=5)
+    elapsed = time.perf_counter() - start
+
+    # max(legs), not their sum
+    assert elapsed < LEG_SECONDS * 1.5
+    assert {r.chunk_id for r in results} == {"c0", "c1"}
+
+
+async def test_failing_leg_propagates_and_cancels_the_other(monkeypatch: pytest.MonkeyPatch):
+    keyword_cancelled = asyncio.Event()
+
+    async def stalled_keyword_leg(*_args: object, **_kwargs: object) -> ConversationIndex:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            keyword_cancelled.set()
+            raise
+        return _keyword_index()
+
+    async def failing_vector_leg(_query: str, _conversation_id: str) -> dict[str, int]:
+        raise ConnectionError("embedding API unavailable")
+
+    monkeypatch.setattr(rag, "load_conversation_index", stalled_keyword_leg)
+    monkeypatch.setattr(rag, "_vector_leg", failing_vector_leg)
+
+    with pytest.raises(ConnectionError, match="embedding API unavailable"):
+        await asyncio.wait_for(rag._hybrid_search("rent", "conv", 1, top_k=5), timeout=1)
+    await asyncio.wait_for(keyword_cancelled.wait(), timeout=1)
+
+
+@pytest.mark.parametrize(
+    ("tier", "columns"),
+    [
+        ("full", []),
+        ("coarse", ["embedding_coarse"]),
+        ("halfvec", ["embedding_half"]),
+        ("binary", ["embedding_bits"]),
+    ],
+)
+def test_new_chunks_store_only_the_configured_tier(
+    tier: str, columns: list[str], monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(rag.settings, "vector_storage_tier", tier)
+    embedding = [0.5, -0.5] * (rag.EMBEDDING_DIMENSIONS // 2)
+
+    assert list(rag._tier_embedding(embedding)) == columns
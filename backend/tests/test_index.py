@@ -0,0 +1,215 @@
+"""
+Tests for the in-memory conversation index used by hybrid search.
+
+Usage:
+    uv run pytest backend/tests/test_index.py -v
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from takehome.services import index as index_module
+from takehome.services import snapshot
+from takehome.services.cache import LRUCache
+from takehome.services.index import (
+    ConversationIndex,
+    IndexedChunk,
+    KeywordIndex,
+    build_conversation_index,
+    load_conversation_index,
+    tokenize,
+)
+
+TEXTS = [
+    "The Tenant shall pay the Rent quarterly in advance on the usual quarter days.",
+    "The Landlord may break this lease on six months notice to the Tenant.",
+    "Rent review: the rent shall be reviewed on each review date to open market rent.",
+    "The Tenant shall keep the premises in good and substantial repair.",
+]
+
+
+def _chunk(i: int, text: str) -> IndexedChunk:
+    return IndexedChunk(
+        chunk_id=f"c{i}",
+        document_id="d1",
+        doc_label="Doc A",
+        doc_filename="lease.pdf",
+        content=text,
+        context_text=None,
+        page_number=i + 1,
+        section_header=None,
+        chunk_index=i,
+    )
+
+
+def test_keyword_index_matches_bm25okapi():
+    corpus = [tokenize(t) for t in TEXTS]
+    reference = BM25Okapi(corpus)
+    index = KeywordIndex.build(corpus)
+
+    for query in ["rent review", "tenant shall", "break notice lease", "unknown words"]:
+        expected = reference.get_scores(tokenize(query))
+        np.testing.assert_allclose(index.scores(tokenize(query)), expected, rtol=1e-6)
+
+
+def _index(corpus_version: int = 1) -> ConversationIndex:
+    chunks = [_chunk(i, t) for i, t in enumerate(TEXTS[:3])]
+    embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]], dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return ConversationIndex(
+        conversation_id="conv",
+        corpus_version=corpus_version,
+        chunks=chunks,
+        keyword=KeywordIndex.build([tokenize(c.content) for c in chunks]),
+        embeddings=embeddings,
+        vector_rows=np.arange(3, dtype=np.int32),
+    )
+
+
+def test_vector_ranks_orders_by_cosine_similarity():
+    index = _index()
+
+    assert index.vector_ranks([0.0, 5.0], limit=2) == {"c1": 0, "c2": 1}
+    assert index.keyword_ranks("break lease", limit=1) == {"c1": 0}
+
+
+def test_lru_cache_evicts_by_weight_budget():
+    cache: LRUCache[str, bytes] = LRUCache(maxsize=10, max_weight=10, weigher=len)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"123")
+    assert cache.get("a") is None
+    assert cache.total_weight == 8
+    cache.put("huge", b"x" * 11)  # never cached
+    assert cache.get("huge") is None
+    assert cache.get("b") is not None
+
+
+def test_snapshot_round_trip_and_version_swap(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(snapshot.settings, "index_snapshot_dir", str(tmp_path))
+
+    snapshot.write_snapshot(_index(corpus_version=1))
+    snapshot.write_snapshot(_index(corpus_version=2))
+
+    assert sorted(os.listdir(tmp_path / "conv")) == ["v2.idx"]
+    assert snapshot.open_snapshot("conv", 1) is None
+
+    original = _index(corpus_version=2)
+    mapped = snapshot.open_snapshot("conv", 2)
+    assert mapped is not None and mapped.mapping is not None
+    assert mapped.chunks == original.chunks
+    assert mapped.vector_ranks([0.2, 1.0], limit=3) == original.vector_ranks([0.2, 1.0], limit=3)
+    np.testing.assert_allclose(
+        mapped.keyword.scores(tokenize("tenant rent")),
+        original.keyword.scores(tokenize("tenant rent")),
+    )
+
+
+def test_two_level_routing_scores_only_chunks_of_closest_sections(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    # Three documents with two sections each; every section points along its own axis
+    chunks: list[IndexedChunk] = []
+    vectors: list[np.ndarray] = []
+    for d in range(3):
+        for i in range(4):
+            section = i // 2
+            chunks.append(
+                IndexedChunk(
+                    chunk_id=f"d{d}c{i}",
+                    document_id=f"d{d}",
+                    doc_label=f"Doc {d}",
+                    doc_filename=f"doc{d}.pdf",
+                    content=f"clause {i}",
+                    context_text=None,
+                    page_number=1,
+                    section_header=f"{section + 1}. Section",
+                    chunk_index=i,
+                )
+            )
+            v = np.full(6, 0.05, dtype=np.float32)
+            v[d * 2 + section] = 1.0 + 0.1 * i
+            vectors.append(v)
+    index = build_conversation_index("conv", 1, chunks, vectors, list(range(len(chunks))))
+    assert index.summaries is not None
+    assert len(index.summaries.doc_centroids) == 3
+    assert len(index.summaries.section_centroids) == 6
+
+    query = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0]  # document 1, section 2
+    monkeypatch.setattr(index_module.settings, "two_level_top_documents", 1)
+    monkeypatch.setattr(index_module.settings, "two_level_top_sections", 1)
+    monkeypatch.setattr(index_module.settings, "two_level_min_documents", 100)
+    flat = index.vector_ranks(query, limit=2)
+    monkeypatch.setattr(index_module.settings, "two_level_min_documents", 2)
+    assert index.vector_ranks(query, limit=10) == {"d1c3": 0, "d1c2": 1} == flat
+
+    # Summaries survive the snapshot round trip
+    monkeypatch.setattr(snapshot.settings, "index_snapshot_dir", str(tmp_path))
+    snapshot.write_snapshot(index)
+    mapped = snapshot.open_snapshot("conv", 1)
+    assert mapped is not None and mapped.summaries is not None
+    np.testing.assert_array_equal(mapped.summaries.section_rows, index.summaries.section_rows)
+    assert mapped.vector_ranks(query, limit=10) == flat
+
+
+class OrderingSession:
+    """Returns the given rows sorted by the statement's ORDER BY columns."""
+
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self.rows = rows
+
+    async def __aenter__(self) -> OrderingSession:
+        return self
+
+    async def __aexit__(self, *_exc: object) -> None:
+        return None
+
+    async def execute(self, stmt: Any) -> SimpleNamespace:
+        keys = [f"{c.table.name}.{c.name}" for c in stmt._order_by_clauses]
+        rows = sorted(self.rows, key=lambda r: [r[k] for k in keys])
+        return SimpleNamespace(all=lambda: [SimpleNamespace(**r) for r in rows])
+
+
+async def test_documents_uploaded_together_keep_their_rows_contiguous(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    uploaded_at = datetime(2025, 1, 1, tzinfo=UTC)
+    rows: list[dict[str, Any]] = []
+    # Interleaved, as a database may return rows that tie on upload time
+    for i in range(2):
+        for d, axis in (("d2", 1), ("d1", 0)):
+            embedding = [0.0, 0.0]
+            embedding[axis] = 1.0
+            rows.append(
+                {
+                    "documents.uploaded_at": uploaded_at,
+                    "documents.id": d,
+                    "document_chunks.chunk_index": i,
+                    "id": f"{d}c{i}",
+                    "document_id": d,
+                    "content": f"clause {i}",
+                    "context_text": None,
+                    "page_number": 1,
+                    "section_header": "1. Rent",
+                    "chunk_index": i,
+                    "label": f"Doc {d}",
+                    "filename": f"{d}.pdf",
+                    "embedding": embedding,
+                }
+            )
+    monkeypatch.setattr(index_module, "async_session", lambda: OrderingSession(rows))
+
+    index = await load_conversation_index("conv", 1)
+
+    assert [c.chunk_id for c in index.chunks] == ["d1c0", "d1c1", "d2c0", "d2c1"]
+    assert index.summaries is not None
+    np.testing.assert_allclose(index.summaries.doc_centroids, [[1.0, 0.0], [0.0, 1.0]])
+    np.testing.assert_array_equal(index.summaries.doc_section_offsets, [0, 1, 2])
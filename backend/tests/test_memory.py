@@ -0,0 +1,81 @@
+"""
+Tests for token-budgeted conversation memory.
+
+Usage:
+    uv run pytest backend/tests/test_memory.py -v
+"""
+
+from __future__ import annotations
+
+import pytest
+from pydantic_ai.messages import ModelRequest, ModelResponse
+
+from takehome.db.models import Message
+from takehome.services import memory
+from takehome.services.llm import HistoryMessage, build_message_history
+from takehome.services.memory import _recent_window, _split_turns, plain_content
+
+pytestmark = pytest.mark.usefixtures("offline_token_counts")
+
+
+def _turns(n: int, words: int = 10) -> list[Message]:
+    messages: list[Message] = []
+    for i in range(n):
+        messages.append(Message(role="user", content=f"q{i} " + "w " * words))
+        messages.append(
+            Message(
+                role="assistant",
+                content=f'a{i} <cite doc="A" page="{i + 1}">clause</cite>',
+                content_plain=f"a{i} clause [A, p.{i + 1}]",
+            )
+        )
+    return messages
+
+
+def test_window_is_bounded_by_turn_count(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(memory.settings, "memory_recent_turns", 3)
+    monkeypatch.setattr(memory.settings, "memory_token_budget", 10_000)
+
+    start, _tokens = _recent_window(_split_turns(_turns(10)))
+
+    assert start == 7
+
+
+def test_window_is_bounded_by_token_budget_but_keeps_newest_turn(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(memory.settings, "memory_recent_turns", 10)
+    # Each turn is 11 + 4 = 15 "tokens"
+    monkeypatch.setattr(memory.settings, "memory_token_budget", 40)
+    assert _recent_window(_split_turns(_turns(5))) == (3, 30)
+
+    monkeypatch.setattr(memory.settings, "memory_token_budget", 5)
+    assert _recent_window(_split_turns(_turns(5))) == (4, 15)
+
+
+def test_plain_content_prefers_stored_column_and_strips_legacy_rows():
+    stored, legacy = (
+        _turns(1)[1],
+        Message(role="assistant", content='Rent <cite doc="B" page="3">is due</cite>.'),
+    )
+
+    assert plain_content(stored) == "a0 clause [A, p.1]"
+    assert plain_content(legacy) == "Rent is due [B, p.3]."
+
+
+def test_history_starts_with_summary_and_replays_plain_content():
+    replayed = build_message_history(
+        [
+            HistoryMessage("user", "Who is the tenant?"),
+            HistoryMessage("assistant", "a0 clause [A, p.1]"),
+        ],
+        summary="The lease is 10 years.",
+    )
+
+    first, answer = replayed
+    assert isinstance(first, ModelRequest) and isinstance(answer, ModelResponse)
+    assert [p.content for p in first.parts] == [
+        "Summary of the earlier conversation:\nThe lease is 10 years.\n",
+        "Who is the tenant?",
+    ]
+    assert answer.text == "a0 clause [A, p.1]"
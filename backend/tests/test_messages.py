@@ -0,0 +1,236 @@
+"""
+Tests for send_message's generation and its title event, driven through the
+endpoint with the database, model and title generation stubbed out.
+
+Usage:
+    uv run pytest backend/tests/test_messages.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from typing import Any, cast
+
+import pytest
+from fastapi import Request
+from pydantic_ai.usage import RunUsage
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.db.models import Message
+from takehome.services import event_log
+from takehome.services.event_log import follow_stream
+from takehome.services.memory import ConversationMemory
+from takehome.web.routers import messages
+from takehome.web.routers.messages import MessageCreate, send_message
+
+type ChatStream = Callable[..., AsyncIterator[str]]
+
+
+class FakeSession:
+    """The request session: saves the user message and gives it a fresh id."""
+
+    def __init__(self) -> None:
+        self.user_message_id = str(uuid.uuid4())
+
+    def add(self, _message: Message) -> None:
+        pass
+
+    async def commit(self) -> None:
+        pass
+
+    async def refresh(self, message: Message) -> None:
+        message.id = self.user_message_id
+
+
+@asynccontextmanager
+async def _no_session() -> AsyncGenerator[None, None]:
+    yield None
+
+
+class Saved:
+    """Assistant messages the generation saved, complete or interrupted."""
+
+    def __init__(self) -> None:
+        self.complete: list[str] = []
+        self.interrupted: list[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.saving = asyncio.Event()
+        self.done = asyncio.Event()
+
+    async def save(
+        self,
+        conversation_id: str,
+        content: str,
+        _usage: RunUsage | None,
+        _tool_trace: list[dict[str, Any]] | None,
+    ) -> Message:
+        self.saving.set()
+        await self.release.wait()
+        self.complete.append(content)
+        self.done.set()
+        return Message(
+            id=str(uuid.uuid4()),
+            conversation_id=conversation_id,
+            role="assistant",
+            content=content,
+            sources_cited=0,
+            created_at=datetime.now(UTC),
+        )
+
+    async def save_interrupted(
+        self, _conversation_id: str, partial: str, _usage: RunUsage | None
+    ) -> None:
+        await asyncio.sleep(0.01)
+        self.interrupted.append(partial)
+        self.done.set()
+
+
+@pytest.fixture(autouse=True)
+def saved(monkeypatch: pytest.MonkeyPatch) -> Saved:
+    """Stub out everything send_message touches besides the stream itself."""
+    recorder = Saved()
+
+    async def get_conversation(_session: AsyncSession, conversation_id: str) -> SimpleNamespace:
+        return SimpleNamespace(id=conversation_id)
+
+    async def no_documents(_session: AsyncSession, _conversation_id: str) -> list[Any]:
+        return []
+
+    async def empty_memory(*_args: object, **_kwargs: object) -> ConversationMemory:
+        return ConversationMemory("conv", None, 0, [], [], 0)
+
+    async def no_op(*_args: object, **_kwargs: object) -> None:
+        return None
+
+    async def title(_user_message: str) -> str:
+        return "Rent due dates"
+
+    monkeypatch.setattr(messages, "get_conversation", get_conversation)
+    monkeypatch.setattr(messages, "get_documents_for_conversation", no_documents)
+    monkeypatch.setattr(messages, "load_memory", empty_memory)
+    monkeypatch.setattr(messages, "_save_assistant_message", recorder.save)
+    monkeypatch.setattr(messages, "_save_interrupted_message", recorder.save_interrupted)
+    monkeypatch.setattr(messages, "generate_title", title)
+    monkeypatch.setattr(messages, "update_conversation", no_op)
+    monkeypatch.setattr(messages, "async_session", _no_session)
+    monkeypatch.setattr(event_log, "_write_events", no_op)
+    monkeypatch.setattr(event_log, "_prune_expired", no_op)
+    return recorder
+
+
+def _chat(*chunks: str, hang: bool = False) -> ChatStream:
+    async def chat_with_documents(**_kwargs: object) -> AsyncIterator[str]:
+        for chunk in chunks:
+            yield chunk
+        if hang:
+            await asyncio.Event().wait()
+
+    return chat_with_documents
+
+
+async def _send(chat: ChatStream, monkeypatch: pytest.MonkeyPatch) -> str:
+    """Send a message and return the id of its response stream."""
+    monkeypatch.setattr(messages, "chat_with_documents", chat)
+    session = FakeSession()
+    await send_message(
+        "conv",
+        MessageCreate(content="When is rent due?"),
+        cast(Request, SimpleNamespace()),
+        cast(AsyncSession, session),
+    )
+    # Stream ids are the ids of the user messages they answer
+    return session.user_message_id
+
+
+async def _wait_for_background_tasks() -> None:
+    await asyncio.wait_for(
+        asyncio.wait(set(messages._background_tasks), return_when=asyncio.ALL_COMPLETED),
+        timeout=2,
+    )
+
+
+async def _follow(stream_id: str) -> list[dict[str, Any]]:
+    async def collect() -> list[dict[str, Any]]:
+        return [event async for _seq, event in follow_stream(stream_id, -1)]
+
+    return await asyncio.wait_for(collect(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_title_event_is_sent_before_done(monkeypatch: pytest.MonkeyPatch):
+    stream_id = await _send(_chat("Rent is due ", "quarterly."), monkeypatch)
+
+    events = await _follow(stream_id)
+
+    kinds = [e["type"] for e in events]
+    assert kinds.index("title") < kinds.index("done") == len(kinds) - 1
+    assert next(e for e in events if e["type"] == "title")["title"] == "Rent due dates"
+
+
+@pytest.mark.asyncio
+async def test_slow_title_does_not_delay_done(monkeypatch: pytest.MonkeyPatch):
+    release = asyncio.Event()
+
+    async def slow_title(_user_message: str) -> str:
+        await release.wait()
+        return "Rent due dates"
+
+    monkeypatch.setattr(messages, "generate_title", slow_title)
+    stream_id = await _send(_chat("Quarterly."), monkeypatch)
+
+    events = await _follow(stream_id)
+    release.set()
+
+    assert events[-1]["type"] == "done"
+    assert "title" not in [e["type"] for e in events]
+
+
+@pytest.mark.asyncio
+async def test_failing_title_does_not_break_the_stream(monkeypatch: pytest.MonkeyPatch):
+    async def failing_title(_user_message: str) -> str:
+        raise RuntimeError("title model unavailable")
+
+    monkeypatch.setattr(messages, "generate_title", failing_title)
+    stream_id = await _send(_chat("Quarterly."), monkeypatch)
+
+    events = await _follow(stream_id)
+
+    assert [e["type"] for e in events] == ["delta", "message", "done"]
+
+
+@pytest.mark.asyncio
+async def test_abandoned_answer_is_saved_before_the_generation_ends(
+    saved: Saved, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(messages.settings, "stream_resume_grace_seconds", 0.05)
+
+    await _send(_chat("Rent is", hang=True), monkeypatch)
+    await _wait_for_background_tasks()
+
+    # Saved within the cancelled task, not by a task spawned from it
+    assert saved.interrupted == ["Rent is"]
+    assert saved.complete == []
+
+
+@pytest.mark.asyncio
+async def test_cancel_during_the_final_save_keeps_the_answer(
+    saved: Saved, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(messages.settings, "stream_resume_grace_seconds", 0.05)
+    saved.release.clear()
+
+    await _send(_chat("Quarterly in advance."), monkeypatch)
+    await asyncio.wait_for(saved.saving.wait(), timeout=1)
+    # Nobody follows, so the grace period runs out mid-save and cancels the run
+    await _wait_for_background_tasks()
+    saved.release.set()
+
+    await asyncio.wait_for(saved.done.wait(), timeout=1)
+    assert saved.complete == ["Quarterly in advance."]
+    assert saved.interrupted == []
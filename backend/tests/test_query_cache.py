@@ -0,0 +1,207 @@
+"""
+Tests for the query embedding cache in front of the OpenAI embeddings API,
+and the search result cache in front of retrieval.
+
+Usage:
+    uv run pytest backend/tests/test_query_cache.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import cast
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.services import rag
+from takehome.services.cache import LRUCache
+from takehome.services.metrics import metrics
+from takehome.services.rag import SearchResult
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(rag, "_query_embedding_cache", LRUCache(maxsize=8, ttl_seconds=60))
+    results: LRUCache[tuple[str, int, str, int], list[SearchResult]] = LRUCache(maxsize=8)
+    monkeypatch.setattr(rag, "_search_result_cache", results)
+    monkeypatch.setattr(rag.settings, "query_embedding_cache_shared", False)
+    metrics.reset()
+
+
+def test_normalize_query_collapses_trivial_variations():
+    assert rag.normalize_query("  What is the RENT?  ") == rag.normalize_query("what is the rent")
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_expires_entries(monkeypatch: pytest.MonkeyPatch):
+    now = 1000.0
+    monkeypatch.setattr("takehome.services.cache.time.monotonic", lambda: now)
+    cache: LRUCache[str, int] = LRUCache(maxsize=2, ttl_seconds=10)
+    cache.put("a", 1)
+    now += 11
+    assert cache.get("a") is None
+
+
+async def test_repeated_query_skips_embedding_call(monkeypatch: pytest.MonkeyPatch):
+    calls: list[list[str]] = []
+
+    async def fake_embed_texts(texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        return [[0.1, 0.2, 0.3] for _ in texts]
+
+    monkeypatch.setattr(rag, "embed_texts", fake_embed_texts)
+
+    first = await rag.embed_query("Break clause notice period?")
+    second = await rag.embed_query("break clause   notice period")
+
+    assert first == second
+    assert len(calls) == 1
+    assert metrics.counter("embedding_cache.hits") == 1
+    assert metrics.counter("embedding_cache.misses") == 1
+    assert metrics.snapshot()["ratios"]["embedding_cache.hit_rate"] == 0.5
+
+
+async def test_batch_embeds_all_misses_in_one_call(monkeypatch: pytest.MonkeyPatch):
+    calls: list[list[str]] = []
+
+    async def fake_embed_texts(texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        return [[float(len(t))] for t in texts]
+
+    monkeypatch.setattr(rag, "embed_texts", fake_embed_texts)
+
+    await rag.embed_query("rent review")
+    embeddings = await rag.embed_queries(["Rent review", "break clause", "repairing covenant"])
+
+    assert len(calls) == 2
+    assert sorted(calls[1]) == ["break clause", "repairing covenant"]
+    assert embeddings == [[11.0], [12.0], [18.0]]
+
+
+async def test_concurrent_misses_share_one_embedding_call(monkeypatch: pytest.MonkeyPatch):
+    calls: list[list[str]] = []
+
+    async def fake_embed_texts(texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        return [[float(len(t))] for t in texts]
+
+    monkeypatch.setattr(rag, "embed_texts", fake_embed_texts)
+
+    embeddings = await asyncio.gather(
+        rag.embed_query("rent review"),
+        rag.embed_query("break clause"),
+        rag.embed_query("Rent review?"),
+    )
+
+    assert len(calls) == 1
+    assert sorted(calls[0]) == ["break clause", "rent review"]
+    assert embeddings == [[11.0], [12.0], [11.0]]
+    assert metrics.snapshot()["distributions"]["embedding_batch.batch_size"]["max"] == 2
+
+
+async def test_shared_cache_write_does_not_block_the_search(monkeypatch: pytest.MonkeyPatch):
+    release = asyncio.Event()
+    stored: list[str] = []
+
+    async def fake_embed_texts(texts: list[str]) -> list[list[float]]:
+        return [[0.5] for _ in texts]
+
+    async def no_shared_hit(_cache_key: str) -> list[float] | None:
+        return None
+
+    async def slow_store(_cache_key: str, normalized_query: str, _embedding: list[float]) -> None:
+        await release.wait()
+        stored.append(normalized_query)
+
+    monkeypatch.setattr(rag, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(rag.settings, "query_embedding_cache_shared", True)
+    monkeypatch.setattr(rag, "_load_shared_query_embedding", no_shared_hit)
+    monkeypatch.setattr(rag, "_store_shared_query_embedding", slow_store)
+
+    embedding = await asyncio.wait_for(rag.embed_query("rent review"), timeout=1)
+
+    assert embedding == [0.5]
+    assert stored == []
+    release.set()
+    await asyncio.gather(*rag._background_tasks)
+    assert stored == ["rent review"]
+
+
+class FakeRetrieval:
+    """Stands in for the corpus version lookup and the hybrid search it keys."""
+
+    def __init__(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        self.corpus_version = 1
+        self.searches: list[tuple[str, int, int]] = []
+        monkeypatch.setattr(rag, "get_corpus_version", self.get_corpus_version)
+        monkeypatch.setattr(rag, "_hybrid_search", self.hybrid_search)
+
+    async def get_corpus_version(self, _session: AsyncSession, _conversation_id: str) -> int:
+        return self.corpus_version
+
+    async def hybrid_search(
+        self, query: str, conversation_id: str, corpus_version: int, top_k: int
+    ) -> list[SearchResult]:
+        self.searches.append((query, corpus_version, top_k))
+        return [
+            SearchResult(
+                chunk_id="c1",
+                document_id="d1",
+                doc_label="Doc A",
+                doc_filename="lease.pdf",
+                content="The rent is payable quarterly.",
+                context_text=None,
+                page_number=1,
+                section_header=None,
+                score=1.0,
+                chunk_index=0,
+            )
+        ]
+
+
+async def _search(query: str, top_k: int = 5) -> list[SearchResult]:
+    return await rag.search_chunks(query, "conv", cast(AsyncSession, None), top_k=top_k)
+
+
+async def test_repeated_search_is_served_from_the_result_cache(monkeypatch: pytest.MonkeyPatch):
+    retrieval = FakeRetrieval(monkeypatch)
+
+    first = await _search("When is the rent payable?")
+    second = await _search("when is the rent   payable")
+
+    assert [r.chunk_id for r in second] == [r.chunk_id for r in first] == ["c1"]
+    assert len(retrieval.searches) == 1
+    assert metrics.counter("search_cache.hits") == 1
+
+
+async def test_corpus_change_invalidates_cached_results(monkeypatch: pytest.MonkeyPatch):
+    retrieval = FakeRetrieval(monkeypatch)
+
+    await _search("When is the rent payable?")
+    retrieval.corpus_version += 1  # what bump_corpus_version does on upload/delete
+    await _search("When is the rent payable?")
+
+    assert [version for _, version, _ in retrieval.searches] == [1, 2]
+    assert metrics.counter("search_cache.hits") == 0
+
+
+async def test_different_top_k_is_a_separate_cache_entry(monkeypatch: pytest.MonkeyPatch):
+    retrieval = FakeRetrieval(monkeypatch)
+
+    await _search("When is the rent payable?", top_k=5)
+    await _search("When is the rent payable?", top_k=10)
+    await _search("When is the rent payable?", top_k=5)
+
+    assert [top_k for _, _, top_k in retrieval.searches] == [5, 10]
+    assert metrics.counter("search_cache.hits") == 1
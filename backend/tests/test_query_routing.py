@@ -0,0 +1,141 @@
+"""
+Tests for routing exact-lookup queries to keyword-only retrieval.
+
+Usage:
+    uv run pytest backend/tests/test_query_routing.py -v
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from takehome.services import rag
+from takehome.services.cache import LRUCache
+from takehome.services.index import ConversationIndex, IndexedChunk, KeywordIndex, tokenize
+
+TEXTS = [
+    "4.1 The Tenant shall pay the Rent quarterly in advance.",
+    "Title number NGL885533 is registered at HM Land Registry.",
+    "Schedule 3 sets out the service charge provisions.",
+    '"Permitted Use" means use as offices. The Landlord obligations are set out below.',
+]
+
+
+@pytest.mark.parametrize(
+    ("query", "route"),
+    [
+        ("clause 4.1", "lexical"),
+        ("NGL885533", "lexical"),
+        ("Schedule 3", "lexical"),
+        ('"quiet enjoyment"', "lexical"),
+        ("4.1.2", "lexical"),
+        # Title Case alone is not enough without the corpus's defined terms
+        ("Permitted Use", "hybrid"),
+        ("What is the rent?", "hybrid"),
+        ("who is responsible for repairs", "hybrid"),
+        ("what does schedule 3 say about service charges and repair obligations", "hybrid"),
+    ],
+)
+def test_classify_query(query: str, route: str):
+    assert rag.classify_query(query) == route
+
+
+@pytest.mark.parametrize(
+    ("query", "route"),
+    [
+        ("Permitted Use", "lexical"),
+        ("permitted use", "hybrid"),
+        ("Summary", "hybrid"),
+        ("Rent Review Provisions", "hybrid"),
+        ("Landlord Obligations", "hybrid"),
+    ],
+)
+def test_only_terms_the_corpus_defines_are_lexical(query: str, route: str):
+    assert rag.classify_query(query, frozenset({"permitted use"})) == route
+
+
+@pytest.fixture
+def index(monkeypatch: pytest.MonkeyPatch) -> ConversationIndex:
+    chunks = [
+        IndexedChunk(
+            chunk_id=f"c{i}",
+            document_id="d1",
+            doc_label="Doc A",
+            doc_filename="lease.pdf",
+            content=text,
+            context_text=None,
+            page_number=1,
+            section_header=None,
+            chunk_index=i,
+        )
+        for i, text in enumerate(TEXTS)
+    ]
+    index = ConversationIndex(
+        conversation_id="conv",
+        corpus_version=1,
+        chunks=chunks,
+        keyword=KeywordIndex.build([tokenize(c.content) for c in chunks]),
+    )
+
+    async def fake_corpus_version(_session: object, _conversation_id: str) -> int:
+        return 1
+
+    async def fake_search_index(_conversation_id: str, _corpus_version: int) -> ConversationIndex:
+        return index
+
+    monkeypatch.setattr(rag, "get_corpus_version", fake_corpus_version)
+    monkeypatch.setattr(rag, "_search_index", fake_search_index)
+    monkeypatch.setattr(rag, "_search_result_cache", LRUCache(maxsize=8))
+    return index
+
+
+async def test_lexical_query_skips_embedding(
+    index: ConversationIndex, monkeypatch: pytest.MonkeyPatch
+):
+    async def no_embedding(_query: str) -> list[float]:
+        raise AssertionError("lexical queries must not be embedded")
+
+    monkeypatch.setattr(rag, "embed_query", no_embedding)
+
+    results = await rag.search_chunks("NGL885533", "conv", session=None)  # type: ignore[arg-type]
+
+    assert [r.chunk_id for r in results] == ["c1"]
+
+
+async def test_lexical_query_without_matches_falls_back_to_hybrid(
+    index: ConversationIndex, monkeypatch: pytest.MonkeyPatch
+):
+    searched: list[str] = []
+
+    async def fake_hybrid(query: str, *_args: object) -> list[rag.SearchResult]:
+        searched.append(query)
+        return []
+
+    monkeypatch.setattr(rag, "_hybrid_search", fake_hybrid)
+
+    await rag.search_chunks("clause 99.9", "conv", session=None)  # type: ignore[arg-type]
+
+    assert searched == ["clause 99.9"]
+
+
+def test_defined_terms_are_read_from_quoted_definitions(index: ConversationIndex):
+    assert index.defined_terms == {"permitted use"}
+
+
+async def test_title_case_concept_keeps_the_vector_leg(
+    index: ConversationIndex, monkeypatch: pytest.MonkeyPatch
+):
+    searched: list[str] = []
+
+    async def fake_hybrid(query: str, *_args: object) -> list[rag.SearchResult]:
+        searched.append(query)
+        return []
+
+    monkeypatch.setattr(rag, "_hybrid_search", fake_hybrid)
+
+    # "landlord" matches literally, but this is a concept, not a defined term
+    await rag.search_chunks("Landlord Obligations", "conv", session=None)  # type: ignore[arg-type]
+    results = await rag.search_chunks("Permitted Use", "conv", session=None)  # type: ignore[arg-type]
+
+    assert searched == ["landlord obligations"]
+    assert [r.chunk_id for r in results] == ["c3"]
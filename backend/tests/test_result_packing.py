@@ -0,0 +1,102 @@
+"""
+Tests for packing search results into the token budget sent to the model.
+
+Usage:
+    uv run pytest backend/tests/test_result_packing.py -v
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import pytest
+
+from takehome.services import rag
+from takehome.services.rag import (
+    SearchResult,
+    extract_snippets,
+    focus_results,
+    format_search_results,
+)
+
+pytestmark = pytest.mark.usefixtures("offline_token_counts")
+
+ResultFactory = Callable[..., SearchResult]
+
+
+def test_adjacent_chunks_merge_and_drop_overlap(make_result: ResultFactory):
+    results = [
+        make_result(3, "Clause 4 rent review.\n\nShort overlap.", 0.9, page=2),
+        make_result(4, "Short overlap.\n\nClause 5 break option.", 0.5, page=3),
+    ]
+
+    formatted = format_search_results(results, token_budget=1000)
+
+    assert formatted.count("[Result") == 1
+    assert formatted.count("Short overlap.") == 1
+    assert "Pages 2-3" in formatted
+    assert "[Page 3]\n\nClause 5 break option." in formatted
+
+
+def test_duplicate_paragraphs_across_documents_are_dropped(make_result: ResultFactory):
+    shared = "The Landlord shall insure the Building."
+    results = [
+        make_result(0, f"{shared}\n\nDoc A only.", 0.9),
+        make_result(7, f"{shared}\n\nDoc B only.", 0.8, document_id="d2"),
+    ]
+
+    formatted = format_search_results(results, token_budget=1000)
+
+    assert formatted.count(shared) == 1
+    assert "Doc B only." in formatted
+
+
+def test_budget_is_filled_in_score_order(make_result: ResultFactory):
+    filler = " ".join(["word"] * 150)
+    results = [make_result(i * 2, f"{i} {filler}", score=1.0 - i / 10) for i in range(5)]
+
+    formatted = format_search_results(results, token_budget=400)
+
+    assert len(formatted.split()) <= 400
+    assert formatted.startswith("[Result 1]") and "0 word" in formatted
+    assert "4 word" not in formatted
+
+
+LONG_CHUNK = (
+    "The Term is fifteen years. The Rent is payable quarterly. "
+    "The Tenant may insure the Premises. The Tenant may exercise a break option on the fifth "
+    "anniversary. Notice must be six months. Service charge is capped. "
+    "The Landlord repairs the structure. Alienation requires consent."
+)
+
+
+def test_snippet_keeps_sentence_window_around_best_match(make_result: ResultFactory):
+    [result] = extract_snippets([make_result(0, LONG_CHUNK, 0.9, page=4)], "break option notice")
+
+    assert result.snippet and result.page_number == 4
+    assert "break option on the fifth anniversary" in result.content
+    assert "Notice must be six months." in result.content
+    assert "The Term is fifteen years." not in result.content
+    assert "Alienation" not in result.content
+    assert result.content.startswith("[...]") and result.content.endswith("[...]")
+
+
+def test_snippet_keeps_whole_chunk_without_lexical_match(make_result: ResultFactory):
+    [result] = extract_snippets([make_result(0, LONG_CHUNK, 0.9)], "indemnity")
+
+    assert not result.snippet and result.content == LONG_CHUNK
+
+
+def test_default_snippet_mode_excerpts_only_over_budget(
+    make_result: ResultFactory, monkeypatch: pytest.MonkeyPatch
+):
+    results = [make_result(i, LONG_CHUNK, 1.0 - i / 10) for i in range(3)]
+    whole_tokens = 3 * len(LONG_CHUNK.split())
+
+    monkeypatch.setattr(rag.settings, "search_result_token_budget", whole_tokens)
+    assert not any(r.snippet for r in focus_results(results, "break option notice", None))
+
+    monkeypatch.setattr(rag.settings, "search_result_token_budget", whole_tokens - 1)
+    assert all(r.snippet for r in focus_results(results, "break option notice", None))
+    # An explicit choice wins either way
+    assert not any(r.snippet for r in focus_results(results, "break option notice", False))
@@ -0,0 +1,127 @@
+"""
+Tests for speculative pre-retrieval of the user's message.
+
+Usage:
+    uv run pytest backend/tests/test_speculation.py -v
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+
+import pytest
+from pydantic_ai.messages import ModelMessage, ModelRequest, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+from takehome.services import llm, speculation
+from takehome.services.llm import ChatDeps, chat_agent, chat_with_documents
+from takehome.services.metrics import metrics
+from takehome.services.rag import SearchResult
+from takehome.services.speculation import (
+    discard_speculative_search,
+    speculative_query,
+    start_speculative_search,
+    take_speculative_results,
+)
+
+
+@pytest.fixture
+def speculated(
+    make_result: Callable[..., SearchResult], monkeypatch: pytest.MonkeyPatch
+) -> list[str]:
+    """Record speculative searches; each returns one rent clause."""
+    queries: list[str] = []
+
+    async def fake_search(**kwargs: object) -> list[SearchResult]:
+        queries.append(str(kwargs["query"]))
+        return [make_result(content="The rent is payable quarterly in advance. Other terms apply.")]
+
+    monkeypatch.setattr(speculation, "search_chunks", fake_search)
+    return queries
+
+
+def test_short_follow_up_carries_previous_question():
+    assert speculative_query("And the deposit?", "When is rent due?") == (
+        "When is rent due?\nAnd the deposit?"
+    )
+    long_question = "What does the lease say about repairs to the roof and structure?"
+    assert speculative_query(long_question, "When is rent due?") == long_question
+
+
+@pytest.mark.asyncio
+async def test_matching_query_reuses_speculative_results(speculated: list[str]):
+    hits = metrics.counter("speculative_search.hits")
+    spec = start_speculative_search("conv", "When is rent due?")
+
+    results = await take_speculative_results(spec, "when is rent due")
+
+    assert results is not None and results[0].doc_label == "Doc A"
+    assert speculated == ["When is rent due?"]
+    assert metrics.counter("speculative_search.hits") == hits + 1
+    # Only the first search may take the results
+    assert await take_speculative_results(spec, "when is rent due") is None
+
+
+@pytest.mark.asyncio
+async def test_dissimilar_query_misses_and_cancels(
+    speculated: list[str], monkeypatch: pytest.MonkeyPatch
+):
+    async def orthogonal(queries: list[str]) -> list[list[float]]:
+        return [[1.0, 0.0], [0.0, 1.0]][: len(queries)]
+
+    monkeypatch.setattr(speculation, "embed_queries", orthogonal)
+    misses = metrics.counter("speculative_search.misses")
+    spec = start_speculative_search("conv", "When is rent due?")
+    assert spec is not None
+
+    assert await take_speculative_results(spec, "break clause notice period") is None
+    assert metrics.counter("speculative_search.misses") == misses + 1
+    await asyncio.sleep(0)
+    assert spec.task.done()
+
+
+@pytest.mark.asyncio
+async def test_unused_speculation_is_cancelled(speculated: list[str]):
+    unused = metrics.counter("speculative_search.unused")
+    spec = start_speculative_search("conv", "Thanks!")
+    assert spec is not None
+
+    discard_speculative_search(spec)
+
+    assert metrics.counter("speculative_search.unused") == unused + 1
+    await asyncio.sleep(0)
+    assert spec.task.cancelled()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("offline_token_counts")
+async def test_agent_search_is_served_by_the_speculation(
+    speculated: list[str], monkeypatch: pytest.MonkeyPatch
+):
+    async def no_search(**_kwargs: object) -> list[SearchResult]:
+        raise AssertionError("search_documents should reuse the speculative results")
+
+    monkeypatch.setattr(llm, "search_chunks", no_search)
+
+    async def stream(
+        messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[str | DeltaToolCalls]:
+        last = messages[-1]
+        if isinstance(last, ModelRequest) and any(
+            isinstance(p, ToolReturnPart) for p in last.parts
+        ):
+            yield "Quarterly in advance."
+            return
+        yield {0: DeltaToolCall(name="search_documents", json_args='{"query": "rent due"}')}
+
+    deps = ChatDeps(
+        conversation_id="conv",
+        speculative=start_speculative_search("conv", "Rent due?"),
+    )
+    with chat_agent.override(model=FunctionModel(stream_function=stream)):
+        chunks = [c async for c in chat_with_documents("Rent due?", [], deps)]
+
+    assert speculated == ["Rent due?"]
+    assert "__STATUS__:Found 1 results across Doc A" in chunks
+    assert chunks[-1] == "Quarterly in advance."
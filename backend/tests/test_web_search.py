@@ -41,18 +41,11 @@ def test_agent_has_search_documents_tool():
 # ---------------------------------------------------------------------------
 
 
-class FakeSession:
-    """Stub that satisfies the session slot in ChatDeps without a real DB."""
-
-
 @pytest.mark.skipif(not settings.anthropic_api_key, reason="ANTHROPIC_API_KEY not set")
 @pytest.mark.asyncio
 async def test_web_search_emits_status():
     """Ask a question that should trigger web_search and verify status events."""
-    deps = ChatDeps(
-        conversation_id="test-web-search",
-        session=FakeSession(),
-    )
+    deps = ChatDeps(conversation_id="test-web-search")
 
     # A question that clearly requires web context, not uploaded documents
     question = (
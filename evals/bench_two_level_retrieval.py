@@ -0,0 +1,167 @@
+"""
+Two-level retrieval scaling benchmark — flat vs document/section routing.
+
+Builds synthetic in-memory conversation indexes of growing size (documents of
+sectioned chunks, clustered the way real data rooms are) and times the vector
+leg of hybrid search, ConversationIndex.vector_ranks, two ways:
+
+  flat        score every chunk embedding in the conversation
+  two-level   score document centroids, then the sections of the top
+              documents, then only the chunks of the top sections
+              (settings.two_level_top_documents / two_level_top_sections)
+
+Flat latency grows linearly with the number of chunks; two-level latency
+should stay roughly flat, since the chunks it scores are bounded by the
+routing limits. Recall@10 is measured against the flat ranking.
+
+No database or API calls are needed.
+
+Usage:
+    uv run python evals/bench_two_level_retrieval.py
+    uv run python evals/bench_two_level_retrieval.py --docs 10 50 200 800 --chunks-per-doc 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "src"))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import numpy as np
+
+from takehome.config import settings
+from takehome.services.index import ConversationIndex, IndexedChunk, build_conversation_index
+from takehome.services.rag import EMBEDDING_DIMENSIONS
+
+TOP_K = 10
+
+
+# ─────────────────────────────────────────────────────
+# Data
+# ─────────────────────────────────────────────────────
+
+def normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.linalg.norm(m, axis=-1, keepdims=True)
+
+
+def synthetic_index(
+    n_docs: int, chunks_per_doc: int, chunks_per_section: int, seed: int
+) -> tuple[ConversationIndex, np.ndarray]:
+    """A conversation of ``n_docs`` documents: doc topic + section topic + chunk noise."""
+    rng = np.random.default_rng(seed)
+    dim = EMBEDDING_DIMENSIONS
+    chunks: list[IndexedChunk] = []
+    vectors: list[np.ndarray] = []
+    for d in range(n_docs):
+        doc_center = rng.standard_normal(dim)
+        section_center = doc_center
+        for i in range(chunks_per_doc):
+            section = i // chunks_per_section
+            if i % chunks_per_section == 0:
+                section_center = doc_center + rng.standard_normal(dim) * 0.8
+            vectors.append(section_center + rng.standard_normal(dim) * 0.6)
+            chunks.append(
+                IndexedChunk(
+                    chunk_id=f"d{d}c{i}",
+                    document_id=f"d{d}",
+                    doc_label=f"Doc {d}",
+                    doc_filename=f"doc{d}.pdf",
+                    content="",
+                    context_text=None,
+                    page_number=section + 1,
+                    section_header=f"{section + 1}. Section",
+                    chunk_index=i,
+                )
+            )
+    matrix = normalize(np.stack(vectors)).astype(np.float32)
+    index = build_conversation_index("bench", 1, chunks, list(matrix), list(range(len(chunks))))
+    return index, matrix
+
+
+# ─────────────────────────────────────────────────────
+# Measurement
+# ─────────────────────────────────────────────────────
+
+def time_queries(index: ConversationIndex, queries: np.ndarray) -> tuple[float, list[set[str]]]:
+    """Return (p50 ms, top-k ids per query)."""
+    for q in queries[:5]:
+        index.vector_ranks(q.tolist(), TOP_K)
+    latencies: list[float] = []
+    found: list[set[str]] = []
+    for q in queries:
+        start = time.perf_counter()
+        ranks = index.vector_ranks(q.tolist(), TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(set(ranks))
+    return float(np.percentile(latencies, 50)), found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--docs", type=int, nargs="+", default=[10, 25, 50, 100, 200, 400])
+    parser.add_argument("--chunks-per-doc", type=int, default=40)
+    parser.add_argument("--chunks-per-section", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--noise", type=float, default=0.05, help="query perturbation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"\n  Routing: top {settings.two_level_top_documents} documents, "
+        f"top {settings.two_level_top_sections} sections"
+    )
+    print(
+        f"\n  {'Docs':>6} {'Chunks':>8} {'Flat ms':>9} {'2-level ms':>11} "
+        f"{'Scored':>8} {'Recall@10':>10}"
+    )
+    print(f"  {'─' * 6} {'─' * 8} {'─' * 9} {'─' * 11} {'─' * 8} {'─' * 10}")
+
+    rng = np.random.default_rng(args.seed)
+    original_threshold = settings.two_level_min_documents
+    try:
+        for n_docs in args.docs:
+            index, matrix = synthetic_index(
+                n_docs, args.chunks_per_doc, args.chunks_per_section, args.seed
+            )
+            picks = rng.integers(0, len(matrix), args.queries)
+            queries = normalize(
+                matrix[picks] + rng.standard_normal((args.queries, matrix.shape[1])) * args.noise
+            ).astype(np.float32)
+
+            settings.two_level_min_documents = sys.maxsize
+            flat_ms, truth = time_queries(index, queries)
+            settings.two_level_min_documents = 1
+            routed_ms, found = time_queries(index, queries)
+
+            assert index.summaries is not None
+            scored = np.mean(
+                [
+                    len(
+                        index.summaries.candidate_rows(
+                            q,
+                            settings.two_level_top_documents,
+                            settings.two_level_top_sections,
+                        )
+                    )
+                    for q in queries
+                ]
+            )
+            recall = np.mean([len(t & f) / TOP_K for t, f in zip(truth, found, strict=True)])
+            print(
+                f"  {n_docs:>6} {len(matrix):>8} {flat_ms:>9.3f} {routed_ms:>11.3f} "
+                f"{scored:>8.0f} {recall:>10.3f}"
+            )
+    finally:
+        settings.two_level_min_documents = original_threshold
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Vector search benchmark — storage size, query latency and recall@10.
+
+Builds a scratch copy of the chunk embeddings in Postgres and compares the
+vector search strategies used by takehome.services.rag:
+
+  full        HNSW over the full float32 1536-d vectors (the original setup)
+  coarse      HNSW over 256-d shortened vectors, exact re-rank on full vectors
+  halfvec     HNSW over float16 vectors, exact re-rank on full vectors
+  binary      HNSW (Hamming) over sign-quantized bit vectors, exact re-rank
+
+Every tier but "full" oversamples a candidate pool from its compact index and
+re-ranks it exactly, like settings.vector_storage_tier does in the app. The app
+only stores and indexes the configured tier, so this script builds every
+tier's column and HNSW index on its own scratch table.
+
+Trade-off (bytes per vector; HNSW index size scales with it):
+  full 6144, coarse 1024, halfvec 3072, binary 192.
+halfvec is near-lossless, so a small pool suffices. coarse and binary lose more
+in the ANN pass and need a larger pool to recover recall, and the re-rank reads
+that many full vectors from the heap, so latency grows with the pool. Run this
+script to see where that balance sits for the real corpus.
+
+Recall@10 is measured against exact (brute-force) cosine search over the
+full vectors. Queries are corpus vectors perturbed with noise, so no
+embedding API calls are needed.
+
+Usage:
+    uv run python evals/bench_vector_search.py                      # copy document_chunks
+    uv run python evals/bench_vector_search.py --source synthetic --rows 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "src"))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from takehome.db.session import engine
+from takehome.services.rag import COARSE_EMBEDDING_DIMENSIONS, EMBEDDING_DIMENSIONS
+
+TABLE = "bench_vectors"
+TOP_K = 10
+
+
+# ─────────────────────────────────────────────────────
+# Data
+# ─────────────────────────────────────────────────────
+
+def normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.linalg.norm(m, axis=-1, keepdims=True)
+
+
+def param(v: np.ndarray) -> list[float]:
+    # Bound via pgvector's binary codec, registered on the app engine
+    return v.tolist()
+
+
+def synthetic_vectors(rows: int, seed: int) -> np.ndarray:
+    """Random unit vectors whose variance decays across dimensions.
+
+    Mimics the front-loaded information of text-embedding-3 vectors, which is
+    what makes truncation work; isotropic noise would make any shortened
+    representation look useless.
+    """
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(1.0 + np.arange(EMBEDDING_DIMENSIONS) / 64.0)
+    centers = rng.standard_normal((max(1, rows // 50), EMBEDDING_DIMENSIONS)) * scale
+    assignment = rng.integers(0, len(centers), rows)
+    noise = rng.standard_normal((rows, EMBEDDING_DIMENSIONS)) * scale * 0.6
+    return normalize(centers[assignment] + noise).astype(np.float32)
+
+
+async def load_chunk_vectors(conn: AsyncConnection) -> np.ndarray:
+    result = await conn.execute(
+        text("SELECT embedding::text FROM document_chunks WHERE embedding IS NOT NULL")
+    )
+    rows = [np.array(r[0][1:-1].split(","), dtype=np.float32) for r in result]
+    return normalize(np.stack(rows)) if rows else np.zeros((0, EMBEDDING_DIMENSIONS), np.float32)
+
+
+def shorten(m: np.ndarray, dims: int) -> np.ndarray:
+    return normalize(m[..., :dims])
+
+
+async def build_table(conn: AsyncConnection, vectors: np.ndarray) -> None:
+    await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await conn.execute(
+        text(
+            f"CREATE TABLE {TABLE} (id integer PRIMARY KEY, "
+            f"embedding vector({EMBEDDING_DIMENSIONS}), "
+            f"embedding_coarse vector({COARSE_EMBEDDING_DIMENSIONS}))"
+        )
+    )
+    insert = text(
+        f"INSERT INTO {TABLE} (id, embedding, embedding_coarse) "
+        "VALUES (:id, CAST(:e AS vector), CAST(:c AS vector))"
+    )
+    coarse = shorten(vectors, COARSE_EMBEDDING_DIMENSIONS)
+    batch = 500
+    for start in range(0, len(vectors), batch):
+        await conn.execute(
+            insert,
+            [
+                {"id": i, "e": param(vectors[i]), "c": param(coarse[i])}
+                for i in range(start, min(start + batch, len(vectors)))
+            ],
+        )
+    await conn.execute(
+        text(
+            f"ALTER TABLE {TABLE} "
+            f"ADD COLUMN embedding_half halfvec({EMBEDDING_DIMENSIONS}), "
+            f"ADD COLUMN embedding_bits bit({EMBEDDING_DIMENSIONS})"
+        )
+    )
+    await conn.execute(
+        text(
+            f"UPDATE {TABLE} SET embedding_half = embedding::halfvec({EMBEDDING_DIMENSIONS}), "
+            f"embedding_bits = binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})"
+        )
+    )
+    for name, column, ops in (
+        ("full", "embedding", "vector_cosine_ops"),
+        ("coarse", "embedding_coarse", "vector_cosine_ops"),
+        ("halfvec", "embedding_half", "halfvec_cosine_ops"),
+        ("binary", "embedding_bits", "bit_hamming_ops"),
+    ):
+        await conn.execute(
+            text(f"CREATE INDEX {TABLE}_{name} ON {TABLE} USING hnsw ({column} {ops})")
+        )
+    await conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+# ─────────────────────────────────────────────────────
+# Strategies
+# ─────────────────────────────────────────────────────
+
+Search = Callable[[AsyncConnection, np.ndarray], Awaitable[list[int]]]
+
+
+@dataclass
+class Strategy:
+    name: str
+    index: str  # index whose size is reported
+    column: str  # column whose per-row size is reported
+    search: Search
+
+
+async def search_full(conn: AsyncConnection, q: np.ndarray) -> list[int]:
+    result = await conn.execute(
+        text(f"SELECT id FROM {TABLE} ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k"),
+        {"q": param(q), "k": TOP_K},
+    )
+    return [r[0] for r in result]
+
+
+# Compact-tier ANN ordering: (column, distance operator, query expression)
+TIERS = {
+    "coarse": ("embedding_coarse", "<=>", "CAST(:c AS vector)"),
+    "halfvec": ("embedding_half", "<=>", "CAST(:q AS halfvec)"),
+    "binary": (
+        "embedding_bits",
+        "<~>",
+        f"binary_quantize(CAST(:q AS vector))::bit({EMBEDDING_DIMENSIONS})",
+    ),
+}
+
+
+def two_stage(tier: str, candidates: int) -> Search:
+    column, op, query = TIERS[tier]
+    sql = text(
+        f"""
+        WITH candidates AS (
+            SELECT id, embedding FROM {TABLE}
+            ORDER BY {column} {op} {query}
+            LIMIT :candidates
+        )
+        SELECT id FROM candidates ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k
+        """
+    )
+
+    async def search(conn: AsyncConnection, q: np.ndarray) -> list[int]:
+        await conn.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(candidates)}
+        )
+        params: dict[str, object] = {"q": param(q), "candidates": candidates, "k": TOP_K}
+        if tier == "coarse":
+            params["c"] = param(shorten(q, COARSE_EMBEDDING_DIMENSIONS))
+        result = await conn.execute(sql, params)
+        return [r[0] for r in result]
+
+    return search
+
+
+def strategies(pools: list[int]) -> list[Strategy]:
+    compact = [
+        Strategy(f"{tier}, rerank {n}", f"{TABLE}_{tier}", column, two_stage(tier, n))
+        for tier, (column, _op, _query) in TIERS.items()
+        for n in pools
+    ]
+    return [Strategy("full", f"{TABLE}_full", "embedding", search_full), *compact]
+
+
+# ─────────────────────────────────────────────────────
+# Measurement
+# ─────────────────────────────────────────────────────
+
+async def measure(
+    conn: AsyncConnection, strategy: Strategy, queries: np.ndarray, truth: list[set[int]]
+) -> dict[str, float]:
+    latencies: list[float] = []
+    recalls: list[float] = []
+    for q, expected in zip(queries, truth, strict=True):
+        start = time.perf_counter()
+        found = await strategy.search(conn, q)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & set(found)) / TOP_K)
+
+    sizes = await conn.execute(
+        text(
+            f"SELECT pg_relation_size(CAST(:index AS regclass)), "
+            f"avg(pg_column_size({strategy.column})) FROM {TABLE}"
+        ),
+        {"index": strategy.index},
+    )
+    index_bytes, column_bytes = sizes.one()
+    return {
+        "index_mb": index_bytes / 1e6,
+        "row_bytes": float(column_bytes),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": float(np.mean(recalls)),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", choices=["chunks", "synthetic"], default="chunks")
+    parser.add_argument("--rows", type=int, default=20_000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05, help="query perturbation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--pools", type=int, nargs="+", default=[40, 100, 200], help="re-rank candidate pools"
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the scratch table")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    async with engine.begin() as conn:
+        if args.source == "chunks":
+            vectors = await load_chunk_vectors(conn)
+        else:
+            vectors = synthetic_vectors(args.rows, args.seed)
+        if len(vectors) < TOP_K:
+            sys.exit(f"Need at least {TOP_K} vectors, found {len(vectors)}")
+
+        print(f"Building {TABLE} with {len(vectors)} vectors ({args.source})...")
+        await build_table(conn, vectors)
+
+    picks = rng.integers(0, len(vectors), args.queries)
+    queries = normalize(
+        vectors[picks] + rng.standard_normal((args.queries, EMBEDDING_DIMENSIONS)) * args.noise
+    ).astype(np.float32)
+    exact = queries @ vectors.T
+    truth = [set(np.argsort(-row)[:TOP_K].tolist()) for row in exact]
+
+    results: list[tuple[str, dict[str, float]]] = []
+    try:
+        for strategy in strategies(args.pools):
+            async with engine.begin() as conn:
+                # Warm-up so the first strategy doesn't pay for cold caches
+                for q in queries[:10]:
+                    await strategy.search(conn, q)
+                results.append((strategy.name, await measure(conn, strategy, queries, truth)))
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        await engine.dispose()
+
+    print(
+        f"\n  {'Strategy':<24} {'Index MB':>9} {'Row B':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'Recall@10':>10}"
+    )
+    print(f"  {'─' * 24} {'─' * 9} {'─' * 7} {'─' * 8} {'─' * 8} {'─' * 10}")
+    for name, r in results:
+        print(
+            f"  {name:<24} {r['index_mb']:>9.1f} {r['row_bytes']:>7.0f} "
+            f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['recall']:>10.3f}"
+        )
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Vector parameter transport benchmark — text literals vs pgvector's binary codec.
+
+Compares sending a 1536-d query vector to Postgres as a text literal
+("[0.0123,...]" + CAST(... AS vector), the original search path) with binding
+it as a binary parameter through pgvector's asyncpg codec (what the app's
+engine now registers on every connection).
+
+Reports payload size, client CPU to encode, and client CPU + wall latency per
+round trip of a prepared statement that parses the vector server-side.
+
+Usage:
+    uv run python evals/bench_vector_transport.py
+    uv run python evals/bench_vector_transport.py --iterations 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "src"))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncpg
+import numpy as np
+from pgvector import Vector
+from pgvector.asyncpg import register_vector
+
+from takehome.config import settings
+from takehome.services.rag import EMBEDDING_DIMENSIONS
+
+SQL = "SELECT l2_norm(CAST($1 AS vector))"
+
+
+def text_literal(embedding: list[float]) -> str:
+    return "[" + ",".join(str(x) for x in embedding) + "]"
+
+
+def asyncpg_dsn() -> str:
+    return settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def round_trips(
+    conn: asyncpg.Connection, params: list[object], iterations: int
+) -> tuple[float, float]:
+    """Return (client CPU ms, wall ms) per round trip."""
+    stmt = await conn.prepare(SQL)
+    for p in params[:20]:
+        await stmt.fetchval(p)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for i in range(iterations):
+        await stmt.fetchval(params[i % len(params)])
+    cpu = (time.process_time() - cpu_start) * 1000 / iterations
+    wall = (time.perf_counter() - wall_start) * 1000 / iterations
+    return cpu, wall
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((100, EMBEDDING_DIMENSIONS)).astype(np.float32)
+    embeddings = [v.tolist() for v in vectors / np.linalg.norm(vectors, axis=1, keepdims=True)]
+
+    # Client-side encoding only
+    n = 1000
+    text_us = timeit.timeit(lambda: text_literal(embeddings[0]), number=n) * 1e6 / n
+    binary_us = timeit.timeit(lambda: Vector._to_db_binary(embeddings[0]), number=n) * 1e6 / n
+    text_bytes = len(text_literal(embeddings[0]).encode())
+    binary_bytes = len(Vector._to_db_binary(embeddings[0]))
+
+    text_conn = await asyncpg.connect(asyncpg_dsn())
+    binary_conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        await register_vector(binary_conn)
+        text_cpu, text_wall = await round_trips(
+            text_conn, [text_literal(e) for e in embeddings], args.iterations
+        )
+        binary_cpu, binary_wall = await round_trips(binary_conn, list(embeddings), args.iterations)
+    finally:
+        await text_conn.close()
+        await binary_conn.close()
+
+    print(f"\n  {'Transport':<10} {'Bytes':>7} {'Encode µs':>10} {'CPU ms/q':>9} {'Wall ms/q':>10}")
+    print(f"  {'─' * 10} {'─' * 7} {'─' * 10} {'─' * 9} {'─' * 10}")
+    print(
+        f"  {'text':<10} {text_bytes:>7} {text_us:>10.1f} {text_cpu:>9.3f} {text_wall:>10.3f}"
+    )
+    print(
+        f"  {'binary':<10} {binary_bytes:>7} {binary_us:>10.1f} "
+        f"{binary_cpu:>9.3f} {binary_wall:>10.3f}"
+    )
+    print(
+        f"\n  Saved per query: {text_cpu - binary_cpu:.3f} ms client CPU, "
+        f"{text_wall - binary_wall:.3f} ms wall ({text_bytes - binary_bytes} bytes)"
+    )
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,6 +16,7 @@ export default function App() {
 		select,
 		remove,
 		refresh: refreshConversations,
+		setTitle,
 	} = useConversations();
 
 	const {
@@ -28,7 +29,7 @@ export default function App() {
 		searchSteps,
 		docLabelMap,
 		send,
-	} = useMessages(selectedId);
+	} = useMessages(selectedId, setTitle);
 
 	const {
 		documents,
@@ -86,6 +86,11 @@ export function MessageBubble({ message, onCitationClick }: MessageBubbleProps)
 						{message.sources_cited !== 1 ? "s" : ""} cited
 					</p>
 				)}
+				{message.interrupted && (
+					<p className="mt-1.5 text-xs text-neutral-400">
+						Response interrupted
+					</p>
+				)}
 			</div>
 		</motion.div>
 	);
@@ -63,6 +63,12 @@ export function useConversations() {
 		[selectedId],
 	);
 
+	const setTitle = useCallback((id: string, title: string) => {
+		setConversations((prev) =>
+			prev.map((c) => (c.id === id ? { ...c, title } : c)),
+		);
+	}, []);
+
 	const selected = conversations.find((c) => c.id === selectedId) ?? null;
 
 	return {
@@ -75,5 +81,6 @@ export function useConversations() {
 		select,
 		remove,
 		refresh,
+		setTitle,
 	};
 }
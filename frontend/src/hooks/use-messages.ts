@@ -2,7 +2,24 @@ import { useCallback, useEffect, useRef, useState } from "react";
 import * as api from "../lib/api";
 import type { Citation, Message } from "../types";
 
-export function useMessages(conversationId: string | null) {
+const MAX_RESUME_ATTEMPTS = 3;
+const RESUME_DELAY_MS = 500;
+
+interface StreamEvent {
+	type?: string;
+	content?: string;
+	delta?: string;
+	message?: Message;
+	title?: string;
+	conversation_id?: string;
+	citations?: Citation[];
+	doc_label_map?: Record<string, string>;
+}
+
+export function useMessages(
+	conversationId: string | null,
+	onTitle?: (conversationId: string, title: string) => void,
+) {
 	const [messages, setMessages] = useState<Message[]>([]);
 	const [loading, setLoading] = useState(false);
 	const [error, setError] = useState<string | null>(null);
@@ -62,71 +79,98 @@ export function useMessages(conversationId: string | null) {
 			setError(null);
 
 			try {
-				const response = await api.sendMessage(conversationId, content);
+				let accumulated = "";
+				// Last event seen, so a dropped connection can resume after it
+				const cursor = { lastEventId: null as string | null, finished: false };
+
+				const handleEvent = (parsed: StreamEvent) => {
+					if (parsed.type === "status" && parsed.content) {
+						setStatusMessage(parsed.content);
+						setSearchSteps((prev) => [...prev, parsed.content as string]);
+					} else if (parsed.type === "delta" && parsed.delta) {
+						accumulated += parsed.delta;
+						setStreamingContent(accumulated);
+						setStatusMessage(null);
+					} else if (parsed.type === "reset") {
+						accumulated = "";
+						setStreamingContent("");
+					} else if (parsed.type === "content" && parsed.content) {
+						accumulated += parsed.content;
+						setStreamingContent(accumulated);
+						setStatusMessage(null);
+					} else if (parsed.type === "message" && parsed.message) {
+						setMessages((prev) => [...prev, parsed.message as Message]);
+						accumulated = "";
+					} else if (parsed.type === "title" && parsed.title) {
+						onTitle?.(parsed.conversation_id ?? conversationId, parsed.title);
+					} else if (parsed.type === "done") {
+						cursor.finished = true;
+						if (parsed.citations) {
+							setCitations(parsed.citations);
+						}
+						if (parsed.doc_label_map) {
+							setDocLabelMap(parsed.doc_label_map);
+						}
+					} else if (parsed.type === "interrupted") {
+						cursor.finished = true;
+					} else if (parsed.content && !parsed.type) {
+						accumulated += parsed.content;
+						setStreamingContent(accumulated);
+					}
+				};
 
-				if (!response.body) {
-					throw new Error("No response body");
-				}
+				const readStream = async (response: Response) => {
+					if (!response.body) {
+						throw new Error("No response body");
+					}
 
-				const reader = response.body.getReader();
-				const decoder = new TextDecoder();
-				let accumulated = "";
-				let buffer = "";
-
-				while (true) {
-					const { done, value } = await reader.read();
-					if (done) break;
-
-					buffer += decoder.decode(value, { stream: true });
-					const lines = buffer.split("\n");
-					buffer = lines.pop() ?? "";
-
-					for (const line of lines) {
-						const trimmed = line.trim();
-						if (!trimmed || !trimmed.startsWith("data: ")) continue;
-
-						const data = trimmed.slice(6);
-						if (data === "[DONE]") continue;
-
-						try {
-							const parsed = JSON.parse(data) as {
-								type?: string;
-								content?: string;
-								delta?: string;
-								message?: Message;
-								citations?: Citation[];
-								doc_label_map?: Record<string, string>;
-							};
-
-							if (parsed.type === "status" && parsed.content) {
-								setStatusMessage(parsed.content);
-								setSearchSteps((prev) => [...prev, parsed.content as string]);
-							} else if (parsed.type === "delta" && parsed.delta) {
-								accumulated += parsed.delta;
-								setStreamingContent(accumulated);
-								setStatusMessage(null);
-							} else if (parsed.type === "content" && parsed.content) {
-								accumulated += parsed.content;
-								setStreamingContent(accumulated);
-								setStatusMessage(null);
-							} else if (parsed.type === "message" && parsed.message) {
-								setMessages((prev) => [...prev, parsed.message as Message]);
-								accumulated = "";
-							} else if (parsed.type === "done") {
-								if (parsed.citations) {
-									setCitations(parsed.citations);
-								}
-								if (parsed.doc_label_map) {
-									setDocLabelMap(parsed.doc_label_map);
-								}
-							} else if (parsed.content && !parsed.type) {
-								accumulated += parsed.content;
-								setStreamingContent(accumulated);
+					const reader = response.body.getReader();
+					const decoder = new TextDecoder();
+					let buffer = "";
+
+					while (true) {
+						const { done, value } = await reader.read();
+						if (done) break;
+
+						buffer += decoder.decode(value, { stream: true });
+						const lines = buffer.split("\n");
+						buffer = lines.pop() ?? "";
+
+						for (const line of lines) {
+							const trimmed = line.trim();
+							if (trimmed.startsWith("id: ")) {
+								cursor.lastEventId = trimmed.slice(4);
+								continue;
+							}
+							if (!trimmed || !trimmed.startsWith("data: ")) continue;
+
+							const data = trimmed.slice(6);
+							if (data === "[DONE]") continue;
+
+							try {
+								handleEvent(JSON.parse(data) as StreamEvent);
+							} catch {
+								// Skip invalid JSON lines
 							}
-						} catch {
-							// Skip invalid JSON lines
 						}
 					}
+				};
+
+				let response = await api.sendMessage(conversationId, content);
+				for (let attempt = 0; ; attempt++) {
+					try {
+						await readStream(response);
+						if (cursor.finished) break;
+					} catch (err) {
+						if (err instanceof DOMException && err.name === "AbortError") throw err;
+						if (!cursor.lastEventId || attempt >= MAX_RESUME_ATTEMPTS) throw err;
+					}
+					if (!cursor.lastEventId || attempt >= MAX_RESUME_ATTEMPTS) break;
+					// The connection dropped mid-answer: replay what was missed and follow on
+					await new Promise((resolve) =>
+						setTimeout(resolve, RESUME_DELAY_MS * (attempt + 1)),
+					);
+					response = await api.resumeStream(conversationId, cursor.lastEventId);
 				}
 
 				if (accumulated) {
@@ -153,7 +197,7 @@ export function useMessages(conversationId: string | null) {
 				setSearchSteps([]);
 			}
 		},
-		[conversationId, streaming],
+		[conversationId, streaming, onTitle],
 	);
 
 	return {
@@ -69,6 +69,21 @@ export async function sendMessage(
 	return res;
 }
 
+export async function resumeStream(
+	conversationId: string,
+	lastEventId: string,
+): Promise<Response> {
+	const res = await fetch(
+		`${BASE}/conversations/${conversationId}/messages/stream`,
+		{ headers: { "Last-Event-ID": lastEventId } },
+	);
+	if (!res.ok) {
+		const text = await res.text().catch(() => "Unknown error");
+		throw new Error(`API error ${res.status}: ${text}`);
+	}
+	return res;
+}
+
 export async function uploadDocument(
 	conversationId: string,
 	file: File,
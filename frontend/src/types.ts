@@ -13,6 +13,7 @@ export interface Message {
 	content: string;
 	sources_cited: number;
 	created_at: string;
+	interrupted?: boolean;
 }
 
 export interface Document {